@@ -1,3 +1,13 @@
-from .agent import root_agent
+from typing import Any
 
+# root_agent (google.adk の読み込みに約 1 秒かかる) は最初に参照されたときに作る。
+# ツールのモジュールだけを使うスクリプトやテストでは ADK を読み込まない。
 __all__ = ["root_agent"]
+
+
+def __getattr__(name: str) -> Any:
+    if name == "root_agent":
+        from .agent import root_agent
+
+        return root_agent
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
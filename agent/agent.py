@@ -1,37 +1,77 @@
+from typing import Any, Callable, List, Optional
+
 from google.adk.agents import Agent
 
-from .airtable_tools import (
+# ツールは asyncio 版を登録し、1 ターン内の独立した検索を並行実行させる
+from .async_airtable_tools import (
     create_daily_report,
     get_field_info,
     get_today_tasks,
+    report_task_completion,
     search_materials,
+    search_tasks,
+    show_more_results,
+    summarize_planting_materials,
     update_task_status,
+    update_task_statuses,
 )
+from .instrumentation import adk_callbacks, instrument_tool
+from .tenants import Tenant, bind_tenant
 
 
 # NOTE: Adjust the model name if you have access to a different Gemini tier.
 _MODEL_NAME = "gemini-2.5-pro"
 
 
-root_agent = Agent(
-    model=_MODEL_NAME,
-    name="agri_agent",
-    description="農作業に関するタスク管理、日報作成、情報検索を行うためのAIアシスタントです。",
-    instruction=(
-        "あなたは熟練の農業アシスタントです。"
-        "ユーザーからの自然言語による指示を理解し、提供されたツールを使って以下の操作を行ってください。\n"
-        "- 今日の作業タスクを確認する (get_today_tasks)\n"
-        "- 作業日報を記録する (create_daily_report)\n"
-        "- 作業タスクの状況を更新する (update_task_status)\n"
-        "- 圃場の情報を調べる (get_field_info)\n"
-        "- 農薬や肥料などの資材を検索する (search_materials)\n"
-        "特にタスク更新の際は、まずタスクを取得してから更新対象を特定するなど、複数のツールを段階的に使用して目的を達成してください。"
-    ),
-    tools=[
-        get_today_tasks,
-        create_daily_report,
-        update_task_status,
-        get_field_info,
-        search_materials,
-    ],
+_TOOLS = (
+    get_today_tasks,
+    create_daily_report,
+    update_task_status,
+    update_task_statuses,
+    report_task_completion,
+    get_field_info,
+    search_materials,
+    search_tasks,
+    show_more_results,
+    summarize_planting_materials,
 )
+
+
+def build_agent(tenant: Optional[Tenant] = None) -> Agent:
+    """Builds the agent; with ``tenant``, every tool and callback runs on that farm's base."""
+    # 各ツールの所要時間と Airtable 呼び出しを、ターン ID 付きで計測する
+    tools: List[Callable[..., Any]] = [instrument_tool(tool) for tool in _TOOLS]
+    callbacks = adk_callbacks()
+    if tenant is not None:
+        tools = [bind_tenant(tool, tenant) for tool in tools]
+        callbacks = {name: bind_tenant(callback, tenant) for name, callback in callbacks.items()}
+    return Agent(
+        model=_MODEL_NAME,
+        name="agri_agent",
+        description="農作業に関するタスク管理、日報作成、情報検索を行うためのAIアシスタントです。",
+        instruction=(
+            "あなたは熟練の農業アシスタントです。"
+            "ユーザーからの自然言語による指示を理解し、提供されたツールを使って以下の操作を行ってください。\n"
+            "- 今日の作業タスクを確認する (get_today_tasks)\n"
+            "- 作業日報を記録する (create_daily_report)\n"
+            "- 作業完了の報告を日報に記録し、該当する今日のタスクを完了にする (report_task_completion)\n"
+            "- 作業タスクの状況を更新する (update_task_status)\n"
+            "- 複数の作業タスクの状況をまとめて更新する (update_task_statuses)\n"
+            "- 圃場の情報を調べる (get_field_info)\n"
+            "- 農薬や肥料などの資材を検索する (search_materials)\n"
+            "- キーワード・月・圃場で作業タスクを検索する (search_tasks)\n"
+            "- 検索結果の続きを表示する (show_more_results)\n"
+            "- 作付計画から必要な肥料・資材の量を作物・エリア・月ごとに集計する (summarize_planting_materials)\n"
+            "互いに依存しない情報（タスク・圃場・資材など）は、ツールを同時に呼び出して並行して取得してください。"
+            "検索結果は最初のページだけが返るので、ユーザーが続きを求めたら末尾の cursor で"
+            "show_more_results を呼び出してください（同じ検索をやり直さないでください）。"
+            "作業完了の報告を受けたら report_task_completion を1回呼び出してください。"
+            "結果が ambiguous の場合は候補 (candidates) をユーザーに示して確認し、"
+            "選ばれたタスクのレコードIDで update_task_status を呼び出してください。"
+        ),
+        tools=tools,
+        **callbacks,
+    )
+
+
+root_agent = build_agent()
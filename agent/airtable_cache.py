@@ -0,0 +1,152 @@
+"""Read-through cache for slow-changing master tables.
+
+Master tables such as 資材マスター and 圃場マスタ change roughly weekly but are
+queried many times an hour. ``TTLCache`` keeps the results of
+``_get_table(...).get_all(...)`` in memory, keyed by the full query, with a
+per-table TTL and a bounded LRU size. Writes made through the helpers in
+``airtable_tools`` invalidate every entry of the affected table.
+
+A read that was in flight while a write invalidated its table must not store
+its pre-write result: callers take ``generation(table)`` before fetching and
+pass it to ``set()``, which ignores the result if the table was invalidated
+in between.
+
+Configuration (read when the cache is first used):
+
+    AIRTABLE_CACHE_TTLS         Comma-separated ``table=seconds`` pairs.
+                                Tables without a TTL are not cached.
+    AIRTABLE_CACHE_MAX_ENTRIES  Maximum number of cached queries (default 256)
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from .settings import TenantLocal, getenv
+
+# マスター系テーブルの既定 TTL (秒)。トランザクション系 (作業タスク, 日報ログ) は
+# 既定ではキャッシュしない。
+DEFAULT_TABLE_TTLS: Dict[str, float] = {
+    "資材マスター": 600.0,
+    "圃場マスタ": 600.0,
+    "圃場データ": 600.0,
+    "作物マスター": 3600.0,
+    "作業者マスター": 3600.0,
+}
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after a per-table TTL."""
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        table_ttls: Optional[Dict[str, float]] = None,
+    ):
+        self.max_entries = max_entries
+        self.table_ttls = dict(DEFAULT_TABLE_TTLS if table_ttls is None else table_ttls)
+        # key -> (table, expires_at, value)
+        self._entries: "OrderedDict[Hashable, Tuple[str, float, Any]]" = OrderedDict()
+        # テーブルごとの無効化の回数 (clear() の回数と組にする)
+        self._generations: Dict[str, int] = {}
+        self._cleared = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @classmethod
+    def from_env(cls) -> "TTLCache":
+        table_ttls = dict(DEFAULT_TABLE_TTLS)
+        raw = getenv("AIRTABLE_CACHE_TTLS")
+        if raw:
+            table_ttls = {}
+            for pair in raw.split(","):
+                table, _, seconds = pair.partition("=")
+                if table.strip() and seconds.strip():
+                    table_ttls[table.strip()] = float(seconds)
+        max_entries = int(getenv("AIRTABLE_CACHE_MAX_ENTRIES") or 256)
+        return cls(max_entries=max_entries, table_ttls=table_ttls)
+
+    def ttl_for(self, table: str) -> float:
+        return self.table_ttls.get(table, 0.0)
+
+    def get(self, key: Hashable) -> Any:
+        """Returns the cached value, or ``None`` on a miss or expired entry."""
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is _MISSING or entry[1] <= time.monotonic():
+                if entry is not _MISSING:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def generation(self, table: str) -> Tuple[int, int]:
+        """Changes whenever ``table`` is invalidated (or the cache cleared)."""
+        with self._lock:
+            return self._cleared, self._generations.get(table, 0)
+
+    def set(
+        self, key: Hashable, table: str, value: Any, generation: Optional[Tuple[int, int]] = None
+    ) -> None:
+        """Stores ``value`` for ``key`` if ``table`` has a positive TTL.
+
+        With ``generation`` (taken before the value was fetched) nothing is
+        stored if the table has been invalidated since.
+        """
+        ttl = self.ttl_for(table)
+        if ttl <= 0 or self.max_entries <= 0:
+            return
+        with self._lock:
+            current = (self._cleared, self._generations.get(table, 0))
+            if generation is not None and generation != current:
+                # 読み取り中に書き込みがあった: 書き込み前のデータを TTL の間返さない
+                return
+            self._entries[key] = (table, time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate_table(self, table: str) -> int:
+        """Drops every entry for ``table`` and returns how many were removed."""
+        with self._lock:
+            self._generations[table] = self._generations.get(table, 0) + 1
+            stale = [key for key, entry in self._entries.items() if entry[0] == table]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+            return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cleared += 1
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+_caches: TenantLocal[TTLCache] = TenantLocal(TTLCache.from_env)
+
+
+def get_cache() -> TTLCache:
+    """Returns the current tenant's read cache, creating it on first use."""
+    return _caches.get()
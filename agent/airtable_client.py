@@ -0,0 +1,400 @@
+"""Shared HTTP transport for every Airtable call made by the agent.
+
+All record, metadata and table helpers go through a single pooled
+``requests.Session`` so TLS connections are kept alive between tool calls.
+Requests are throttled per base with a token bucket (Airtable allows 5 req/s
+per base) and 429 / 5xx responses are retried with jittered exponential
+backoff that honours ``Retry-After``.
+
+``requests`` is imported when the first client is created, not when this
+module is imported. Tunables are read from the environment at the same time:
+
+    AIRTABLE_POOL_SIZE        Max keep-alive connections (default 10)
+    AIRTABLE_CONNECT_TIMEOUT  Connect timeout in seconds (default 5)
+    AIRTABLE_READ_TIMEOUT     Read timeout in seconds (default 30)
+    AIRTABLE_MAX_RETRIES      Retries for 429 / 5xx / network errors (default 5)
+    AIRTABLE_RATE_LIMIT       Requests per second per base (default 5)
+    AIRTABLE_BACKOFF_BASE     First backoff step in seconds (default 0.5)
+    AIRTABLE_BACKOFF_MAX      Backoff ceiling in seconds (default 30)
+
+Credentials and the API endpoint come from ``settings.get_settings()``.
+Every tenant (farm, see ``agent.tenants``) gets its own client, so its own
+connection pool and rate-limit buckets.
+"""
+
+import asyncio
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import partial
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
+
+from .instrumentation import record_http, run_in_context
+from .settings import TenantLocal, get_settings, getenv
+
+if TYPE_CHECKING:  # requests は最初のクライアント作成時に読み込む
+    import requests
+
+# 429 は常にリトライ可能（サーバー側で処理されていない）。5xx とネットワーク
+# エラーは、再送しても結果が変わらないメソッドに限ってリトライする。
+_RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+_IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "PUT", "PATCH", "DELETE"})
+_BASE_ID_RE = re.compile(r"/(app[A-Za-z0-9]+)(?:/|$)")
+
+
+class AirtableError(RuntimeError):
+    """Raised for any non-2xx response from the Airtable API."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _env_float(name: str, default: float) -> float:
+    value = getenv(name)
+    return float(value) if value else default
+
+
+def _env_int(name: str, default: int) -> int:
+    value = getenv(name)
+    return int(value) if value else default
+
+
+@dataclass(frozen=True)
+class ClientConfig:
+    """Connection pool, timeout, retry and rate-limit settings."""
+
+    pool_size: int = 10
+    connect_timeout: float = 5.0
+    read_timeout: float = 30.0
+    max_retries: int = 5
+    rate_limit: float = 5.0
+    backoff_base: float = 0.5
+    backoff_max: float = 30.0
+
+    @classmethod
+    def from_env(cls) -> "ClientConfig":
+        return cls(
+            pool_size=_env_int("AIRTABLE_POOL_SIZE", cls.pool_size),
+            connect_timeout=_env_float("AIRTABLE_CONNECT_TIMEOUT", cls.connect_timeout),
+            read_timeout=_env_float("AIRTABLE_READ_TIMEOUT", cls.read_timeout),
+            max_retries=_env_int("AIRTABLE_MAX_RETRIES", cls.max_retries),
+            rate_limit=_env_float("AIRTABLE_RATE_LIMIT", cls.rate_limit),
+            backoff_base=_env_float("AIRTABLE_BACKOFF_BASE", cls.backoff_base),
+            backoff_max=_env_float("AIRTABLE_BACKOFF_MAX", cls.backoff_max),
+        )
+
+
+class TokenBucket:
+    """Thread-safe token bucket.
+
+    ``reserve()`` takes a token immediately and returns how long the caller has
+    to wait before using it, so the same bucket can be shared by blocking code
+    (``acquire()``) and asyncio code (``await asyncio.sleep(bucket.reserve())``).
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        if rate <= 0:
+            raise ValueError("rate must be positive.")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self) -> float:
+        with self._lock:
+            self._refill()
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self) -> None:
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    def pause(self, seconds: float) -> None:
+        """Makes the next reservation wait at least ``seconds`` (used after a 429)."""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self._tokens, 1 - seconds * self.rate)
+
+
+def _retry_after_seconds(resp: "requests.Response") -> Optional[float]:
+    value = resp.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+def observe_request(
+    method: str,
+    url: str,
+    started: float,
+    retries: int,
+    resp: Optional["requests.Response"],
+    data: Optional[Dict[str, Any]] = None,
+) -> None:
+    """Reports a finished request (all of its attempts) to ``instrumentation``."""
+    body = resp.request.body if resp is not None else None
+    records = data.get("records") if isinstance(data, dict) else None
+    record_http(
+        method,
+        url,
+        resp.status_code if resp is not None else "error",
+        time.perf_counter() - started,
+        bytes_out=len(body.encode("utf-8") if isinstance(body, str) else body or b""),
+        bytes_in=len(resp.content) if resp is not None else 0,
+        retries=retries,
+        records=len(records) if isinstance(records, list) else None,
+    )
+
+
+class AirtableClient:
+    """Keep-alive Airtable HTTP client with per-base rate limiting and retries."""
+
+    def __init__(self, api_key: str, config: Optional[ClientConfig] = None):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.config = config or ClientConfig()
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=self.config.pool_size,
+            pool_maxsize=self.config.pool_size,
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers.update(
+            {
+                "Authorization": f"Bearer {api_key}",
+                "Content-Type": "application/json",
+            }
+        )
+        self.session = session
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._buckets_lock = threading.Lock()
+
+    # -- rate limiting -----------------------------------------------------
+
+    def bucket_for(self, url: str) -> TokenBucket:
+        """Returns the token bucket for the base addressed by ``url``."""
+        match = _BASE_ID_RE.search(url)
+        key = match.group(1) if match else ""
+        with self._buckets_lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = TokenBucket(self.config.rate_limit)
+                self._buckets[key] = bucket
+            return bucket
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff for the given retry attempt."""
+        ceiling = min(self.config.backoff_max, self.config.backoff_base * (2**attempt))
+        return random.uniform(0, ceiling)
+
+    # -- requests ----------------------------------------------------------
+
+    def request_json(self, method: str, url: str, **kwargs) -> Dict[str, Any]:
+        """Sends a request, retrying transient failures, and returns the JSON body."""
+
+        import requests
+
+        method = method.upper()
+        bucket = self.bucket_for(url)
+        started = time.perf_counter()
+        attempt = 0
+        resp: Optional[requests.Response] = None
+        try:
+            while True:
+                bucket.acquire()
+                try:
+                    resp = self.session.request(method, url, timeout=self.timeout, **kwargs)
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    resp = None
+                    delay = self.retry_delay(method, attempt, bucket, error=e)
+                else:
+                    if resp.ok:
+                        data = resp.json() if resp.content else {}
+                        observe_request(method, url, started, attempt, resp, data)
+                        return data
+                    delay = self.retry_delay(method, attempt, bucket, resp=resp)
+                attempt += 1
+                time.sleep(delay)
+        except AirtableError:
+            observe_request(method, url, started, attempt, resp)
+            raise
+
+    @property
+    def timeout(self) -> Tuple[float, float]:
+        return (self.config.connect_timeout, self.config.read_timeout)
+
+    def retry_delay(
+        self,
+        method: str,
+        attempt: int,
+        bucket: TokenBucket,
+        resp: Optional["requests.Response"] = None,
+        error: Optional[Exception] = None,
+    ) -> float:
+        """Decides whether a failed attempt is retried.
+
+        Returns the number of seconds to wait before the next attempt, or
+        raises ``AirtableError`` when the failure is permanent or retries are
+        exhausted. Shared by the blocking and asyncio request loops.
+        """
+        idempotent = method in _IDEMPOTENT_METHODS
+        if resp is None:
+            if not idempotent or attempt >= self.config.max_retries:
+                raise AirtableError(f"Airtable API request failed: {error}") from error
+            return self.backoff(attempt)
+
+        status = resp.status_code
+        retryable = status == 429 or (status in _RETRY_STATUSES and idempotent)
+        if not retryable or attempt >= self.config.max_retries:
+            raise AirtableError(f"Airtable API error {status}: {resp.text}", status_code=status)
+        delay = _retry_after_seconds(resp)
+        if delay is None:
+            delay = self.backoff(attempt)
+        if status == 429:
+            # 同じベースへの後続リクエストもまとめて待たせる
+            bucket.pause(delay)
+        return delay
+
+    def close(self) -> None:
+        self.session.close()
+
+
+class AsyncAirtableClient:
+    """asyncio front-end sharing the pool and rate limiter of an ``AirtableClient``.
+
+    Rate-limit waits and retry backoff are awaited on the event loop; only the
+    HTTP exchange itself runs on a thread pool sized to the connection pool, so
+    concurrent tool calls never block the loop ADK runs on and never exceed
+    the per-base budget shared with blocking callers.
+    """
+
+    def __init__(self, client: AirtableClient):
+        self.client = client
+        self.executor = ThreadPoolExecutor(
+            max_workers=client.config.pool_size, thread_name_prefix="airtable"
+        )
+
+    async def run_blocking(self, func: Any, *args: Any, **kwargs: Any) -> Any:
+        """Runs a blocking callable on the client's thread pool."""
+        loop = asyncio.get_running_loop()
+        # run_in_executor はコンテキスト変数を引き継がないため、ターン ID ごと渡す
+        return await loop.run_in_executor(
+            self.executor, run_in_context(partial(func, *args, **kwargs))
+        )
+
+    async def request_json(self, method: str, url: str, **kwargs) -> Dict[str, Any]:
+        """Async counterpart of ``AirtableClient.request_json``."""
+
+        import requests
+
+        method = method.upper()
+        client = self.client
+        bucket = client.bucket_for(url)
+        started = time.perf_counter()
+        attempt = 0
+        resp: Optional[requests.Response] = None
+        try:
+            while True:
+                wait = bucket.reserve()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                try:
+                    resp = await self.run_blocking(
+                        client.session.request, method, url, timeout=client.timeout, **kwargs
+                    )
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    resp = None
+                    delay = client.retry_delay(method, attempt, bucket, error=e)
+                else:
+                    if resp.ok:
+                        data = resp.json() if resp.content else {}
+                        observe_request(method, url, started, attempt, resp, data)
+                        return data
+                    delay = client.retry_delay(method, attempt, bucket, resp=resp)
+                attempt += 1
+                await asyncio.sleep(delay)
+        except AirtableError:
+            observe_request(method, url, started, attempt, resp)
+            raise
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=False)
+
+
+# ---------------------------------------------------------------------------
+# Per-tenant client
+# ---------------------------------------------------------------------------
+
+
+def _new_client() -> AirtableClient:
+    return AirtableClient(get_settings().require_api_key(), ClientConfig.from_env())
+
+
+# テナントごとに接続プールとレート制限のバケットを分け、1 つの農場の負荷が
+# 他の農場の呼び出しを待たせないようにする
+_clients: TenantLocal[AirtableClient] = TenantLocal(_new_client)
+_async_clients: TenantLocal[AsyncAirtableClient] = TenantLocal(
+    lambda: AsyncAirtableClient(get_client())
+)
+_async_lock = threading.Lock()
+
+
+def get_client() -> AirtableClient:
+    """Returns the current tenant's client, creating it from its settings on first use."""
+    return _clients.get()
+
+
+def set_client(client: Optional[AirtableClient]) -> None:
+    """Replaces the current tenant's client (``None`` resets it to be rebuilt lazily)."""
+    _clients.set(client)
+    with _async_lock:
+        previous = _async_clients.peek()
+        _async_clients.set(None)
+    if previous is not None:
+        previous.close()
+
+
+def get_async_client() -> AsyncAirtableClient:
+    """Returns the asyncio client bound to the current tenant's ``get_client()``."""
+    client = get_client()
+    async_client = _async_clients.get()
+    if async_client.client is client:
+        return async_client
+    with _async_lock:
+        previous = _async_clients.get()
+        if previous.client is client:
+            return previous
+        async_client = AsyncAirtableClient(client)
+        _async_clients.set(async_client)
+    # 置き換えた側のスレッドプールを止める (実行中の呼び出しはそのまま終わる)
+    previous.close()
+    return async_client
+
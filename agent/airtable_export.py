@@ -0,0 +1,405 @@
+"""Streaming export of a whole base to Parquet or CSV files.
+
+Nightly backups and offline analysis need every record of every table, not
+the first page ``airtable_get_records`` returns. ``export_base`` discovers
+the tables through the metadata API (``airtable_base_schema(refresh=True)``)
+and pages through several tables at once on a thread pool. All requests go
+through the tenant's pooled client, so the per-base rate limit holds however
+many tables run in parallel.
+
+Records are read by field ID into the schema's record classes and written
+``batch_size`` rows at a time, so no table is ever held in memory. Column
+types follow the field types of the schema:
+
+    date                             date32 (CSV: 2025-05-01)
+    dateTime / createdTime / ...     timestamp[ms, UTC] (CSV: ISO 8601, Z)
+    number / currency / percent ...  float64
+    checkbox                         bool
+    links / lookups / multi-selects  list<string> (CSV: JSON array)
+    text / single select / ...       string
+    anything else (attachments, ...) string holding the JSON value
+
+Each run writes ``<out_dir>/<run>/<table>.<format>`` plus ``manifest.json``
+(tables, columns, counts, records per second). With ``incremental=True`` a
+table only contains the records created or modified since the watermark of
+the previous run (``LAST_MODIFIED_TIME()``), kept per table in
+``<out_dir>/export_state.json``. Deleted records are not listed; a full run
+is the complete copy.
+
+Parquet needs the optional ``pyarrow`` package (``ExportUnavailable`` is
+raised without it); CSV only needs the standard library.
+
+Configuration:
+
+    AIRTABLE_EXPORT_DIR      Output directory (default exports)
+    AIRTABLE_EXPORT_WORKERS  Tables exported at once (default 4)
+"""
+
+import csv
+import json
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .airtable_schema import (
+    TEXT_TYPES,
+    BaseSchema,
+    TableSchema,
+    coercer,
+    to_bool,
+    to_date,
+    to_datetime,
+    to_json_value,
+    to_number,
+    to_tuple,
+)
+from .instrumentation import SECONDS_BUCKETS, get_registry, run_in_context
+from .settings import current_tenant, getenv
+
+DEFAULT_EXPORT_DIR = "exports"
+FORMATS = ("parquet", "csv")
+STATE_FILE = "export_state.json"
+MANIFEST_FILE = "manifest.json"
+
+# エクスポート中に更新されたレコードを次回に取りこぼさないよう、ウォーターマークを少し巻き戻す
+_WATERMARK_OVERLAP = timedelta(seconds=60)
+_UNSAFE_FILENAME = re.compile(r'[\\/:*?"<>|\s]+')
+
+_metrics = get_registry()
+_metrics.describe("airtable_export_records_total", "counter", "Records written by export_base, by table.")
+_metrics.describe("airtable_export_seconds", "histogram", "Time to export one table.")
+
+
+class ExportUnavailable(RuntimeError):
+    """The requested format needs an optional package that is not installed."""
+
+
+def _pyarrow() -> Any:
+    try:
+        import pyarrow as pa  # type: ignore
+        import pyarrow.parquet  # type: ignore  # noqa: F401
+    except ModuleNotFoundError as e:  # pragma: no cover – optional dependency
+        raise ExportUnavailable(
+            "Parquet へのエクスポートには pyarrow が必要です (pip install pyarrow、または --format csv)。"
+        ) from e
+    return pa
+
+
+# ---------------------------------------------------------------------------
+# Columns
+# ---------------------------------------------------------------------------
+
+# 変換関数 -> 列の種類。スキーマのフィールド型から列の型を決める
+_KINDS: Dict[Callable[[Any], Any], str] = {
+    to_date: "date",
+    to_datetime: "timestamp",
+    to_number: "number",
+    to_bool: "bool",
+    to_tuple: "list",
+}
+
+
+@dataclass(frozen=True)
+class Column:
+    """One output column: a record attribute and the type it is written as."""
+
+    name: str
+    attr: str
+    kind: str
+    field_id: str = ""
+    field_type: str = ""
+
+
+def columns_for(table: TableSchema) -> List[Column]:
+    """``id``, ``createdTime`` and one column per field, typed from the schema."""
+    columns = [Column("id", "id", "text"), Column("createdTime", "created_time", "timestamp")]
+    for spec in table.fields:
+        kind = _KINDS.get(coercer(spec.type)) or ("text" if spec.type in TEXT_TYPES else "json")
+        columns.append(Column(spec.name, spec.attr, kind, spec.id, spec.type))
+    return columns
+
+
+def _text(value: Any) -> str:
+    if isinstance(value, str):
+        return value
+    return json.dumps(to_json_value(value), ensure_ascii=False, default=str)
+
+
+def _csv_value(kind: str, value: Any) -> Any:
+    if kind == "bool":
+        # Airtable はオフのチェックボックスをレコードに含めない
+        return "true" if value else "false"
+    if value is None or value == ():
+        return ""
+    if kind in ("date", "timestamp"):
+        return to_json_value(value)
+    if kind in ("list", "json"):
+        return _text(value)
+    return value
+
+
+def _arrow_value(kind: str, value: Any) -> Any:
+    if kind == "bool":
+        return bool(value)
+    if value is None:
+        return None
+    if kind == "list":
+        return [_text(item) for item in value]
+    if kind == "json":
+        return _text(value)
+    return value
+
+
+# ---------------------------------------------------------------------------
+# Writers
+# ---------------------------------------------------------------------------
+
+
+class _CsvWriter:
+    def __init__(self, path: Path, columns: Sequence[Column]):
+        self.columns = columns
+        # Excel で開いても文字化けしないよう BOM 付き UTF-8 にする
+        self._file = open(path, "w", encoding="utf-8-sig", newline="")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow([column.name for column in columns])
+
+    def write(self, rows: List[Tuple[Any, ...]]) -> None:
+        kinds = [column.kind for column in self.columns]
+        self._writer.writerows([_csv_value(kind, value) for kind, value in zip(kinds, row)] for row in rows)
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class _ParquetWriter:
+    def __init__(self, path: Path, columns: Sequence[Column]):
+        pa = _pyarrow()
+        self._pa = pa
+        self.columns = columns
+        types = {
+            "text": pa.string(),
+            "json": pa.string(),
+            "date": pa.date32(),
+            "timestamp": pa.timestamp("ms", tz="UTC"),
+            "number": pa.float64(),
+            "bool": pa.bool_(),
+            "list": pa.list_(pa.string()),
+        }
+        self.schema = pa.schema(
+            [
+                pa.field(
+                    column.name,
+                    types[column.kind],
+                    metadata={"field_id": column.field_id, "field_type": column.field_type} if column.field_id else None,
+                )
+                for column in columns
+            ]
+        )
+        self._writer = pa.parquet.ParquetWriter(str(path), self.schema, compression="zstd")
+
+    def write(self, rows: List[Tuple[Any, ...]]) -> None:
+        pa = self._pa
+        arrays = [
+            pa.array([_arrow_value(column.kind, row[i]) for row in rows], type=self.schema.field(i).type)
+            for i, column in enumerate(self.columns)
+        ]
+        # 1 バッチを 1 つの row group として書き出す
+        self._writer.write_table(pa.Table.from_arrays(arrays, schema=self.schema))
+
+    def close(self) -> None:
+        self._writer.close()
+
+
+_WRITERS = {"parquet": _ParquetWriter, "csv": _CsvWriter}
+
+
+# ---------------------------------------------------------------------------
+# Export
+# ---------------------------------------------------------------------------
+
+
+def _watermark(moment: datetime) -> str:
+    return moment.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+def _file_name(table: TableSchema, fmt: str) -> str:
+    return f"{_UNSAFE_FILENAME.sub('_', table.name).strip('_') or table.id}.{fmt}"
+
+
+def _load_state(out_dir: Path, base_id: str) -> Dict[str, Dict[str, Any]]:
+    try:
+        state = json.loads((out_dir / STATE_FILE).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    # 別のベースの状態は使わない (テナントごとに出力先を分けていない場合の保護)
+    return state.get("tables", {}) if state.get("base_id") == base_id else {}
+
+
+def _write_json(path: Path, data: Dict[str, Any]) -> None:
+    tmp = path.with_name(f"{path.name}.tmp")
+    tmp.write_text(json.dumps(data, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def export_table(
+    table: TableSchema,
+    schema: BaseSchema,
+    path: Path,
+    fmt: str = "parquet",
+    since: Optional[str] = None,
+    batch_size: int = 1000,
+) -> Dict[str, Any]:
+    """Streams one table to ``path`` and returns its statistics.
+
+    Only records modified after ``since`` (an ISO 8601 time) are written
+    when it is given. The file appears under ``path`` only when complete.
+    """
+    from .airtable_tools import airtable_iter_typed_records
+
+    columns = columns_for(table)
+    attrs = [column.attr for column in columns]
+    formula = f"IS_AFTER(LAST_MODIFIED_TIME(), DATETIME_PARSE('{since}'))" if since else None
+    tmp = path.with_name(f"{path.name}.tmp")
+    started = time.perf_counter()
+    records = 0
+    writer = _WRITERS[fmt](tmp, columns)
+    try:
+        batch: List[Tuple[Any, ...]] = []
+        for record in airtable_iter_typed_records(
+            table.name, filter_formula=formula, record_class=schema.record_class(table.id)
+        ):
+            batch.append(tuple(getattr(record, attr) for attr in attrs))
+            if len(batch) >= batch_size:
+                writer.write(batch)
+                records += len(batch)
+                batch = []
+        if batch:
+            writer.write(batch)
+            records += len(batch)
+    except BaseException:
+        writer.close()
+        tmp.unlink(missing_ok=True)
+        raise
+    writer.close()
+    os.replace(tmp, path)
+    seconds = time.perf_counter() - started
+    labels = {"tenant": current_tenant(), "table": table.name}
+    _metrics.inc("airtable_export_records_total", labels, records)
+    _metrics.observe("airtable_export_seconds", labels, seconds, SECONDS_BUCKETS)
+    return {
+        "file": path.name,
+        "records": records,
+        "seconds": round(seconds, 3),
+        "records_per_second": round(records / seconds, 1) if seconds > 0 else 0.0,
+        "bytes": path.stat().st_size,
+        "since": since,
+        "columns": [{"name": c.name, "kind": c.kind, "field_id": c.field_id} for c in columns],
+    }
+
+
+def export_base(
+    out_dir: Optional[str] = None,
+    fmt: str = "parquet",
+    tables: Optional[Iterable[str]] = None,
+    incremental: bool = False,
+    since: Optional[str] = None,
+    workers: Optional[int] = None,
+    batch_size: int = 1000,
+    on_table: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+) -> Dict[str, Any]:
+    """Exports every table (or ``tables``) of the current tenant's base.
+
+    Args:
+        out_dir: Directory of the runs and the watermark state
+            (default ``AIRTABLE_EXPORT_DIR`` or ``exports``).
+        fmt: ``"parquet"`` or ``"csv"``.
+        tables: Table names or IDs to export. Defaults to every table.
+        incremental: Export only records modified since each table's previous run.
+        since: Export only records modified after this ISO 8601 time
+            (overrides the stored watermarks).
+        workers: Tables exported at once (default ``AIRTABLE_EXPORT_WORKERS`` or 4).
+        batch_size: Rows buffered per table before they are written.
+        on_table: Called with ``(table name, stats)`` as each table finishes.
+
+    Returns:
+        The run's manifest: ``run``, ``path``, ``mode`` and per-table
+        statistics (records, seconds, records per second) under ``tables``.
+        Tables that failed are listed under ``errors``.
+    """
+    from .airtable_tools import airtable_base_schema
+
+    if fmt not in _WRITERS:
+        raise ValueError(f"format must be one of {FORMATS}")
+    if fmt == "parquet":
+        _pyarrow()
+    schema = airtable_base_schema(refresh=True)
+    if schema is None:
+        raise LookupError("テーブル一覧を取得できませんでした (メタデータ API と schema.bases:read が必要です)。")
+    selected = [schema.table(name) for name in tables] if tables else list(schema.tables)
+
+    out = Path(out_dir or getenv("AIRTABLE_EXPORT_DIR") or DEFAULT_EXPORT_DIR)
+    started_at = datetime.now(timezone.utc)
+    run = started_at.strftime("%Y%m%dT%H%M%SZ")
+    run_dir = out / run
+    run_dir.mkdir(parents=True, exist_ok=True)
+    # 全件エクスポートも、以降の差分エクスポートの起点としてウォーターマークを更新する
+    state = _load_state(out, schema.base_id)
+    workers = workers or int(getenv("AIRTABLE_EXPORT_WORKERS") or 4)
+
+    def since_for(table: TableSchema) -> Optional[str]:
+        if since:
+            return since
+        return state.get(table.id, {}).get("watermark") if incremental else None
+
+    results: Dict[str, Dict[str, Any]] = {}
+    errors: Dict[str, str] = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(selected) or 1))) as executor:
+        futures = {
+            executor.submit(
+                run_in_context(export_table),
+                table,
+                schema,
+                run_dir / _file_name(table, fmt),
+                fmt,
+                since_for(table),
+                batch_size,
+            ): table
+            for table in selected
+        }
+        for future in as_completed(futures):
+            table = futures[future]
+            try:
+                results[table.name] = future.result()
+            except Exception as e:
+                errors[table.name] = str(e)
+                continue
+            # 次回の差分エクスポートは、このテーブルの読み取り開始時点から
+            state[table.id] = {"name": table.name, "watermark": _watermark(started_at - _WATERMARK_OVERLAP), "run": run}
+            if on_table is not None:
+                on_table(table.name, results[table.name])
+
+    seconds = (datetime.now(timezone.utc) - started_at).total_seconds()
+    records = sum(stats["records"] for stats in results.values())
+    manifest = {
+        "run": run,
+        "path": str(run_dir),
+        "base_id": schema.base_id,
+        "tenant": current_tenant(),
+        "schema_fingerprint": schema.fingerprint,
+        "format": fmt,
+        "mode": "incremental" if incremental or since else "full",
+        "started_at": started_at.isoformat(timespec="seconds"),
+        "seconds": round(seconds, 3),
+        "records": records,
+        "records_per_second": round(records / seconds, 1) if seconds > 0 else 0.0,
+        "tables": {table.name: results[table.name] for table in selected if table.name in results},
+        "errors": errors,
+    }
+    _write_json(run_dir / MANIFEST_FILE, manifest)
+    _write_json(out / STATE_FILE, {"base_id": schema.base_id, "tables": state})
+    return manifest
@@ -0,0 +1,428 @@
+"""Local evaluator for the subset of Airtable formulas used by the agent.
+
+The tools filter with ``filterByFormula`` strings such as::
+
+    AND(IS_SAME({予定日}, '2025-07-01', 'day'), NOT({ステータス} = '完了'))
+
+To answer the same queries from a local copy of the base (the SQLite mirror,
+tests, the fake server) the formula is parsed once into a small AST and then
+evaluated against each record dict. Supported syntax: ``{field}`` references,
+string / number literals, ``= != < > <= >= & + - * /``, parentheses and the
+functions listed in ``_FUNCTIONS``.
+"""
+
+import re
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+class FormulaError(ValueError):
+    """Raised when a formula cannot be parsed or uses an unsupported function."""
+
+
+# ---------------------------------------------------------------------------
+# Tokenizer / parser
+# ---------------------------------------------------------------------------
+
+_TOKEN_RE = re.compile(
+    r"""
+    \s*(?:
+        (?P<field>\{[^}]*\})
+      | (?P<string>'(?:\\.|[^'\\])*'|"(?:\\.|[^"\\])*")
+      | (?P<number>\d+(?:\.\d+)?)
+      | (?P<name>[A-Za-z_][A-Za-z0-9_]*)
+      | (?P<op>!=|<=|>=|=|<|>|&|\+|-|\*|/)
+      | (?P<punct>[(),])
+    )
+    """,
+    re.VERBOSE,
+)
+_ESCAPE_RE = re.compile(r"\\(.)")
+
+# AST ノードはタプルで表す:
+#   ("lit", value) / ("field", name) / ("call", NAME, [args]) / ("op", op, left, right)
+#   ("neg", operand)
+Node = Tuple[Any, ...]
+
+
+def _tokenize(formula: str) -> List[Tuple[str, str]]:
+    tokens: List[Tuple[str, str]] = []
+    pos = 0
+    formula = formula.rstrip()
+    while pos < len(formula):
+        match = _TOKEN_RE.match(formula, pos)
+        if not match or match.end() == pos:
+            raise FormulaError(f"Unexpected character at {pos}: {formula[pos:pos + 20]!r}")
+        kind = match.lastgroup
+        tokens.append((kind, match.group(kind)))
+        pos = match.end()
+    return tokens
+
+
+class _Parser:
+    # 優先順位: 比較 < 連結(&) < 加減 < 乗除 < 単項マイナス
+    _LEVELS = [("=", "!=", "<", ">", "<=", ">="), ("&",), ("+", "-"), ("*", "/")]
+
+    def __init__(self, tokens: List[Tuple[str, str]]):
+        self.tokens = tokens
+        self.pos = 0
+
+    def peek(self) -> Optional[Tuple[str, str]]:
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def take(self, value: Optional[str] = None) -> Tuple[str, str]:
+        token = self.peek()
+        if token is None or (value is not None and token[1] != value):
+            raise FormulaError(f"Expected {value or 'token'}, got {token[1] if token else 'end'}")
+        self.pos += 1
+        return token
+
+    def parse(self) -> Node:
+        node = self.binary(0)
+        if self.peek() is not None:
+            raise FormulaError(f"Unexpected token {self.peek()[1]!r}")
+        return node
+
+    def binary(self, level: int) -> Node:
+        if level == len(self._LEVELS):
+            return self.unary()
+        node = self.binary(level + 1)
+        while True:
+            token = self.peek()
+            if not token or token[0] != "op" or token[1] not in self._LEVELS[level]:
+                return node
+            self.pos += 1
+            node = ("op", token[1], node, self.binary(level + 1))
+
+    def unary(self) -> Node:
+        token = self.peek()
+        if token and token == ("op", "-"):
+            self.pos += 1
+            return ("neg", self.unary())
+        return self.primary()
+
+    def primary(self) -> Node:
+        kind, text = self.take()
+        if kind == "field":
+            return ("field", text[1:-1])
+        if kind == "string":
+            return ("lit", _ESCAPE_RE.sub(r"\1", text[1:-1]))
+        if kind == "number":
+            return ("lit", float(text) if "." in text else int(text))
+        if kind == "punct" and text == "(":
+            node = self.binary(0)
+            self.take(")")
+            return node
+        if kind == "name":
+            name = text.upper()
+            if self.peek() != ("punct", "("):
+                if name in ("TRUE", "FALSE"):
+                    return ("lit", name == "TRUE")
+                raise FormulaError(f"Unknown identifier {text!r}")
+            self.take("(")
+            args: List[Node] = []
+            if self.peek() != ("punct", ")"):
+                args.append(self.binary(0))
+                while self.peek() == ("punct", ","):
+                    self.pos += 1
+                    args.append(self.binary(0))
+            self.take(")")
+            if name not in _FUNCTIONS:
+                raise FormulaError(f"Unsupported function {name}()")
+            return ("call", name, args)
+        raise FormulaError(f"Unexpected token {text!r}")
+
+
+# ---------------------------------------------------------------------------
+# Value coercion
+# ---------------------------------------------------------------------------
+
+
+def _to_text(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, list):
+        return ", ".join(_to_text(v) for v in value)
+    if isinstance(value, dict):
+        # 添付ファイル・コラボレーターなどは name / url を文字列として扱う
+        return str(value.get("name") or value.get("url") or value.get("id") or "")
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _to_number(value: Any) -> Optional[float]:
+    if isinstance(value, bool):
+        return float(value)
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, list) and len(value) == 1:
+        return _to_number(value[0])
+    if isinstance(value, str):
+        try:
+            return float(value.strip())
+        except ValueError:
+            return None
+    return None
+
+
+def parse_datetime(value: Any) -> Optional[datetime]:
+    """Parses Airtable date / dateTime values into naive UTC datetimes."""
+    if isinstance(value, list):
+        value = value[0] if value else None
+    if isinstance(value, datetime):
+        parsed = value
+    elif isinstance(value, date):
+        parsed = datetime(value.year, value.month, value.day)
+    elif isinstance(value, str) and value.strip():
+        text = value.strip().replace("/", "-")
+        if text.endswith("Z"):
+            text = text[:-1] + "+00:00"
+        try:
+            parsed = datetime.fromisoformat(text)
+        except ValueError:
+            return None
+    else:
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def truthy(value: Any) -> bool:
+    if isinstance(value, list):
+        return any(truthy(v) for v in value)
+    if isinstance(value, str):
+        return value != ""
+    return bool(value)
+
+
+def _compare(op: str, left: Any, right: Any) -> bool:
+    lnum, rnum = _to_number(left), _to_number(right)
+    if lnum is not None and rnum is not None and not (
+        isinstance(left, str) and isinstance(right, str)
+    ):
+        a, b = lnum, rnum
+    else:
+        a, b = _to_text(left), _to_text(right)
+    if op == "=":
+        return a == b
+    if op == "!=":
+        return a != b
+    if op == "<":
+        return a < b
+    if op == ">":
+        return a > b
+    if op == "<=":
+        return a <= b
+    return a >= b
+
+
+# ---------------------------------------------------------------------------
+# Functions
+# ---------------------------------------------------------------------------
+
+_UNIT_FORMATS = {
+    "year": "%Y",
+    "years": "%Y",
+    "month": "%Y-%m",
+    "months": "%Y-%m",
+    "week": "%G-%V",
+    "weeks": "%G-%V",
+    "day": "%Y-%m-%d",
+    "days": "%Y-%m-%d",
+    "hour": "%Y-%m-%dT%H",
+    "hours": "%Y-%m-%dT%H",
+    "minute": "%Y-%m-%dT%H:%M",
+    "minutes": "%Y-%m-%dT%H:%M",
+}
+_MOMENT_TOKENS = [
+    ("YYYY", "%Y"),
+    ("MM", "%m"),
+    ("DD", "%d"),
+    ("HH", "%H"),
+    ("mm", "%M"),
+    ("ss", "%S"),
+]
+
+
+def _datetime_format(value: Any, fmt: str = "YYYY-MM-DD") -> Optional[str]:
+    parsed = parse_datetime(value)
+    if parsed is None:
+        return None
+    strf = fmt
+    for token, directive in _MOMENT_TOKENS:
+        strf = strf.replace(token, directive)
+    return parsed.strftime(strf)
+
+
+def _is_same(a: Any, b: Any, unit: str = "ms") -> bool:
+    da, db = parse_datetime(a), parse_datetime(b)
+    if da is None or db is None:
+        return False
+    fmt = _UNIT_FORMATS.get(str(unit).lower())
+    if fmt is None:
+        return da == db
+    return da.strftime(fmt) == db.strftime(fmt)
+
+
+def _date_order(a: Any, b: Any, after: bool) -> bool:
+    da, db = parse_datetime(a), parse_datetime(b)
+    if da is None or db is None:
+        return False
+    return da > db if after else da < db
+
+
+def _find(needle: Any, haystack: Any, start: Any = 1, ignore_case: bool = False) -> Any:
+    needle_s, hay_s = _to_text(needle), _to_text(haystack)
+    if ignore_case:
+        needle_s, hay_s = needle_s.lower(), hay_s.lower()
+    index = hay_s.find(needle_s, max(int(_to_number(start) or 1) - 1, 0))
+    if index < 0:
+        return None if ignore_case else 0
+    return index + 1
+
+
+def _dateadd(value: Any, count: Any, unit: str) -> Optional[str]:
+    parsed = parse_datetime(value)
+    if parsed is None:
+        return None
+    amount = _to_number(count) or 0
+    unit = str(unit).lower().rstrip("s")
+    if unit == "week":
+        parsed += timedelta(weeks=amount)
+    elif unit == "day":
+        parsed += timedelta(days=amount)
+    elif unit == "hour":
+        parsed += timedelta(hours=amount)
+    elif unit == "minute":
+        parsed += timedelta(minutes=amount)
+    else:
+        raise FormulaError(f"DATEADD unit {unit!r} is not supported")
+    return parsed.isoformat()
+
+
+_FUNCTIONS: Dict[str, Callable[..., Any]] = {
+    "ARRAYJOIN": lambda values, sep=", ": sep.join(
+        _to_text(v) for v in (values if isinstance(values, list) else [values]) if v is not None
+    ),
+    "BLANK": lambda: None,
+    "CONCATENATE": lambda *args: "".join(_to_text(a) for a in args),
+    "DATEADD": _dateadd,
+    "DATETIME_FORMAT": _datetime_format,
+    "DATETIME_PARSE": lambda value, *_: (
+        parse_datetime(value).isoformat() if parse_datetime(value) else None
+    ),
+    "FALSE": lambda: False,
+    "FIND": _find,
+    "IS_AFTER": lambda a, b: _date_order(a, b, after=True),
+    "IS_BEFORE": lambda a, b: _date_order(a, b, after=False),
+    "IS_SAME": _is_same,
+    "LEN": lambda value: len(_to_text(value)),
+    "LOWER": lambda value: _to_text(value).lower(),
+    "NOW": lambda: datetime.now(timezone.utc).replace(tzinfo=None).isoformat(),
+    "SEARCH": lambda needle, haystack, start=1: _find(needle, haystack, start, ignore_case=True),
+    "TODAY": lambda: date.today().isoformat(),
+    "TRIM": lambda value: _to_text(value).strip(),
+    "TRUE": lambda: True,
+    "UPPER": lambda value: _to_text(value).upper(),
+    "VALUE": lambda value: _to_number(value),
+    # 以下は評価時に特別扱いする (短絡評価 / レコード参照)
+    "AND": None,
+    "OR": None,
+    "NOT": None,
+    "IF": None,
+    "RECORD_ID": None,
+    "CREATED_TIME": None,
+    "LAST_MODIFIED_TIME": None,
+}
+
+
+# ---------------------------------------------------------------------------
+# Evaluation
+# ---------------------------------------------------------------------------
+
+
+def _evaluate(node: Node, record: Dict[str, Any]) -> Any:
+    kind = node[0]
+    if kind == "lit":
+        return node[1]
+    if kind == "field":
+        return record.get("fields", {}).get(node[1])
+    if kind == "neg":
+        return -(_to_number(_evaluate(node[1], record)) or 0)
+    if kind == "op":
+        op, left, right = node[1], _evaluate(node[2], record), _evaluate(node[3], record)
+        if op == "&":
+            return _to_text(left) + _to_text(right)
+        if op in ("+", "-", "*", "/"):
+            a, b = _to_number(left) or 0, _to_number(right) or 0
+            if op == "+":
+                return a + b
+            if op == "-":
+                return a - b
+            if op == "*":
+                return a * b
+            return a / b if b else None
+        return _compare(op, left, right)
+
+    name, args = node[1], node[2]
+    if name == "AND":
+        return all(truthy(_evaluate(arg, record)) for arg in args)
+    if name == "OR":
+        return any(truthy(_evaluate(arg, record)) for arg in args)
+    if name == "NOT":
+        return not truthy(_evaluate(args[0], record))
+    if name == "IF":
+        if truthy(_evaluate(args[0], record)):
+            return _evaluate(args[1], record)
+        return _evaluate(args[2], record) if len(args) > 2 else None
+    if name == "RECORD_ID":
+        return record.get("id")
+    if name == "CREATED_TIME":
+        return record.get("createdTime")
+    if name == "LAST_MODIFIED_TIME":
+        return record.get("lastModifiedTime") or record.get("createdTime")
+    try:
+        return _FUNCTIONS[name](*[_evaluate(arg, record) for arg in args])
+    except TypeError as e:
+        raise FormulaError(f"Bad arguments for {name}(): {e}") from e
+
+
+class Formula:
+    """A parsed formula that can be evaluated against record dicts."""
+
+    def __init__(self, source: str, tree: Node):
+        self.source = source
+        self._tree = tree
+
+    def evaluate(self, record: Dict[str, Any]) -> Any:
+        return _evaluate(self._tree, record)
+
+    def matches(self, record: Dict[str, Any]) -> bool:
+        return truthy(self.evaluate(record))
+
+    def __repr__(self) -> str:
+        return f"Formula({self.source!r})"
+
+
+@lru_cache(maxsize=512)
+def compile_formula(formula: str) -> Formula:
+    """Parses ``formula`` once; repeated formulas are served from an LRU cache."""
+    return Formula(formula, _Parser(_tokenize(formula)).parse())
+
+
+def filter_records(
+    records: Iterable[Dict[str, Any]], formula: Optional[str]
+) -> Iterator[Dict[str, Any]]:
+    """Yields the records for which ``formula`` is truthy (all, if no formula)."""
+    if not formula:
+        yield from records
+        return
+    compiled = compile_formula(formula)
+    for record in records:
+        if compiled.matches(record):
+            yield record
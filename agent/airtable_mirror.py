@@ -0,0 +1,275 @@
+"""Local SQLite mirror of the Airtable base.
+
+The farm base is small enough to keep a full copy on disk. ``AirtableMirror``
+snapshots every table returned by ``airtable_list_tables`` into SQLite and
+afterwards pulls only the records changed since the previous sync, using a
+``LAST_MODIFIED_TIME()`` filter. Deleted records are detected with a cheap
+ID-only pass (only the primary field is projected).
+
+The read tools in ``airtable_tools`` can answer from the mirror
+(``AIRTABLE_READ_MODE=mirror``) or fall back to it when the API is unreachable
+(``AIRTABLE_READ_MODE=auto``). Formulas are evaluated locally by
+``airtable_formula``.
+
+Usage::
+
+    mirror = get_mirror()
+    mirror.sync()                 # first run: full snapshot, then incremental
+    mirror.query("作業タスク", formula="{ステータス} = '未着手'")
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from .airtable_formula import filter_records
+from .settings import TenantLocal, getenv
+
+DEFAULT_MIRROR_PATH = ".airtable_mirror.sqlite3"
+
+# 同期中に更新されたレコードを取りこぼさないよう、ウォーターマークを少し巻き戻す
+_SYNC_OVERLAP = timedelta(seconds=60)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tables (
+    name TEXT PRIMARY KEY,
+    table_id TEXT,
+    primary_field TEXT,
+    watermark TEXT,
+    synced_at TEXT
+);
+CREATE TABLE IF NOT EXISTS records (
+    table_name TEXT NOT NULL,
+    id TEXT NOT NULL,
+    created_time TEXT,
+    fields TEXT NOT NULL,
+    PRIMARY KEY (table_name, id)
+);
+"""
+
+
+def sort_records(
+    records: List[Dict[str, Any]], sort: Optional[List[Dict[str, str]]]
+) -> List[Dict[str, Any]]:
+    """Sorts records like Airtable's ``sort`` parameter (empty values last)."""
+    for spec in reversed(sort or []):
+        name = spec["field"]
+        descending = spec.get("direction", "asc") == "desc"
+        present = [r for r in records if r.get("fields", {}).get(name) not in (None, "", [])]
+        missing = [r for r in records if r.get("fields", {}).get(name) in (None, "", [])]
+        present.sort(key=lambda r: _sort_key(r["fields"][name]), reverse=descending)
+        records = present + missing
+    return records
+
+
+def _sort_key(value: Any) -> Any:
+    if isinstance(value, list):
+        value = value[0] if value else ""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return (0, value, "")
+    return (1, 0, str(value))
+
+
+def project_fields(record: Dict[str, Any], fields: Optional[List[str]]) -> Dict[str, Any]:
+    """Returns ``record`` with only ``fields`` kept (all fields if ``None``)."""
+    if not fields:
+        return record
+    kept = {name: value for name, value in record.get("fields", {}).items() if name in fields}
+    return {**record, "fields": kept}
+
+
+class AirtableMirror:
+    """SQLite copy of the base with incremental ``LAST_MODIFIED_TIME`` sync."""
+
+    def __init__(self, path: str = DEFAULT_MIRROR_PATH):
+        self.path = path
+        self._write_lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    # -- state -------------------------------------------------------------
+
+    def synced_tables(self) -> Dict[str, Dict[str, Any]]:
+        """Returns ``{table_name: {"watermark": ..., "synced_at": ...}}``."""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT name, watermark, synced_at FROM tables").fetchall()
+        return {name: {"watermark": wm, "synced_at": at} for name, wm, at in rows}
+
+    def has_table(self, table_name: str) -> bool:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT 1 FROM tables WHERE name = ? AND synced_at IS NOT NULL", (table_name,)
+            ).fetchone()
+        return row is not None
+
+    # -- sync --------------------------------------------------------------
+
+    def sync(self, tables: Optional[Iterable[str]] = None, full: bool = False) -> Dict[str, Any]:
+        """Syncs every table in the base (or only ``tables``).
+
+        Args:
+            tables: Optional table names to limit the sync to.
+            full: Re-download everything instead of only changed records.
+
+        Returns:
+            Per-table stats: ``{"mode", "upserted", "deleted", "seconds"}``.
+        """
+        from .airtable_tools import airtable_list_tables
+
+        wanted = set(tables) if tables else None
+        stats: Dict[str, Any] = {}
+        for table in airtable_list_tables()["tables"]:
+            if wanted is None or table["name"] in wanted:
+                stats[table["name"]] = self.sync_table(table, full=full)
+        return stats
+
+    def sync_table(self, table: Dict[str, Any], full: bool = False) -> Dict[str, Any]:
+        """Syncs one table given its metadata entry from ``airtable_list_tables``."""
+        from .airtable_tools import airtable_iter_records
+
+        name = table["name"]
+        primary_id = table.get("primaryFieldId")
+        primary = next((f["name"] for f in table.get("fields", []) if f.get("id") == primary_id), None)
+        started = time.monotonic()
+        sync_started_at = datetime.now(timezone.utc)
+        watermark = None if full else self.synced_tables().get(name, {}).get("watermark")
+
+        upserted = 0
+        deleted = 0
+        if watermark is None:
+            # 初回 / full: 全件スナップショット。見つからなかった ID は削除扱い
+            seen: List[str] = []
+            for page in _pages(airtable_iter_records(name, page_size=100)):
+                self._upsert(name, page)
+                seen.extend(rec["id"] for rec in page)
+                upserted += len(page)
+            deleted = self._delete_missing(name, seen)
+            mode = "full"
+        else:
+            formula = f"IS_AFTER(LAST_MODIFIED_TIME(), DATETIME_PARSE('{watermark}'))"
+            for page in _pages(airtable_iter_records(name, filter_formula=formula, page_size=100)):
+                self._upsert(name, page)
+                upserted += len(page)
+            # 削除検出: 主フィールドだけを射影して ID 一覧を取得
+            id_fields = [primary] if primary else None
+            ids = [rec["id"] for rec in airtable_iter_records(name, fields=id_fields, page_size=100)]
+            deleted = self._delete_missing(name, ids)
+            mode = "incremental"
+
+        new_watermark = (sync_started_at - _SYNC_OVERLAP).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+        with self._write_lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO tables (name, table_id, primary_field, watermark, synced_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (name, table.get("id"), primary, new_watermark, sync_started_at.isoformat()),
+            )
+        return {
+            "mode": mode,
+            "upserted": upserted,
+            "deleted": deleted,
+            "seconds": round(time.monotonic() - started, 3),
+        }
+
+    def _upsert(self, table_name: str, records: List[Dict[str, Any]]) -> None:
+        rows = [
+            (
+                table_name,
+                rec["id"],
+                rec.get("createdTime"),
+                json.dumps(rec.get("fields", {}), ensure_ascii=False),
+            )
+            for rec in records
+        ]
+        with self._write_lock, self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO records (table_name, id, created_time, fields)"
+                " VALUES (?, ?, ?, ?)",
+                rows,
+            )
+
+    def _delete_missing(self, table_name: str, live_ids: List[str]) -> int:
+        with self._write_lock, self._connect() as conn:
+            conn.execute("CREATE TEMP TABLE live_ids (id TEXT PRIMARY KEY)")
+            conn.executemany("INSERT OR IGNORE INTO live_ids VALUES (?)", ((i,) for i in live_ids))
+            cur = conn.execute(
+                "DELETE FROM records WHERE table_name = ? AND id NOT IN (SELECT id FROM live_ids)",
+                (table_name,),
+            )
+            conn.execute("DROP TABLE live_ids")
+            return cur.rowcount
+
+    def apply_write(self, table_name: str, action: str, records: List[Dict[str, Any]]) -> None:
+        """Applies a write made through ``airtable_tools`` to an already-synced table."""
+        if not self.has_table(table_name):
+            return
+        if action == "delete":
+            with self._write_lock, self._connect() as conn:
+                conn.executemany(
+                    "DELETE FROM records WHERE table_name = ? AND id = ?",
+                    [(table_name, rec["id"]) for rec in records],
+                )
+        else:
+            self._upsert(table_name, [rec for rec in records if "fields" in rec])
+
+    # -- reads -------------------------------------------------------------
+
+    def iter_table(self, table_name: str) -> Iterable[Dict[str, Any]]:
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "SELECT id, created_time, fields FROM records WHERE table_name = ?", (table_name,)
+            )
+            for record_id, created_time, fields in cursor:
+                yield {"id": record_id, "createdTime": created_time, "fields": json.loads(fields)}
+
+    def query(
+        self,
+        table_name: str,
+        formula: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+        sort: Optional[List[Dict[str, str]]] = None,
+        max_records: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """Answers a list-records query locally, evaluating ``formula`` in Python.
+
+        Views are server-side objects and are not available in the mirror.
+        """
+        records = list(filter_records(self.iter_table(table_name), formula))
+        records = sort_records(records, sort)
+        if max_records is not None:
+            records = records[:max_records]
+        return [project_fields(rec, fields) for rec in records]
+
+
+def _pages(records: Iterable[Dict[str, Any]], size: int = 100) -> Iterable[List[Dict[str, Any]]]:
+    page: List[Dict[str, Any]] = []
+    for record in records:
+        page.append(record)
+        if len(page) == size:
+            yield page
+            page = []
+    if page:
+        yield page
+
+
+_mirrors: TenantLocal[AirtableMirror] = TenantLocal(
+    lambda: AirtableMirror(getenv("AIRTABLE_MIRROR_PATH") or DEFAULT_MIRROR_PATH)
+)
+
+
+def get_mirror() -> AirtableMirror:
+    """Returns the current tenant's mirror at ``AIRTABLE_MIRROR_PATH``."""
+    return _mirrors.get()
@@ -0,0 +1,496 @@
+"""Durable write-behind outbox for Airtable writes.
+
+``create_daily_report`` used to answer the LINE user only after a synchronous
+POST; when Airtable was slow or rate-limited the report was lost and the user
+saw an error string. The outbox stores each write in a local SQLite table
+first, acknowledges it immediately and lets a background worker deliver it:
+
+* Pending entries are drained in batches of up to 10 records per request
+  (Airtable's batch limit), grouped by table and action.
+* Failed deliveries are retried with exponential backoff. 4xx responses other
+  than 429 are permanent: the batch is re-sent record by record to isolate the
+  bad entry, which is then marked ``failed``.
+* Updates to the same record are delivered in the order they were enqueued;
+  a later update is held back until the earlier one has been sent or failed.
+* Every entry has an idempotency key. Enqueuing the same key twice returns the
+  existing entry. For tables listed in ``AIRTABLE_OUTBOX_KEY_FIELDS`` the key
+  is also written to that field and creates are sent as upserts merging on it,
+  so a create whose response was lost is not duplicated by the retry.
+
+Entries survive restarts: ``resume_outbox()``, called when the agent is
+built and when the LINE webhook starts, starts the worker if anything is
+still pending, without waiting for the next write to be queued.
+
+Configuration:
+
+    AIRTABLE_OUTBOX_PATH          SQLite file (default .airtable_outbox.sqlite3)
+    AIRTABLE_OUTBOX_MAX_ATTEMPTS  Attempts before an entry is failed (default 8)
+    AIRTABLE_OUTBOX_INTERVAL      Worker poll interval in seconds (default 1)
+    AIRTABLE_OUTBOX_KEY_FIELDS    table=field pairs holding the idempotency key,
+                                  e.g. 日報ログ=冪等キー
+"""
+
+import contextvars
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from .airtable_client import AirtableError
+from .settings import TenantLocal, getenv
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_OUTBOX_PATH = ".airtable_outbox.sqlite3"
+
+# Airtable のバッチ API は 1 リクエスト最大 10 件
+_BATCH_SIZE = 10
+_ACTIONS = ("create", "update")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    idempotency_key TEXT NOT NULL UNIQUE,
+    table_name TEXT NOT NULL,
+    action TEXT NOT NULL,
+    record_id TEXT,
+    fields TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL DEFAULT 0,
+    last_error TEXT,
+    result_record_id TEXT,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS outbox_status ON outbox (status, id);
+"""
+
+_COLUMNS = (
+    "id",
+    "idempotency_key",
+    "table_name",
+    "action",
+    "record_id",
+    "fields",
+    "status",
+    "attempts",
+    "next_attempt_at",
+    "last_error",
+    "result_record_id",
+    "created_at",
+    "updated_at",
+)
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+def _row_to_entry(row: Tuple[Any, ...]) -> Dict[str, Any]:
+    entry = dict(zip(_COLUMNS, row))
+    entry["fields"] = json.loads(entry["fields"])
+    return entry
+
+
+def _is_permanent(error: AirtableError) -> bool:
+    # 429 と 5xx、ステータスのないネットワークエラーは時間をおけば成功しうる
+    code = error.status_code
+    return code is not None and 400 <= code < 500 and code != 429
+
+
+class Outbox:
+    """SQLite-backed queue of Airtable creates / updates with a delivery worker.
+
+    Args:
+        path: SQLite file holding the queue.
+        max_attempts: Delivery attempts before an entry is marked ``failed``.
+        key_fields: Table name -> field that stores the idempotency key.
+        interval: Seconds the worker sleeps when there is nothing to send.
+        linger: Seconds the worker waits after a wake-up so that writes
+            arriving together are sent in one batch.
+        backoff_base / backoff_max: Retry delay bounds in seconds.
+    """
+
+    def __init__(
+        self,
+        path: str = DEFAULT_OUTBOX_PATH,
+        max_attempts: int = 8,
+        key_fields: Optional[Dict[str, str]] = None,
+        interval: float = 1.0,
+        linger: float = 0.2,
+        backoff_base: float = 2.0,
+        backoff_max: float = 300.0,
+    ):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.key_fields = dict(key_fields or {})
+        self.interval = interval
+        self.linger = linger
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._write_lock = threading.Lock()
+        self._drain_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    @classmethod
+    def from_env(cls) -> "Outbox":
+        key_fields: Dict[str, str] = {}
+        for pair in (getenv("AIRTABLE_OUTBOX_KEY_FIELDS") or "").split(","):
+            table, _, field_name = pair.partition("=")
+            if table.strip() and field_name.strip():
+                key_fields[table.strip()] = field_name.strip()
+        return cls(
+            path=getenv("AIRTABLE_OUTBOX_PATH") or DEFAULT_OUTBOX_PATH,
+            max_attempts=int(getenv("AIRTABLE_OUTBOX_MAX_ATTEMPTS") or 8),
+            key_fields=key_fields,
+            interval=float(getenv("AIRTABLE_OUTBOX_INTERVAL") or 1.0),
+        )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    # -- enqueue -----------------------------------------------------------
+
+    def enqueue(
+        self,
+        table_name: str,
+        action: str,
+        fields: Dict[str, Any],
+        record_id: Optional[str] = None,
+        idempotency_key: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Durably stores a write and returns its entry without contacting Airtable.
+
+        Args:
+            table_name: Target table.
+            action: ``"create"`` or ``"update"``.
+            fields: Field values to write.
+            record_id: Target record (required for updates).
+            idempotency_key: Deduplication key; a random one is generated if
+                omitted. Re-enqueuing an existing key returns that entry.
+
+        Returns:
+            The stored entry (``id``, ``status``, ``idempotency_key``, ...).
+        """
+        if action not in _ACTIONS:
+            raise ValueError(f"action must be one of {_ACTIONS}")
+        if action == "update" and not record_id:
+            raise ValueError("record_id is required for updates")
+        key = idempotency_key or uuid.uuid4().hex
+        now = _now_iso()
+        with self._write_lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO outbox"
+                " (idempotency_key, table_name, action, record_id, fields, created_at, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    table_name,
+                    action,
+                    record_id,
+                    json.dumps(fields, ensure_ascii=False),
+                    now,
+                    now,
+                ),
+            )
+            row = conn.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM outbox WHERE idempotency_key = ?", (key,)
+            ).fetchone()
+        self._wakeup.set()
+        return _row_to_entry(row)
+
+    # -- inspection --------------------------------------------------------
+
+    def get(self, entry_id: int) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM outbox WHERE id = ?", (entry_id,)
+            ).fetchone()
+        return _row_to_entry(row) if row else None
+
+    def entries(self, status: str, limit: int = 100) -> List[Dict[str, Any]]:
+        """Returns entries with ``status`` (pending / sent / failed), oldest first."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM outbox WHERE status = ? ORDER BY id LIMIT ?",
+                (status, limit),
+            ).fetchall()
+        return [_row_to_entry(row) for row in rows]
+
+    def pending(self, limit: int = 100) -> List[Dict[str, Any]]:
+        return self.entries("pending", limit)
+
+    def failed(self, limit: int = 100) -> List[Dict[str, Any]]:
+        return self.entries("failed", limit)
+
+    def has_pending(self, table_name: str, record_id: str) -> bool:
+        """True if an update to ``record_id`` is still waiting to be delivered."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT 1 FROM outbox WHERE status = 'pending' AND table_name = ?"
+                " AND record_id = ? LIMIT 1",
+                (table_name, record_id),
+            ).fetchone()
+        return row is not None
+
+    def pending_records(self, table_name: str, record_ids: List[str]) -> Set[str]:
+        """The subset of ``record_ids`` that still has an update waiting to be delivered."""
+        pending: Set[str] = set()
+        with self._connect() as conn:
+            # SQLite の変数の上限を超えないよう分けて問い合わせる
+            for start in range(0, len(record_ids), 500):
+                chunk = record_ids[start : start + 500]
+                rows = conn.execute(
+                    "SELECT DISTINCT record_id FROM outbox WHERE status = 'pending' AND table_name = ?"
+                    f" AND record_id IN ({', '.join('?' * len(chunk))})",
+                    (table_name, *chunk),
+                )
+                pending.update(row[0] for row in rows)
+        return pending
+
+    def stats(self) -> Dict[str, Any]:
+        """Entry counts per status and the age of the oldest pending entry."""
+        with self._connect() as conn:
+            counts = dict(conn.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status"))
+            oldest = conn.execute(
+                "SELECT MIN(created_at) FROM outbox WHERE status = 'pending'"
+            ).fetchone()[0]
+        return {
+            "pending": counts.get("pending", 0),
+            "sent": counts.get("sent", 0),
+            "failed": counts.get("failed", 0),
+            "oldest_pending": oldest,
+            "worker_running": self._worker is not None and self._worker.is_alive(),
+        }
+
+    def retry_failed(self, entry_ids: Optional[List[int]] = None) -> int:
+        """Moves failed entries (all, or ``entry_ids``) back to pending."""
+        query = (
+            "UPDATE outbox SET status = 'pending', attempts = 0, next_attempt_at = 0,"
+            " updated_at = ? WHERE status = 'failed'"
+        )
+        params: List[Any] = [_now_iso()]
+        if entry_ids:
+            query += f" AND id IN ({', '.join('?' for _ in entry_ids)})"
+            params.extend(entry_ids)
+        with self._write_lock, self._connect() as conn:
+            count = conn.execute(query, params).rowcount
+        self._wakeup.set()
+        return count
+
+    def purge_sent(self, older_than: float = 7 * 24 * 3600) -> int:
+        """Deletes delivered entries older than ``older_than`` seconds."""
+        cutoff = datetime.fromtimestamp(time.time() - older_than, timezone.utc)
+        with self._write_lock, self._connect() as conn:
+            return conn.execute(
+                "DELETE FROM outbox WHERE status = 'sent' AND updated_at < ?",
+                (cutoff.isoformat(timespec="seconds"),),
+            ).rowcount
+
+    # -- delivery ----------------------------------------------------------
+
+    def _due_entries(self) -> List[Dict[str, Any]]:
+        """Pending entries that may be sent now, respecting per-record order."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM outbox WHERE status = 'pending' ORDER BY id"
+            ).fetchall()
+        now = time.time()
+        due: List[Dict[str, Any]] = []
+        blocked = set()
+        for row in rows:
+            entry = _row_to_entry(row)
+            if entry["action"] == "update":
+                # 同じレコードへの更新は、先行エントリの送信が終わるまで待たせる
+                target = (entry["table_name"], entry["record_id"])
+                if target in blocked:
+                    continue
+                blocked.add(target)
+            if entry["next_attempt_at"] <= now:
+                due.append(entry)
+        return due
+
+    def drain(self) -> Dict[str, int]:
+        """Sends every due entry once; returns ``{"sent", "retried", "failed"}``."""
+        totals = {"sent": 0, "retried": 0, "failed": 0}
+        with self._drain_lock:
+            groups: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+            for entry in self._due_entries():
+                groups.setdefault((entry["table_name"], entry["action"]), []).append(entry)
+            for (table_name, action), entries in groups.items():
+                for start in range(0, len(entries), _BATCH_SIZE):
+                    batch = entries[start : start + _BATCH_SIZE]
+                    for outcome, count in self._deliver(table_name, action, batch).items():
+                        totals[outcome] += count
+        return totals
+
+    def _deliver(
+        self, table_name: str, action: str, batch: List[Dict[str, Any]]
+    ) -> Dict[str, int]:
+        try:
+            records = self._send(table_name, action, batch)
+        except AirtableError as e:
+            if _is_permanent(e) and len(batch) > 1:
+                # バッチは全件成功か全件失敗なので、1 件ずつ送り直して原因を切り分ける
+                totals = {"sent": 0, "retried": 0, "failed": 0}
+                for entry in batch:
+                    for outcome, count in self._deliver(table_name, action, [entry]).items():
+                        totals[outcome] += count
+                return totals
+            return self._mark_error(batch, e)
+        except Exception as e:  # 想定外のエラーもエントリを失わずに再試行する
+            logger.exception("outbox delivery to %s failed", table_name)
+            return self._mark_error(batch, AirtableError(str(e)))
+
+        now = _now_iso()
+        with self._write_lock, self._connect() as conn:
+            conn.executemany(
+                "UPDATE outbox SET status = 'sent', attempts = attempts + 1, last_error = NULL,"
+                " result_record_id = ?, updated_at = ? WHERE id = ?",
+                [(rec.get("id"), now, entry["id"]) for entry, rec in zip(batch, records)],
+            )
+        return {"sent": len(batch), "retried": 0, "failed": 0}
+
+    def _send(
+        self, table_name: str, action: str, batch: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        from .airtable_tools import _notify_write, _request_json, _table_url
+
+        key_field = self.key_fields.get(table_name)
+        payload_records = []
+        for entry in batch:
+            fields = dict(entry["fields"])
+            if key_field:
+                fields[key_field] = entry["idempotency_key"]
+            if action == "update":
+                payload_records.append({"id": entry["record_id"], "fields": fields})
+            else:
+                payload_records.append({"fields": fields})
+
+        url = _table_url(table_name)
+        if action == "update":
+            data = _request_json("PATCH", url, json={"records": payload_records})
+        elif key_field:
+            # 冪等キーで upsert し、応答が失われた create の再送でも重複を作らない
+            payload = {
+                "records": payload_records,
+                "performUpsert": {"fieldsToMergeOn": [key_field]},
+            }
+            data = _request_json("PATCH", url, json=payload)
+        else:
+            data = _request_json("POST", url, json={"records": payload_records})
+        records = data.get("records", [])
+        _notify_write(table_name, action, records)
+        return records
+
+    def _mark_error(self, batch: List[Dict[str, Any]], error: AirtableError) -> Dict[str, int]:
+        now = time.time()
+        retried = failed = 0
+        rows = []
+        for entry in batch:
+            attempts = entry["attempts"] + 1
+            if _is_permanent(error) or attempts >= self.max_attempts:
+                status, next_at = "failed", 0.0
+                failed += 1
+            else:
+                delay = min(self.backoff_max, self.backoff_base * (2 ** (attempts - 1)))
+                status, next_at = "pending", now + delay
+                retried += 1
+            rows.append((status, attempts, next_at, str(error), _now_iso(), entry["id"]))
+        with self._write_lock, self._connect() as conn:
+            conn.executemany(
+                "UPDATE outbox SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ?,"
+                " updated_at = ? WHERE id = ?",
+                rows,
+            )
+        if failed:
+            logger.warning("outbox: %d entries failed permanently: %s", failed, error)
+        return {"sent": 0, "retried": retried, "failed": failed}
+
+    # -- worker ------------------------------------------------------------
+
+    def start(self) -> None:
+        """Starts the background delivery thread (no-op if already running)."""
+        with self._write_lock:
+            if self._worker is not None and self._worker.is_alive():
+                return
+            self._stop.clear()
+            # 配信スレッドは起動したテナントの設定 (クライアント) で送る
+            self._worker = threading.Thread(
+                target=contextvars.copy_context().run, args=(self._run,), name="airtable-outbox", daemon=True
+            )
+            self._worker.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        self._wakeup.set()
+        if self._worker is not None:
+            self._worker.join(timeout)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wakeup.clear()
+            try:
+                result = self.drain()
+            except Exception:
+                logger.exception("outbox drain failed")
+                result = {"sent": 0}
+            if not result["sent"] and self._wakeup.wait(self.interval):
+                # 続けて積まれる書き込みを 1 バッチにまとめられるよう少し待つ
+                self._stop.wait(self.linger)
+
+    def flush(self, timeout: float = 30.0) -> bool:
+        """Drains until nothing is pending or ``timeout`` passes; True if empty."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            self.drain()
+            if not self.pending(limit=1):
+                return True
+            time.sleep(min(self.interval, max(0.0, deadline - time.monotonic())))
+        return not self.pending(limit=1)
+
+
+_outboxes: TenantLocal[Outbox] = TenantLocal(Outbox.from_env)
+
+
+def get_outbox(start_worker: bool = True) -> Outbox:
+    """Returns the current tenant's outbox, starting its worker on first use."""
+    outbox = _outboxes.get()
+    if start_worker:
+        outbox.start()
+    return outbox
+
+
+def resume_outbox() -> bool:
+    """Starts the current tenant's worker if entries are still pending (e.g. after a restart).
+
+    Returns True if the worker was started. An outbox file that does not
+    exist yet is not created.
+    """
+    path = getenv("AIRTABLE_OUTBOX_PATH") or DEFAULT_OUTBOX_PATH
+    if _outboxes.peek() is None and not os.path.exists(path):
+        return False
+    outbox = get_outbox(start_worker=False)
+    if not outbox.pending(limit=1):
+        return False
+    logger.info("outbox: resuming delivery of pending entries (%s)", outbox.path)
+    outbox.start()
+    return True
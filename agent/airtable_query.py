@@ -0,0 +1,336 @@
+"""Typed query builder for Airtable list-records requests.
+
+The tools used to assemble ``filterByFormula`` strings with f-strings and
+``_sanitize_airtable_string``. ``Query`` describes a request instead::
+
+    query = (
+        Query("作業タスク")
+        .where(contains("タスク名", "防除"), date_range("予定日", "2025-07-01", "2025-08-01"))
+        .select("タスク名", "予定日")
+        .order_by("予定日")
+        .limit(50)
+    )
+    query.formula        # AND(FIND('防除', {タスク名}), ...)
+    query.run()          # via the read path (cache / single-flight / mirror)
+    query.run_local(records)   # against any local snapshot
+
+Conditions are small frozen dataclasses; a tuple of them compiles to one
+formula with every value escaped, and compiled formulas are kept in an LRU
+cache. Date ranges compile to ``IS_BEFORE`` comparisons on the raw field, not
+to ``DATETIME_FORMAT`` string matching, so the server compares dates instead of
+formatting every row. ``run_local`` evaluates the same formula with
+``airtable_formula``, so a query means the same thing against the API, the
+SQLite mirror or a test fixture.
+"""
+
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, replace
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+from .airtable_formula import filter_records
+from .airtable_mirror import project_fields, sort_records
+
+DateLike = Union[date, datetime, str]
+
+
+def quote(value: Any) -> str:
+    """Formula literal for ``value`` (strings are single-quoted and escaped)."""
+    if isinstance(value, bool):
+        return "TRUE()" if value else "FALSE()"
+    if isinstance(value, (int, float)):
+        return repr(value)
+    if isinstance(value, (date, datetime)):
+        value = value.isoformat()
+    text = str(value).replace("\\", "\\\\").replace("'", "\\'")
+    return f"'{text}'"
+
+
+def field_ref(name: str) -> str:
+    """``{name}`` reference; Airtable has no escape for ``}`` in field names."""
+    if "}" in name:
+        raise ValueError(f"Field name cannot contain '}}': {name!r}")
+    return "{" + name + "}"
+
+
+def _iso(value: DateLike) -> str:
+    return value.isoformat() if isinstance(value, (date, datetime)) else str(value)
+
+
+# ---------------------------------------------------------------------------
+# Conditions
+# ---------------------------------------------------------------------------
+
+
+class Condition(ABC):
+    """Base class of query conditions."""
+
+    @abstractmethod
+    def compile(self) -> str:
+        """Returns the condition as an Airtable formula."""
+
+
+@dataclass(frozen=True)
+class Eq(Condition):
+    field: str
+    value: Any
+
+    def compile(self) -> str:
+        return f"{field_ref(self.field)} = {quote(self.value)}"
+
+
+@dataclass(frozen=True)
+class Contains(Condition):
+    """Case-sensitive substring match on a text field."""
+
+    field: str
+    text: str
+
+    def compile(self) -> str:
+        return f"FIND({quote(self.text)}, {field_ref(self.field)})"
+
+
+@dataclass(frozen=True)
+class LinkedContains(Condition):
+    """Substring match on any value of a link / lookup / multi-value field."""
+
+    field: str
+    text: str
+
+    def compile(self) -> str:
+        return f"FIND({quote(self.text)}, ARRAYJOIN({field_ref(self.field)}))"
+
+
+@dataclass(frozen=True)
+class OneOf(Condition):
+    field: str
+    values: Tuple[Any, ...]
+
+    def compile(self) -> str:
+        ref = field_ref(self.field)
+        if not self.values:
+            return "FALSE()"
+        if len(self.values) == 1:
+            return f"{ref} = {quote(self.values[0])}"
+        return "OR(" + ", ".join(f"{ref} = {quote(v)}" for v in self.values) + ")"
+
+
+@dataclass(frozen=True)
+class DateRange(Condition):
+    """``start <= field < end`` on a date field; either bound may be omitted."""
+
+    field: str
+    start: Optional[str] = None
+    end: Optional[str] = None
+
+    def compile(self) -> str:
+        ref = field_ref(self.field)
+        # 空欄のレコードは IS_BEFORE が偽になるため、値があることも条件に含める
+        parts = [ref]
+        if self.start:
+            parts.append(f"NOT(IS_BEFORE({ref}, {quote(self.start)}))")
+        if self.end:
+            parts.append(f"IS_BEFORE({ref}, {quote(self.end)})")
+        return "AND(" + ", ".join(parts) + ")"
+
+
+@dataclass(frozen=True)
+class OnDay(Condition):
+    field: str
+    day: str
+
+    def compile(self) -> str:
+        return f"IS_SAME({field_ref(self.field)}, {quote(self.day)}, 'day')"
+
+
+@dataclass(frozen=True)
+class RecordIdIn(Condition):
+    record_ids: Tuple[str, ...]
+
+    def compile(self) -> str:
+        if not self.record_ids:
+            return "FALSE()"
+        return "OR(" + ", ".join(f"RECORD_ID() = {quote(r)}" for r in self.record_ids) + ")"
+
+
+@dataclass(frozen=True)
+class Not(Condition):
+    condition: Condition
+
+    def compile(self) -> str:
+        return f"NOT({self.condition.compile()})"
+
+
+@dataclass(frozen=True)
+class AllOf(Condition):
+    conditions: Tuple[Condition, ...]
+
+    def compile(self) -> str:
+        return compile_where(self.conditions) or "TRUE()"
+
+
+@dataclass(frozen=True)
+class AnyOf(Condition):
+    conditions: Tuple[Condition, ...]
+
+    def compile(self) -> str:
+        if not self.conditions:
+            return "FALSE()"
+        if len(self.conditions) == 1:
+            return self.conditions[0].compile()
+        return "OR(" + ", ".join(c.compile() for c in self.conditions) + ")"
+
+
+def eq(field_name: str, value: Any) -> Condition:
+    return Eq(field_name, value)
+
+
+def ne(field_name: str, value: Any) -> Condition:
+    return Not(Eq(field_name, value))
+
+
+def contains(field_name: str, text: str) -> Condition:
+    return Contains(field_name, text)
+
+
+def linked_contains(field_name: str, text: str) -> Condition:
+    return LinkedContains(field_name, text)
+
+
+def one_of(field_name: str, values: Iterable[Any]) -> Condition:
+    return OneOf(field_name, tuple(values))
+
+
+def date_range(
+    field_name: str, start: Optional[DateLike] = None, end: Optional[DateLike] = None
+) -> Condition:
+    """``start`` (inclusive) to ``end`` (exclusive), as dates or ISO strings."""
+    return DateRange(
+        field_name,
+        _iso(start) if start is not None else None,
+        _iso(end) if end is not None else None,
+    )
+
+
+def on_day(field_name: str, day: DateLike) -> Condition:
+    return OnDay(field_name, _iso(day))
+
+
+def record_id_in(record_ids: Iterable[str]) -> Condition:
+    return RecordIdIn(tuple(record_ids))
+
+
+def not_(condition: Condition) -> Condition:
+    return Not(condition)
+
+
+def all_of(*conditions: Condition) -> Condition:
+    return AllOf(tuple(conditions))
+
+
+def any_of(*conditions: Condition) -> Condition:
+    return AnyOf(tuple(conditions))
+
+
+@lru_cache(maxsize=1024)
+def compile_where(conditions: Tuple[Condition, ...]) -> Optional[str]:
+    """Compiles AND-ed conditions to a formula (``None`` when there are none)."""
+    if not conditions:
+        return None
+    if len(conditions) == 1:
+        return conditions[0].compile()
+    return "AND(" + ", ".join(c.compile() for c in conditions) + ")"
+
+
+# ---------------------------------------------------------------------------
+# Query
+# ---------------------------------------------------------------------------
+
+
+@dataclass(frozen=True)
+class Query:
+    """An immutable list-records request; builder methods return new queries."""
+
+    table: str
+    conditions: Tuple[Condition, ...] = ()
+    fields: Optional[Tuple[str, ...]] = None
+    sort: Tuple[Tuple[str, str], ...] = ()
+    max_records: Optional[int] = None
+    view: Optional[str] = None
+
+    def where(self, *conditions: Optional[Condition]) -> "Query":
+        """Adds AND-ed conditions; ``None`` entries are skipped (optional filters)."""
+        added = tuple(c for c in conditions if c is not None)
+        return replace(self, conditions=self.conditions + added)
+
+    def select(self, *fields: str) -> "Query":
+        return replace(self, fields=tuple(fields))
+
+    def order_by(self, field_name: str, desc: bool = False) -> "Query":
+        return replace(self, sort=self.sort + ((field_name, "desc" if desc else "asc"),))
+
+    def limit(self, max_records: Optional[int]) -> "Query":
+        return replace(self, max_records=max_records)
+
+    @property
+    def formula(self) -> Optional[str]:
+        return compile_where(self.conditions)
+
+    @property
+    def sort_spec(self) -> Optional[List[Dict[str, str]]]:
+        return [{"field": f, "direction": d} for f, d in self.sort] or None
+
+    @property
+    def field_list(self) -> Optional[List[str]]:
+        return list(self.fields) if self.fields else None
+
+    def run(self) -> List[Dict[str, Any]]:
+        """Runs the query through the read path of ``airtable_tools``."""
+        from .airtable_tools import _get_table
+
+        return _get_table(self.table).get_all(
+            formula=self.formula,
+            view=self.view,
+            fields=self.field_list,
+            sort=self.sort_spec,
+            max_records=self.max_records,
+        )
+
+    def iter_pages(self, page_size: Optional[int] = None) -> Iterable[Dict[str, Any]]:
+        """Streams the matching records page by page (no cache)."""
+        from .airtable_tools import airtable_iter_records
+
+        return airtable_iter_records(
+            self.table,
+            view=self.view,
+            filter_formula=self.formula,
+            fields=self.field_list,
+            sort=self.sort_spec,
+            page_size=page_size,
+            max_records=self.max_records,
+        )
+
+    async def run_async(self) -> List[Dict[str, Any]]:
+        """asyncio version of ``run``."""
+        from .async_airtable_tools import airtable_get_records
+
+        result = await airtable_get_records(
+            self.table,
+            view=self.view,
+            filter_formula=self.formula,
+            max_records=self.max_records,
+            fields=self.field_list,
+            sort=self.sort_spec,
+        )
+        return result["records"]
+
+    def run_local(self, records: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Runs the query against local records (e.g. a snapshot or the mirror).
+
+        Views are server-side objects and are ignored.
+        """
+        matched = sort_records(list(filter_records(records, self.formula)), self.sort_spec)
+        if self.max_records is not None:
+            matched = matched[: self.max_records]
+        return [project_fields(record, self.field_list) for record in matched]
@@ -0,0 +1,506 @@
+"""Base schema artifact, field-ID addressing and compact record classes.
+
+Records returned by the list-records API are keyed by display names such as
+「圃場名 (from 圃場データ) (from 関連する作付計画)」, which break when a field is
+renamed and make up much of every JSON payload. With
+``returnFieldsByFieldId=true`` Airtable keys them by field ID instead.
+
+``BaseSchema`` is the table / field metadata of one base with O(1)
+name <-> ID lookups. It is saved as a versioned JSON artifact
+(``SCHEMA_FORMAT``, the base ID and a fingerprint of the tables and fields),
+so processes can start from the cached file instead of calling the
+metadata API.
+
+``RecordBase`` subclasses, one per table, hold a record in ``__slots__``
+attributes decoded from either field IDs or names, with typed coercion
+(dates -> ``date`` / ``datetime``, numbers -> ``int`` / ``float``, links and
+lookups -> tuples). They are generated as a module by
+``scripts/generate_airtable_schema.py`` (``render_module``) or built at
+runtime from the schema (``BaseSchema.record_class``).
+"""
+
+import hashlib
+import json
+import keyword
+import os
+import re
+import threading
+import time
+import unicodedata
+from dataclasses import dataclass, field
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, ClassVar, Dict, Iterable, List, Optional, Tuple, Type
+
+# 成果物 (JSON) の形式のバージョン。互換性のない変更をしたら上げる
+SCHEMA_FORMAT = 1
+DEFAULT_SCHEMA_PATH = ".airtable_schema.json"
+
+
+# ---------------------------------------------------------------------------
+# Coercion
+# ---------------------------------------------------------------------------
+
+
+def to_date(value: Any) -> Optional[date]:
+    if not value:
+        return None
+    return value if isinstance(value, date) else date.fromisoformat(str(value)[:10])
+
+
+def to_datetime(value: Any) -> Optional[datetime]:
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+
+
+def to_number(value: Any) -> Optional[float]:
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    return float(value)
+
+
+def to_tuple(value: Any) -> Tuple[Any, ...]:
+    if value is None:
+        return ()
+    return tuple(value) if isinstance(value, (list, tuple)) else (value,)
+
+
+def to_bool(value: Any) -> bool:
+    return bool(value)
+
+
+# フィールド型 -> (変換関数, 生成モジュールでの型注釈)
+_COERCIONS: Dict[str, Tuple[Callable[[Any], Any], str]] = {
+    "date": (to_date, "Optional[date]"),
+    "dateTime": (to_datetime, "Optional[datetime]"),
+    "createdTime": (to_datetime, "Optional[datetime]"),
+    "lastModifiedTime": (to_datetime, "Optional[datetime]"),
+    "number": (to_number, "Optional[float]"),
+    "currency": (to_number, "Optional[float]"),
+    "percent": (to_number, "Optional[float]"),
+    "rating": (to_number, "Optional[float]"),
+    "duration": (to_number, "Optional[float]"),
+    "count": (to_number, "Optional[float]"),
+    "autoNumber": (to_number, "Optional[float]"),
+    "multipleRecordLinks": (to_tuple, "Tuple[str, ...]"),
+    "multipleLookupValues": (to_tuple, "Tuple[Any, ...]"),
+    "multipleSelects": (to_tuple, "Tuple[str, ...]"),
+    "checkbox": (to_bool, "bool"),
+}
+
+
+# 文字列のまま保持する型 (生成モジュールの型注釈とエクスポートの列の型に使う)
+TEXT_TYPES = {"singleLineText", "multilineText", "richText", "singleSelect", "email", "url", "phoneNumber"}
+
+
+def annotation(field_type: str) -> str:
+    if field_type in TEXT_TYPES:
+        return "Optional[str]"
+    return _COERCIONS.get(field_type, (_identity, "Any"))[1]
+
+
+def coercer(field_type: str) -> Callable[[Any], Any]:
+    """Decoder of an API value of ``field_type`` (identity for text and unknown types)."""
+    return _COERCIONS.get(field_type, (_identity, ""))[0]
+
+
+def _identity(value: Any) -> Any:
+    return value
+
+
+def to_json_value(value: Any) -> Any:
+    """Inverse of the coercers: the value as the records API returns it."""
+    if isinstance(value, datetime):
+        text = value.astimezone(timezone.utc).isoformat(timespec="milliseconds")
+        return text.replace("+00:00", "Z")
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, tuple):
+        return [to_json_value(v) for v in value]
+    return value
+
+
+def identifier(name: str) -> str:
+    """Python attribute name for a field / table name (Japanese is kept).
+
+    Python NFKC-normalises identifiers, so the name is normalised the same
+    way to keep ``__slots__`` entries and attribute access consistent.
+    """
+    text = unicodedata.normalize("NFKC", name).strip()
+    text = re.sub(r"\W+", "_", text).strip("_")
+    if not text or text[0].isdigit():
+        text = f"f_{text}"
+    return f"{text}_" if keyword.iskeyword(text) else text
+
+
+# ---------------------------------------------------------------------------
+# Schema
+# ---------------------------------------------------------------------------
+
+
+@dataclass(frozen=True)
+class FieldSpec:
+    id: str
+    name: str
+    type: str
+    attr: str
+    linked_table_id: Optional[str] = None
+
+
+@dataclass
+class TableSchema:
+    """Fields of one table, addressable by name or field ID."""
+
+    id: str
+    name: str
+    primary_field_id: str
+    fields: List[FieldSpec]
+    _by_name: Dict[str, FieldSpec] = field(default_factory=dict, init=False, repr=False)
+    _by_id: Dict[str, FieldSpec] = field(default_factory=dict, init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self._by_name = {spec.name: spec for spec in self.fields}
+        self._by_id = {spec.id: spec for spec in self.fields}
+
+    @classmethod
+    def from_api(cls, table: Dict[str, Any]) -> "TableSchema":
+        """Builds the table from one entry of the metadata API's ``tables``."""
+        # 予約済みの属性名や、正規化後に重複する名前には接尾辞を付ける
+        taken = set(RecordBase.__slots__) | {name for name in vars(RecordBase) if not name.startswith("__")}
+        fields = []
+        for spec in table.get("fields", []):
+            attr = identifier(spec["name"])
+            if attr in taken:
+                attr = f"{attr}_{spec['id'][-4:]}"
+            taken.add(attr)
+            fields.append(
+                FieldSpec(
+                    id=spec["id"],
+                    name=spec["name"],
+                    type=spec.get("type", ""),
+                    attr=attr,
+                    linked_table_id=(spec.get("options") or {}).get("linkedTableId"),
+                )
+            )
+        return cls(table["id"], table["name"], table.get("primaryFieldId", ""), fields)
+
+    def spec(self, name_or_id: str) -> FieldSpec:
+        spec = self._by_id.get(name_or_id) or self._by_name.get(name_or_id)
+        if spec is None:
+            raise KeyError(f"unknown field {name_or_id!r} in table {self.name!r}")
+        return spec
+
+    def field_id(self, name: str) -> str:
+        return self.spec(name).id
+
+    def field_name(self, field_id: str) -> str:
+        return self.spec(field_id).name
+
+    def to_api(self) -> Dict[str, Any]:
+        """The table in the metadata API's shape (see ``LinkSchema.from_tables``)."""
+        fields = []
+        for spec in self.fields:
+            entry: Dict[str, Any] = {"id": spec.id, "name": spec.name, "type": spec.type}
+            if spec.linked_table_id:
+                entry["options"] = {"linkedTableId": spec.linked_table_id}
+            fields.append(entry)
+        return {"id": self.id, "name": self.name, "primaryFieldId": self.primary_field_id, "fields": fields}
+
+
+class BaseSchema:
+    """Tables and fields of one base, with name <-> ID lookups and record classes."""
+
+    def __init__(self, base_id: str, tables: Iterable[TableSchema], generated_at: Optional[str] = None):
+        self.base_id = base_id
+        self.tables = list(tables)
+        self.generated_at = generated_at or datetime.now(timezone.utc).isoformat(timespec="seconds")
+        self._by_name = {table.name: table for table in self.tables}
+        self._by_id = {table.id: table for table in self.tables}
+        self._classes: Dict[str, Type["RecordBase"]] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_api(cls, base_id: str, tables: Iterable[Dict[str, Any]]) -> "BaseSchema":
+        return cls(base_id, [TableSchema.from_api(table) for table in tables])
+
+    @property
+    def fingerprint(self) -> str:
+        """Hash of every table and field (ID, name, type, link target)."""
+        canonical = [
+            [t.id, t.name, t.primary_field_id, [[f.id, f.name, f.type, f.linked_table_id] for f in t.fields]]
+            for t in self.tables
+        ]
+        return hashlib.sha256(json.dumps(canonical, ensure_ascii=False).encode("utf-8")).hexdigest()[:16]
+
+    def table(self, name_or_id: str) -> TableSchema:
+        table = self._by_id.get(name_or_id) or self._by_name.get(name_or_id)
+        if table is None:
+            raise KeyError(f"unknown table {name_or_id!r}")
+        return table
+
+    def has_table(self, name_or_id: str) -> bool:
+        return name_or_id in self._by_id or name_or_id in self._by_name
+
+    def field_id(self, table: str, name: str) -> str:
+        return self.table(table).field_id(name)
+
+    def field_name(self, table: str, field_id: str) -> str:
+        return self.table(table).field_name(field_id)
+
+    def age(self) -> float:
+        """Seconds since the schema was fetched (``inf`` if unknown)."""
+        try:
+            generated = to_datetime(self.generated_at)
+        except ValueError:
+            return float("inf")
+        if generated is None:
+            return float("inf")
+        if generated.tzinfo is None:
+            generated = generated.replace(tzinfo=timezone.utc)
+        return (datetime.now(timezone.utc) - generated).total_seconds()
+
+    def tables_api(self) -> List[Dict[str, Any]]:
+        return [table.to_api() for table in self.tables]
+
+    def record_class(self, table: str) -> Type["RecordBase"]:
+        """Record class of ``table`` built from this schema (cached)."""
+        spec = self.table(table)
+        with self._lock:
+            cls = self._classes.get(spec.id)
+            if cls is None:
+                cls = make_record_class(spec)
+                self._classes[spec.id] = cls
+            return cls
+
+    # -- artifact ------------------------------------------------------------
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            "format": SCHEMA_FORMAT,
+            "base_id": self.base_id,
+            "fingerprint": self.fingerprint,
+            "generated_at": self.generated_at,
+            "tables": self.tables_api(),
+        }
+
+    @classmethod
+    def from_json(cls, data: Dict[str, Any]) -> "BaseSchema":
+        if data.get("format") != SCHEMA_FORMAT:
+            raise ValueError(f"unsupported schema format {data.get('format')!r} (expected {SCHEMA_FORMAT})")
+        return cls(
+            data["base_id"],
+            [TableSchema.from_api(table) for table in data.get("tables", [])],
+            generated_at=data.get("generated_at"),
+        )
+
+    def save(self, path: "os.PathLike[str] | str") -> None:
+        """Writes the artifact atomically (readers never see a partial file)."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.tmp")
+        tmp.write_text(json.dumps(self.to_json(), ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: "os.PathLike[str] | str") -> Optional["BaseSchema"]:
+        """Reads an artifact; ``None`` if it is missing, unreadable or of another format."""
+        try:
+            return cls.from_json(json.loads(Path(path).read_text(encoding="utf-8")))
+        except (OSError, ValueError, KeyError):
+            return None
+
+
+class SchemaCache:
+    """``BaseSchema`` of one base (tenant) backed by the JSON artifact.
+
+    The artifact is used while it is younger than ``ttl`` seconds and belongs
+    to the configured base; otherwise ``fetch()`` (the metadata API's
+    ``tables``) is called and the artifact is rewritten.
+    """
+
+    def __init__(self, path: str, ttl: float, fetch: Callable[[], List[Dict[str, Any]]]):
+        self.path = path
+        self.ttl = ttl
+        self.fetch = fetch
+        self._schema: Optional[BaseSchema] = None
+        self._loaded_at = 0.0
+        self._refetch = False
+        self._lock = threading.Lock()
+        # メタデータ API を使えないトークンで毎回問い合わせないよう、この時刻まで待つ
+        self.unavailable_until = 0.0
+
+    def get(self, base_id: str) -> BaseSchema:
+        with self._lock:
+            now = time.monotonic()
+            if self._schema is not None and self._schema.base_id == base_id and now - self._loaded_at <= self.ttl:
+                return self._schema
+            cached = None if self._refetch else BaseSchema.load(self.path)
+            if cached is not None and cached.base_id == base_id and cached.age() <= self.ttl:
+                self._schema, self._loaded_at = cached, now
+                return cached
+            schema = BaseSchema.from_api(base_id, self.fetch())
+            self._refetch = False
+            try:
+                schema.save(self.path)
+            except OSError:
+                pass  # 読み取り専用の環境ではメモリ上のスキーマだけを使う
+            self._schema, self._loaded_at = schema, now
+            return schema
+
+    def invalidate(self) -> None:
+        """Fetches the schema from the API on next use (after table changes)."""
+        with self._lock:
+            self._schema = None
+            self._refetch = True
+
+
+# ---------------------------------------------------------------------------
+# Record classes
+# ---------------------------------------------------------------------------
+
+
+class RecordBase:
+    """Compact record of one table; subclasses list their fields in ``FIELDS``.
+
+    ``FIELDS`` holds ``(attribute, field ID, field name, field type)`` and the
+    subclass declares the attributes in ``__slots__``. ``from_api`` accepts
+    records keyed by field ID (``returnFieldsByFieldId=true``) or by name.
+    """
+
+    __slots__ = ("id", "created_time")
+
+    TABLE_ID: ClassVar[str] = ""
+    TABLE_NAME: ClassVar[str] = ""
+    FIELDS: ClassVar[Tuple[Tuple[str, str, str, str], ...]] = ()
+    # フィールド ID / フィールド名 -> (属性名, 変換関数)
+    _DECODERS: ClassVar[Dict[str, Tuple[str, Callable[[Any], Any]]]] = {}
+    _ATTRS: ClassVar[Tuple[str, ...]] = ()
+
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        decoders: Dict[str, Tuple[str, Callable[[Any], Any]]] = {}
+        for attr, field_id, name, field_type in cls.FIELDS:
+            decoders[field_id] = decoders[name] = (attr, coercer(field_type))
+        cls._DECODERS = decoders
+        cls._ATTRS = tuple(attr for attr, _, _, _ in cls.FIELDS)
+
+    def __init__(self, id: str, created_time: Optional[datetime] = None, **values: Any):
+        self.id = id
+        self.created_time = created_time
+        for attr in self._ATTRS:
+            setattr(self, attr, values.pop(attr, None))
+        if values:
+            raise TypeError(f"{type(self).__name__} has no fields {', '.join(values)}")
+
+    @classmethod
+    def from_api(cls, record: Dict[str, Any]) -> "RecordBase":
+        obj = cls.__new__(cls)
+        obj.id = record["id"]
+        obj.created_time = to_datetime(record.get("createdTime"))
+        for attr in cls._ATTRS:
+            setattr(obj, attr, None)
+        decoders = cls._DECODERS
+        for key, value in record.get("fields", {}).items():
+            decoder = decoders.get(key)
+            if decoder is not None:
+                setattr(obj, decoder[0], decoder[1](value))
+        return obj
+
+    @classmethod
+    def field_ids(cls, names: Optional[Iterable[str]] = None) -> List[str]:
+        """Field IDs of ``names`` (all fields when omitted); unknown names raise ``KeyError``."""
+        if names is None:
+            return [field_id for _, field_id, _, _ in cls.FIELDS]
+        by_name = {name: field_id for _, field_id, name, _ in cls.FIELDS}
+        return [by_name[name] if name in by_name else _raise_unknown(cls, name) for name in names]
+
+    def get(self, name: str, default: Any = None) -> Any:
+        """Value of a field by display name or field ID."""
+        decoder = self._DECODERS.get(name)
+        value = getattr(self, decoder[0]) if decoder else None
+        return default if value is None else value
+
+    def to_fields(self) -> Dict[str, Any]:
+        """``{field name: value}`` in the API's JSON shape (empty fields omitted)."""
+        out = {}
+        for attr, _, name, _ in self.FIELDS:
+            value = getattr(self, attr)
+            if value is not None and value != ():
+                out[name] = to_json_value(value)
+        return out
+
+    def as_record(self) -> Dict[str, Any]:
+        """The record as ``{"id", "createdTime", "fields"}`` keyed by current field names."""
+        return {"id": self.id, "createdTime": to_json_value(self.created_time), "fields": self.to_fields()}
+
+    def __repr__(self) -> str:
+        values = ", ".join(
+            f"{attr}={getattr(self, attr)!r}" for attr in self._ATTRS if getattr(self, attr) not in (None, ())
+        )
+        return f"{type(self).__name__}(id={self.id!r}, {values})"
+
+
+def _raise_unknown(cls: Type[RecordBase], name: str) -> str:
+    raise KeyError(f"unknown field {name!r} in table {cls.TABLE_NAME!r}")
+
+
+def make_record_class(table: TableSchema) -> Type[RecordBase]:
+    """Builds the record class of ``table`` at runtime (same shape as the generated one)."""
+    return type(
+        identifier(table.name),
+        (RecordBase,),
+        {
+            "__slots__": tuple(spec.attr for spec in table.fields),
+            "__module__": __name__,
+            "__doc__": f"{table.name} ({table.id}).",
+            "TABLE_ID": table.id,
+            "TABLE_NAME": table.name,
+            "FIELDS": tuple((spec.attr, spec.id, spec.name, spec.type) for spec in table.fields),
+        },
+    )
+
+
+def render_module(schema: BaseSchema) -> str:
+    """Source of a module with one ``RecordBase`` subclass per table."""
+    lines = [
+        f'"""Record classes of base {schema.base_id}.',
+        "",
+        "Generated by scripts/generate_airtable_schema.py; do not edit.",
+        f"Schema fingerprint {schema.fingerprint}.",
+        '"""',
+        "",
+        "from datetime import date, datetime  # noqa: F401",
+        "from typing import Any, Dict, Optional, Tuple, Type  # noqa: F401",
+        "",
+        "from .airtable_schema import RecordBase",
+        "",
+        f"BASE_ID = {schema.base_id!r}",
+        f"SCHEMA_FINGERPRINT = {schema.fingerprint!r}",
+    ]
+    names = {}
+    for table in schema.tables:
+        class_name = identifier(table.name)
+        names[table.name] = class_name
+        lines += ["", "", f"class {class_name}(RecordBase):", f'    """{table.name} ({table.id})."""', ""]
+        lines.append("    __slots__ = (")
+        lines += [f"        {spec.attr!r}," for spec in table.fields]
+        lines += ["    )", ""]
+        lines += [
+            f"    {spec.attr}: {annotation(spec.type)}  # {spec.type}"
+            for spec in table.fields
+        ]
+        lines += ["", f"    TABLE_ID = {table.id!r}", f"    TABLE_NAME = {table.name!r}", "    FIELDS = ("]
+        lines += [
+            f"        ({spec.attr!r}, {spec.id!r}, {spec.name!r}, {spec.type!r}),"
+            for spec in table.fields
+        ]
+        lines.append("    )")
+    lines += ["", "", "RECORD_CLASSES: Dict[str, Type[RecordBase]] = {"]
+    lines += [f"    {table!r}: {class_name}," for table, class_name in names.items()]
+    lines += ["}", ""]
+    return "\n".join(lines)
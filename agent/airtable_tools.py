@@ -1,53 +1,241 @@
-import os
-import requests
-from typing import Any, Dict, List, Optional
-from urllib.parse import urlencode
+import hashlib
+import logging
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Type
 from datetime import date
-from airtable import Airtable
 
-try:
-    from dotenv import load_dotenv  # type: ignore
+from .airtable_cache import get_cache
+from .airtable_client import AirtableError, get_client
+from .airtable_mirror import get_mirror, project_fields
+from .airtable_outbox import _is_permanent, get_outbox, resume_outbox
+from .airtable_query import (
+    Query,
+    any_of,
+    contains,
+    date_range,
+    eq,
+    linked_contains,
+    ne,
+    on_day,
+    record_id_in,
+)
+from .airtable_schema import DEFAULT_SCHEMA_PATH, BaseSchema, RecordBase, SchemaCache
+from .instrumentation import record_cache, record_query, run_in_context
+from .link_resolver import LinkResolver, LinkSchema, format_expanded
+from .planting_analytics import AnalyticsUnavailable, PlantingAnalytics
+from .planting_analytics import SOURCE_TABLES as PLANTING_SOURCE_TABLES
+from .result_pages import get_result_pages
+from .settings import TenantLocal, get_settings, getenv
+from .singleflight import get_singleflight
+from .task_digest import DEFAULT_DIGEST_PATH, TaskDigest
+from .text_index import TableIndex, ngrams, normalize
+
+logger = logging.getLogger(__name__)
+
+# 認証情報・Base ID は import 時ではなく最初のリクエスト時に settings から解決する
+# (未設定の場合はその時点で EnvironmentError)
 
-    load_dotenv()
-except ModuleNotFoundError:  # pragma: no cover – optional dependency
-    # dotenv is optional; skip loading .env if the library isn't available.
-    pass
 
 # ---------------------------------------------------------------------------
-# Shared config helpers
+# Internal request helpers
 # ---------------------------------------------------------------------------
 
-_AIRTABLE_API_KEY = os.getenv("AIRTABLE_API_KEY") or os.getenv("AIRTABLE_PAT")
-_AIRTABLE_BASE_ID = os.getenv("AIRTABLE_BASE_ID")
 
-if not _AIRTABLE_API_KEY:
-    raise EnvironmentError("AIRTABLE_API_KEY is not set. Add it to your environment or .env file.")
-if not _AIRTABLE_BASE_ID:
-    raise EnvironmentError("AIRTABLE_BASE_ID is not set. Add it to your environment or .env file.")
+def _request_json(method: str, url: str, **kwargs) -> Dict[str, Any]:
+    """Sends a request through the shared pooled client and returns JSON.
 
+    Rate limiting, retries and timeouts are handled by ``AirtableClient``;
+    any non-2xx response that survives the retries raises ``AirtableError``.
+    """
+
+    return get_client().request_json(method, url, **kwargs)
 
-_HEADERS = {
-    "Authorization": f"Bearer {_AIRTABLE_API_KEY}",
-    "Content-Type": "application/json",
-}
 
+# Airtable の list API は 1 リクエスト最大 100 件
+_MAX_PAGE_SIZE = 100
 
-class AirtableError(RuntimeError):
-    """Raised for any non-2xx response from the Airtable API."""
+
+def _table_url(table_name: str) -> str:
+    return get_settings().table_url(table_name)
+
+
+def _meta_url(table_id: Optional[str] = None) -> str:
+    return get_settings().meta_url(table_id)
 
 
 # ---------------------------------------------------------------------------
-# Internal request helpers
+# Write notifications
 # ---------------------------------------------------------------------------
 
+WriteListener = Callable[[str, str, List[Dict[str, Any]]], None]
+_WRITE_LISTENERS: List[WriteListener] = []
 
-def _request_json(method: str, url: str, **kwargs) -> Dict[str, Any]:
-    """Wrapper around requests.request that raises on errors and returns JSON."""
 
-    resp = requests.request(method, url, headers=_HEADERS, timeout=30, **kwargs)
-    if not resp.ok:
-        raise AirtableError(f"Airtable API error {resp.status_code}: {resp.text}")
-    return resp.json()
+def register_write_listener(listener: WriteListener) -> None:
+    """Registers a callback run after every successful write made by this module.
+
+    The callback receives ``(table_name, action, records)`` where ``action`` is
+    ``"create"``, ``"update"`` or ``"delete"`` and ``records`` are the records
+    returned by Airtable (``{"id": ...}`` only, for deletes).
+    """
+    if listener not in _WRITE_LISTENERS:
+        _WRITE_LISTENERS.append(listener)
+
+
+def _notify_write(table_name: str, action: str, records: List[Dict[str, Any]]) -> None:
+    if not records:
+        return
+    for listener in list(_WRITE_LISTENERS):
+        try:
+            listener(table_name, action, records)
+        except Exception:  # 書き込み自体は成功しているのでリスナーの失敗は記録のみ
+            logger.exception("write listener failed for %s", table_name)
+
+
+def _invalidate_cache(table_name: str, action: str, records: List[Dict[str, Any]]) -> None:
+    get_cache().invalidate_table(table_name)
+
+
+register_write_listener(_invalidate_cache)
+
+
+# ---------------------------------------------------------------------------
+# Read mode – Airtable API or local SQLite mirror
+# ---------------------------------------------------------------------------
+
+# "api": 常に Airtable API / "mirror": 同期済みテーブルはミラーから読む /
+# "auto": API を優先し、失敗したときだけミラーにフォールバック
+_READ_MODES = ("api", "mirror", "auto")
+# set_read_mode() による上書き (空文字は AIRTABLE_READ_MODE に従う)。農場ごとに持つ
+_read_modes: TenantLocal[str] = TenantLocal(str)
+
+
+def set_read_mode(mode: Optional[str]) -> None:
+    """Overrides ``AIRTABLE_READ_MODE`` for the current tenant.
+
+    ``None`` restores the environment setting.
+    """
+    if mode is not None and mode not in _READ_MODES:
+        raise ValueError(f"read mode must be one of {_READ_MODES}")
+    _read_modes.set(mode)
+
+
+def get_read_mode() -> str:
+    mode = _read_modes.get() or getenv("AIRTABLE_READ_MODE") or "api"
+    return mode if mode in _READ_MODES else "api"
+
+
+def _update_mirror(table_name: str, action: str, records: List[Dict[str, Any]]) -> None:
+    # ミラーを使うモードのときだけ、自プロセスの書き込みを即時反映する
+    if get_read_mode() != "api":
+        get_mirror().apply_write(table_name, action, records)
+
+
+register_write_listener(_update_mirror)
+
+
+def airtable_sync_mirror(
+    tables: Optional[List[str]] = None,
+    full: bool = False,
+) -> Dict[str, Any]:
+    """Syncs the local SQLite mirror (changed records only, unless ``full``).
+
+    Args:
+        tables: Optional table names to sync. Defaults to every table in the base.
+        full: Re-download every record instead of only those modified since
+            the last sync.
+
+    Returns:
+        Dict with per-table sync statistics under ``tables``.
+    """
+    return {"status": "success", "tables": get_mirror().sync(tables, full=full)}
+
+
+def airtable_cache_stats() -> Dict[str, Any]:
+    """Returns hit/miss statistics of the master-table read cache."""
+    return {"status": "success", "cache": get_cache().stats()}
+
+
+def airtable_singleflight_stats() -> Dict[str, Any]:
+    """Returns how many concurrent identical reads were coalesced into one request."""
+    return {"status": "success", "singleflight": get_singleflight().stats()}
+
+
+def airtable_outbox_status(limit: int = 20) -> Dict[str, Any]:
+    """Returns outbox counts and the oldest pending / failed write entries.
+
+    Args:
+        limit: Max entries to list per status.
+    """
+    outbox = get_outbox(start_worker=False)
+    return {
+        "status": "success",
+        "outbox": outbox.stats(),
+        "pending": outbox.pending(limit),
+        "failed": outbox.failed(limit),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Write mode – direct API call or durable outbox
+# ---------------------------------------------------------------------------
+
+# "direct": 常に同期で書き込む / "outbox": ローカルの送信キューに積んで即時応答 /
+# "auto": 同期で書き込み、429・5xx・通信エラーで失敗したときだけキューに積む
+_WRITE_MODES = ("direct", "outbox", "auto")
+
+
+def _write_mode() -> str:
+    mode = getenv("AIRTABLE_WRITE_MODE") or "auto"
+    return mode if mode in _WRITE_MODES else "auto"
+
+
+def _write_record(
+    table_name: str,
+    action: str,
+    fields: Dict[str, Any],
+    record_id: Optional[str] = None,
+    idempotency_key: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Creates / updates a record according to the write mode.
+
+    Returns ``{"status": "success", "record_id": ...}`` for a completed write or
+    ``{"status": "queued", "outbox_id": ...}`` when it was left to the outbox.
+    Permanent API errors (invalid fields etc.) are raised in every mode.
+    """
+    mode = _write_mode()
+    # 再起動前に積まれたまま残っている書き込みは、最初の書き込みの時点で配信を再開する
+    resume_outbox()
+    # 同じレコードへの更新がキューに残っている間は順序を保つためキューに積む
+    queued_before = (
+        mode == "auto"
+        and action == "update"
+        and get_outbox(start_worker=False).has_pending(table_name, record_id)
+    )
+    if mode != "outbox" and not queued_before:
+        try:
+            if action == "create":
+                result = airtable_create_record(table_name, fields)
+            else:
+                result = airtable_update_record(table_name, record_id, fields)
+            return {"status": "success", "record_id": result.get("record", {}).get("id")}
+        except AirtableError as e:
+            if mode == "direct" or _is_permanent(e):
+                raise
+            logger.warning("write to %s failed (%s); queued in the outbox", table_name, e)
+    entry = get_outbox().enqueue(
+        table_name, action, fields, record_id=record_id, idempotency_key=idempotency_key
+    )
+    return {"status": "queued", "outbox_id": entry["id"]}
+
+
+def _report_key(reporter_name: str, content: str, report_date: str) -> str:
+    # 同じ報告が二重に送られても日報を重複させない
+    digest = hashlib.sha256(f"{reporter_name}\n{content}".encode("utf-8")).hexdigest()[:16]
+    return f"日報ログ:{report_date}:{digest}"
 
 
 # ---------------------------------------------------------------------------
@@ -55,36 +243,139 @@ def _request_json(method: str, url: str, **kwargs) -> Dict[str, Any]:
 # ---------------------------------------------------------------------------
 
 
+def _list_params(
+    view: Optional[str] = None,
+    filter_formula: Optional[str] = None,
+    fields: Optional[List[str]] = None,
+    sort: Optional[List[Dict[str, str]]] = None,
+    page_size: Optional[int] = None,
+    max_records: Optional[int] = None,
+    cell_format: Optional[str] = None,
+    time_zone: Optional[str] = None,
+    user_locale: Optional[str] = None,
+) -> List[Tuple[str, str]]:
+    """Builds the query string for the list-records endpoint.
+
+    ``fields`` and ``sort`` use Airtable's bracketed array syntax
+    (``fields[]=...``, ``sort[0][field]=...``), so a list of pairs is
+    returned instead of a dict.
+    """
+    params: List[Tuple[str, str]] = []
+    if view:
+        params.append(("view", view))
+    if filter_formula:
+        params.append(("filterByFormula", filter_formula))
+    for name in fields or []:
+        params.append(("fields[]", name))
+    for i, spec in enumerate(sort or []):
+        params.append((f"sort[{i}][field]", spec["field"]))
+        params.append((f"sort[{i}][direction]", spec.get("direction", "asc")))
+    if page_size is not None:
+        params.append(("pageSize", str(min(page_size, _MAX_PAGE_SIZE))))
+    if max_records is not None:
+        params.append(("maxRecords", str(max_records)))
+    if cell_format:
+        params.append(("cellFormat", cell_format))
+        # cellFormat=string では timeZone と userLocale が必須
+        if cell_format == "string":
+            params.append(("timeZone", time_zone or "Asia/Tokyo"))
+            params.append(("userLocale", user_locale or "ja"))
+    return params
+
+
+def _iter_pages(url: str, params: List[Tuple[str, str]]) -> Iterator[List[Dict[str, Any]]]:
+    """Yields one page of records at a time, following Airtable's ``offset``."""
+    offset: Optional[str] = None
+    while True:
+        page_params = params + [("offset", offset)] if offset else params
+        data = _request_json("GET", url, params=page_params)
+        yield data.get("records", [])
+        offset = data.get("offset")
+        if not offset:
+            return
+
+
+def airtable_iter_records(
+    table_name: str,
+    view: Optional[str] = None,
+    filter_formula: Optional[str] = None,
+    fields: Optional[List[str]] = None,
+    sort: Optional[List[Dict[str, str]]] = None,
+    page_size: Optional[int] = None,
+    max_records: Optional[int] = None,
+    cell_format: Optional[str] = None,
+    time_zone: Optional[str] = None,
+    user_locale: Optional[str] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Streams records from a table, fetching the next page only when needed.
+
+    Only one page (at most 100 records) is held in memory at a time, so this is
+    safe to use on tables of any size.
+
+    Args:
+        table_name: The name of the table to query.
+        view: Optional view name to use for ordering/filtering.
+        filter_formula: Optional Airtable formula string for filtering.
+        fields: Field names to return. Other fields are not transferred.
+        sort: Sort specs, e.g. ``[{"field": "予定日", "direction": "desc"}]``.
+        page_size: Records per request (1-100, Airtable default 100).
+        max_records: Stop after this many records in total.
+        cell_format: ``"json"`` (default) or ``"string"``.
+        time_zone: Time zone for ``cell_format="string"`` (default Asia/Tokyo).
+        user_locale: Locale for ``cell_format="string"`` (default ja).
+
+    Yields:
+        Record dicts with ``id``, ``createdTime`` and ``fields``.
+    """
+    params = _list_params(
+        view=view,
+        filter_formula=filter_formula,
+        fields=fields,
+        sort=sort,
+        page_size=page_size,
+        max_records=max_records,
+        cell_format=cell_format,
+        time_zone=time_zone,
+        user_locale=user_locale,
+    )
+    for page in _iter_pages(_table_url(table_name), params):
+        yield from page
+
+
 def airtable_get_records(
     table_name: str,
     view: Optional[str] = None,
     filter_formula: Optional[str] = None,
     max_records: Optional[int] = None,
+    fields: Optional[List[str]] = None,
+    sort: Optional[List[Dict[str, str]]] = None,
 ) -> Dict[str, Any]:
     """Fetches records from an Airtable table.
 
+    All pages are followed, so tables larger than 100 records are returned in
+    full (up to ``max_records``). Use ``airtable_iter_records`` to stream large
+    tables instead of collecting them into a list.
+
     Args:
         table_name: The name of the table to query.
         view: Optional view name to use for ordering/filtering.
         filter_formula: Optional Airtable formula string for filtering.
         max_records: Optional maximum number of records to return.
+        fields: Optional list of field names to return.
+        sort: Optional sort specs, e.g. ``[{"field": "予定日"}]``.
 
     Returns:
         A dict containing a list of records under the key ``records``.
     """
 
-    params = {}
-    if view:
-        params["view"] = view
-    if filter_formula:
-        params["filterByFormula"] = filter_formula
-    if max_records is not None:
-        params["maxRecords"] = str(max_records)
-
-    query = urlencode(params)
-    url = f"https://api.airtable.com/v0/{_AIRTABLE_BASE_ID}/{table_name}?{query}"
-    data = _request_json("GET", url)
-    return {"status": "success", "records": data.get("records", [])}
+    records = _get_table(table_name).get_all(
+        formula=filter_formula,
+        view=view,
+        fields=fields,
+        sort=sort,
+        max_records=max_records,
+    )
+    return {"status": "success", "records": records}
 
 
 def airtable_create_record(table_name: str, fields: Dict[str, Any]) -> Dict[str, Any]:
@@ -94,9 +385,10 @@ def airtable_create_record(table_name: str, fields: Dict[str, Any]) -> Dict[str,
         table_name: Target table.
         fields: Dict of field name -> value.
     """
-    url = f"https://api.airtable.com/v0/{_AIRTABLE_BASE_ID}/{table_name}"
+    url = _table_url(table_name)
     payload = {"fields": fields}
     data = _request_json("POST", url, json=payload)
+    _notify_write(table_name, "create", [data])
     return {"status": "success", "record": data}
 
 
@@ -112,24 +404,185 @@ def airtable_update_record(
         record_id: The Airtable record ID (rec...)
         fields: Partial set of fields to update.
     """
-    url = f"https://api.airtable.com/v0/{_AIRTABLE_BASE_ID}/{table_name}/{record_id}"
+    url = f"{_table_url(table_name)}/{record_id}"
     payload = {"fields": fields}
     data = _request_json("PATCH", url, json=payload)
+    _notify_write(table_name, "update", [data])
     return {"status": "success", "record": data}
 
 
 def airtable_delete_record(table_name: str, record_id: str) -> Dict[str, Any]:
     """Deletes a record from a table."""
-    url = f"https://api.airtable.com/v0/{_AIRTABLE_BASE_ID}/{table_name}/{record_id}"
+    url = f"{_table_url(table_name)}/{record_id}"
     _request_json("DELETE", url)
+    _notify_write(table_name, "delete", [{"id": record_id}])
     return {"status": "success", "deleted_record_id": record_id}
 
 
 # ---------------------------------------------------------------------------
-# TABLE-LEVEL (SCHEMA) OPERATIONS – Metadata API (PAT required)
+# BATCH OPERATIONS – up to 10 records per request
 # ---------------------------------------------------------------------------
 
-_META_BASE = f"https://api.airtable.com/v0/meta/bases/{_AIRTABLE_BASE_ID}/tables"
+# Airtable の作成・更新・削除 API は 1 リクエスト最大 10 件
+_BATCH_SIZE = 10
+
+
+def _chunked(items: List[Any], size: int = _BATCH_SIZE) -> List[List[Any]]:
+    return [items[i : i + size] for i in range(0, len(items), size)]
+
+
+def _dispatch_batches(
+    items: List[Any],
+    send: Callable[[List[Any]], List[Dict[str, Any]]],
+) -> Dict[str, Any]:
+    """Sends ``items`` in 10-record chunks concurrently and merges the results.
+
+    ``send`` receives one chunk and returns one result dict per item, in order.
+    Chunks run on a thread pool no larger than the HTTP connection pool; the
+    shared client's token bucket keeps the overall rate within Airtable's
+    per-base limit. A failing chunk marks only its own records as failed.
+
+    Returns:
+        ``{"status": "success" | "partial" | "error", "results": [...]}`` where
+        ``results[i]`` describes ``items[i]`` and always carries ``index`` and
+        ``status``, plus ``id``/``record`` on success or ``error`` on failure.
+    """
+    chunks = _chunked(items)
+    results: List[Dict[str, Any]] = [{} for _ in items]
+    if chunks:
+        workers = min(len(chunks), get_client().config.pool_size)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(run_in_context(send), chunk): n for n, chunk in enumerate(chunks)
+            }
+            for future in as_completed(futures):
+                start = futures[future] * _BATCH_SIZE
+                try:
+                    chunk_results = future.result()
+                except AirtableError as e:
+                    size = len(chunks[futures[future]])
+                    chunk_results = [{"status": "error", "error": str(e)}] * size
+                for offset, result in enumerate(chunk_results):
+                    results[start + offset] = {"index": start + offset, **result}
+
+    return _batch_summary(results)
+
+
+def _batch_summary(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    failed = sum(1 for r in results if r["status"] != "success")
+    if failed == 0:
+        status = "success"
+    elif failed == len(results):
+        status = "error"
+    else:
+        status = "partial"
+    return {"status": status, "results": results}
+
+
+def _record_results(records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [{"status": "success", "id": rec.get("id"), "record": rec} for rec in records]
+
+
+def _succeeded_records(result: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [
+        r.get("record") or {"id": r["id"]} for r in result["results"] if r["status"] == "success"
+    ]
+
+
+def airtable_batch_create_records(
+    table_name: str,
+    records: List[Dict[str, Any]],
+    typecast: bool = False,
+) -> Dict[str, Any]:
+    """Creates any number of records, 10 per request, with chunks sent concurrently.
+
+    Args:
+        table_name: Target table.
+        records: List of field dicts (field name -> value), one per record.
+        typecast: Let Airtable convert string values to the field types.
+
+    Returns:
+        Dict with an overall ``status`` and per-record ``results``.
+    """
+    url = _table_url(table_name)
+
+    def send(chunk: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        payload = {"records": [{"fields": fields} for fields in chunk], "typecast": typecast}
+        data = _request_json("POST", url, json=payload)
+        return _record_results(data.get("records", []))
+
+    result = _dispatch_batches(records, send)
+    _notify_write(table_name, "create", _succeeded_records(result))
+    return result
+
+
+def airtable_batch_update_records(
+    table_name: str,
+    records: List[Dict[str, Any]],
+    upsert_fields: Optional[List[str]] = None,
+    typecast: bool = False,
+) -> Dict[str, Any]:
+    """Updates (or upserts) any number of records, 10 per request.
+
+    Args:
+        table_name: Target table.
+        records: ``[{"id": "rec...", "fields": {...}}, ...]``. With
+            ``upsert_fields`` the ``id`` may be omitted.
+        upsert_fields: Field names to merge on (``performUpsert``), e.g.
+            ``["圃場ID"]``. Records whose merge fields match an existing record
+            update it; the rest are created.
+        typecast: Let Airtable convert string values to the field types.
+
+    Returns:
+        Dict with an overall ``status`` and per-record ``results``. In upsert
+        mode each successful result also has ``created`` (True/False).
+    """
+    url = _table_url(table_name)
+
+    def send(chunk: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        payload: Dict[str, Any] = {"records": chunk, "typecast": typecast}
+        if upsert_fields:
+            payload["performUpsert"] = {"fieldsToMergeOn": upsert_fields}
+        data = _request_json("PATCH", url, json=payload)
+        results = _record_results(data.get("records", []))
+        if upsert_fields:
+            created = set(data.get("createdRecords", []))
+            for result in results:
+                result["created"] = result["id"] in created
+        return results
+
+    result = _dispatch_batches(records, send)
+    _notify_write(table_name, "update", _succeeded_records(result))
+    return result
+
+
+def airtable_batch_delete_records(table_name: str, record_ids: List[str]) -> Dict[str, Any]:
+    """Deletes any number of records, 10 per request.
+
+    Returns:
+        Dict with an overall ``status`` and per-record ``results``.
+    """
+    url = _table_url(table_name)
+
+    def send(chunk: List[str]) -> List[Dict[str, Any]]:
+        params = [("records[]", record_id) for record_id in chunk]
+        data = _request_json("DELETE", url, params=params)
+        deleted = {rec.get("id"): rec.get("deleted", False) for rec in data.get("records", [])}
+        return [
+            {"status": "success", "id": record_id}
+            if deleted.get(record_id)
+            else {"status": "error", "id": record_id, "error": "not deleted"}
+            for record_id in chunk
+        ]
+
+    result = _dispatch_batches(record_ids, send)
+    _notify_write(table_name, "delete", _succeeded_records(result))
+    return result
+
+
+# ---------------------------------------------------------------------------
+# TABLE-LEVEL (SCHEMA) OPERATIONS – Metadata API (PAT required)
+# ---------------------------------------------------------------------------
 
 
 def airtable_create_table(
@@ -154,7 +607,8 @@ def airtable_create_table(
         "name": table_name,
         "fields": fields,
     }
-    data = _request_json("POST", _META_BASE, json=payload)
+    data = _request_json("POST", _meta_url(), json=payload)
+    _invalidate_base_schema()
     return {"status": "success", "table": data}
 
 
@@ -178,29 +632,328 @@ def airtable_update_table(
     if fields is not None:
         payload["fields"] = fields
 
-    url = f"{_META_BASE}/{table_id}"
-    data = _request_json("PATCH", url, json=payload)
+    data = _request_json("PATCH", _meta_url(table_id), json=payload)
+    _invalidate_base_schema()
     return {"status": "success", "table": data}
 
 
 def airtable_delete_table(table_id: str) -> Dict[str, Any]:
     """Deletes (permanently) a table from the base."""
-    url = f"{_META_BASE}/{table_id}"
-    _request_json("DELETE", url)
+    _request_json("DELETE", _meta_url(table_id))
+    _invalidate_base_schema()
     return {"status": "success", "deleted_table_id": table_id}
 
 
 def airtable_list_tables() -> Dict[str, Any]:
     """Lists all tables in the base with their schema."""
-    data = _request_json("GET", _META_BASE)
+    data = _request_json("GET", _meta_url())
     return {"status": "success", "tables": data.get("tables", [])}
 
 
+# スキーマ (フィールド名 <-> フィールド ID) は JSON 成果物にキャッシュし、
+# AIRTABLE_SCHEMA_TTL 秒ごとにメタデータ API から取り直す
+def _new_schema_cache() -> SchemaCache:
+    return SchemaCache(
+        path=getenv("AIRTABLE_SCHEMA_PATH") or DEFAULT_SCHEMA_PATH,
+        ttl=float(getenv("AIRTABLE_SCHEMA_TTL") or 3600),
+        fetch=lambda: airtable_list_tables()["tables"],
+    )
+
+
+_schema_caches: TenantLocal[SchemaCache] = TenantLocal(_new_schema_cache)
+
+
+def _get_schema_cache() -> SchemaCache:
+    return _schema_caches.get()
+
+
+def _invalidate_base_schema() -> None:
+    schema_cache = _schema_caches.peek()
+    if schema_cache is not None:
+        schema_cache.invalidate()
+
+
+def airtable_base_schema(refresh: bool = False) -> Optional[BaseSchema]:
+    """Schema of the current base with name <-> field ID lookups.
+
+    Returns ``None`` when the metadata API is not available to the token
+    (retried after ``AIRTABLE_SCHEMA_TTL`` seconds). ``refresh`` fetches it
+    from the metadata API even if the cached artifact is still fresh.
+    """
+    schema_cache = _get_schema_cache()
+    if refresh:
+        schema_cache.invalidate()
+        schema_cache.unavailable_until = 0.0
+    if time.monotonic() < schema_cache.unavailable_until:
+        return None
+    try:
+        return schema_cache.get(get_settings().require_base_id())
+    except AirtableError as e:
+        logger.warning("base schema unavailable: %s", e)
+        schema_cache.unavailable_until = time.monotonic() + schema_cache.ttl
+        return None
+
+
+def _record_class(table_name: str) -> Optional[Type[RecordBase]]:
+    """Compact record class of a table, or ``None`` to read by field name.
+
+    The module written by ``scripts/generate_airtable_schema.py`` is used when
+    it matches the current schema; otherwise the class is built from the schema.
+    """
+    if getenv("AIRTABLE_FIELD_IDS") == "off":
+        return None
+    schema = airtable_base_schema()
+    if schema is None or not schema.has_table(table_name):
+        return None
+    try:
+        from . import airtable_records  # type: ignore[attr-defined]
+    except ImportError:
+        airtable_records = None
+    if airtable_records is not None and airtable_records.SCHEMA_FINGERPRINT == schema.fingerprint:
+        record_class = airtable_records.RECORD_CLASSES.get(schema.table(table_name).name)
+        if record_class is not None:
+            return record_class
+    return schema.record_class(table_name)
+
+
+def airtable_iter_typed_records(
+    table_name: str,
+    filter_formula: Optional[str] = None,
+    fields: Optional[List[str]] = None,
+    sort: Optional[List[Dict[str, str]]] = None,
+    max_records: Optional[int] = None,
+    record_class: Optional[Type[RecordBase]] = None,
+) -> Iterator[RecordBase]:
+    """Streams records as compact ``__slots__`` objects read by field ID.
+
+    Fields are requested with ``returnFieldsByFieldId=true`` and decoded into
+    the table's record class (dates, numbers and links are coerced). ``fields``
+    and ``sort`` take display names, ``filter_formula`` uses names as usual.
+    ``record_class`` overrides the class taken from the current schema.
+
+    Raises:
+        LookupError: If the base schema is unavailable or a field is unknown.
+    """
+    record_class = record_class or _record_class(table_name)
+    if record_class is None:
+        raise LookupError(f"no schema for table {table_name!r} (metadata API unavailable?)")
+    return _get_table(table_name).iter_typed(
+        record_class, formula=filter_formula, fields=fields, sort=sort, max_records=max_records
+    )
+
+
 # Helper to get Airtable client
 
+# 作業タスクの圃場名はルックアップフィールド
+_TASK_FIELD_LOOKUP = "圃場名 (from 圃場データ) (from 関連する作付計画)"
+
+# 各ツールが整形に使うフィールドだけを取得する (作付計画などの横に広い行を避ける)
+_TODAY_TASK_FIELDS = ["タスク名", _TASK_FIELD_LOOKUP]
+_SEARCH_TASK_FIELDS = ["タスク名", "予定日", _TASK_FIELD_LOOKUP]
+_MATERIAL_FIELDS = ["資材名", "メーカー", "規格・容量", "資材分類", "適用作物"]
+
 
-def _get_table(table_name: str) -> Airtable:
-    return Airtable(_AIRTABLE_BASE_ID, table_name, api_key=_AIRTABLE_API_KEY)
+def _query_key(
+    table_name: str,
+    formula: Optional[str],
+    view: Optional[str],
+    fields: Optional[List[str]],
+    sort: Optional[List[Dict[str, str]]],
+    max_records: Optional[int],
+) -> Tuple[Any, ...]:
+    """Hashable identity of a list-records query (read cache / single-flight key)."""
+    return (
+        table_name,
+        formula,
+        tuple(fields) if fields else None,
+        view,
+        tuple((spec["field"], spec.get("direction", "asc")) for spec in sort) if sort else None,
+        max_records,
+    )
+
+
+class _Table:
+    """Table handle with the ``get_all`` interface of ``airtable.Airtable``.
+
+    Requests go through the shared pooled client instead of a separate
+    per-table session, so domain tools and record helpers share connections
+    and the per-base rate limit.
+    """
+
+    def __init__(self, table_name: str):
+        self.table_name = table_name
+        self.url = _table_url(table_name)
+
+    def iter_all(
+        self,
+        formula: Optional[str] = None,
+        view: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+        sort: Optional[List[Dict[str, str]]] = None,
+        max_records: Optional[int] = None,
+        page_size: Optional[int] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        params = _list_params(
+            view=view,
+            filter_formula=formula,
+            fields=fields,
+            sort=sort,
+            page_size=page_size,
+            max_records=max_records,
+        )
+        for page in _iter_pages(self.url, params):
+            yield from page
+
+    def iter_typed(
+        self,
+        record_class: Type[RecordBase],
+        formula: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+        sort: Optional[List[Dict[str, str]]] = None,
+        max_records: Optional[int] = None,
+        page_size: Optional[int] = _MAX_PAGE_SIZE,
+    ) -> Iterator[RecordBase]:
+        """Like ``iter_all`` but keyed by field ID and decoded into ``record_class``."""
+        params = _list_params(
+            filter_formula=formula,
+            fields=record_class.field_ids(fields) if fields else None,
+            sort=sort,
+            page_size=page_size,
+            max_records=max_records,
+        )
+        params.append(("returnFieldsByFieldId", "true"))
+        decode = record_class.from_api
+        # フィールド名の誤りは (最初のページを待たずに) 呼び出し時に KeyError にする
+        return (decode(record) for page in _iter_pages(self.url, params) for record in page)
+
+    def get_all(
+        self,
+        formula: Optional[str] = None,
+        view: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+        sort: Optional[List[Dict[str, str]]] = None,
+        max_records: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """Returns all matching records, served from the read cache when fresh.
+
+        Only tables with a TTL configured in ``airtable_cache`` are cached. In
+        ``mirror`` read mode, synced tables are answered from the local SQLite
+        mirror; in ``auto`` mode the mirror is used only when the API fails.
+        """
+        started = time.perf_counter()
+        mode = get_read_mode()
+        if mode == "mirror" and get_mirror().has_table(self.table_name):
+            records = get_mirror().query(
+                self.table_name, formula=formula, fields=fields, sort=sort, max_records=max_records
+            )
+            record_query(self.table_name, "mirror", time.perf_counter() - started, len(records))
+            return records
+        try:
+            records, source = self._get_all_remote(formula, view, fields, sort, max_records)
+        except AirtableError:
+            if mode == "auto" and get_mirror().has_table(self.table_name):
+                records = get_mirror().query(
+                    self.table_name,
+                    formula=formula,
+                    fields=fields,
+                    sort=sort,
+                    max_records=max_records,
+                )
+                elapsed = time.perf_counter() - started
+                record_query(self.table_name, "mirror", elapsed, len(records))
+                return records
+            raise
+        record_query(self.table_name, source, time.perf_counter() - started, len(records))
+        return records
+
+    def _get_all_remote(
+        self,
+        formula: Optional[str],
+        view: Optional[str],
+        fields: Optional[List[str]],
+        sort: Optional[List[Dict[str, str]]],
+        max_records: Optional[int],
+    ) -> Tuple[List[Dict[str, Any]], str]:
+        """Returns the records and where they came from (``cache`` or ``api``)."""
+        cache = get_cache()
+        key = _query_key(self.table_name, formula, view, fields, sort, max_records)
+        records = cache.get(key)
+        # TTL が設定されていないテーブルはキャッシュ対象外なので数えない
+        if cache.ttl_for(self.table_name) > 0:
+            record_cache(self.table_name, records is not None)
+        source = "cache" if records is not None else "api"
+        if records is None:
+            generation = cache.generation(self.table_name)
+            # 同一クエリが同時に来た場合は 1 回の HTTP リクエストの結果を共有する。
+            # 世代もキーに含め、書き込み前に始まった取得には相乗りしない
+            records = get_singleflight().do(
+                (key, generation),
+                lambda: list(
+                    self.iter_all(
+                        formula=formula,
+                        view=view,
+                        fields=fields,
+                        sort=sort,
+                        max_records=max_records,
+                    )
+                ),
+            )
+            cache.set(key, self.table_name, records, generation)
+        return list(records), source
+
+
+def _get_table(table_name: str) -> _Table:
+    return _Table(table_name)
+
+
+def _first_value(value: Any) -> Any:
+    # ルックアップフィールドは配列で返ることがある
+    if isinstance(value, list):
+        return value[0] if value else "N/A"
+    return value or "N/A"
+
+
+def _today_tasks_query(day: str) -> Query:
+    return Query("作業タスク").where(on_day("予定日", day), ne("ステータス", "完了"))
+
+
+def _today_task_records(worker_name: Optional[str] = None) -> List[Dict[str, Any]]:
+    """今日予定の未完了タスクのレコード (ID 付き) を返す。"""
+    digest = _task_digest()
+    if digest is not None and worker_name and not _digest_has_workers():
+        # 担当者を取得できないダイジェストでは担当者別に答えられない
+        digest = None
+    tasks: Optional[List[Dict[str, Any]]] = None
+    if digest is not None:
+        try:
+            tasks = digest.tasks_for(worker_name)
+        except AirtableError as e:
+            # Airtable に届かないときは今日の最後のダイジェストで答え、それも無ければ
+            # 下の経路 (auto モードならミラーにフォールバック) で読む。4xx はダイジェスト
+            # の取得条件の問題なので、通常のクエリで読み直す
+            tasks = digest.snapshot_for(worker_name)
+            status = e.status_code or 0
+            client_error = 400 <= status < 500 and status != 429
+            if tasks is None and not client_error and get_read_mode() == "api":
+                raise
+            if client_error:
+                logger.warning("task digest unavailable, using the query path: %s", e)
+    if tasks is not None:
+        return [
+            {
+                "id": task["record_id"],
+                "fields": {"タスク名": task["task_name"], _TASK_FIELD_LOOKUP: task["field_name"]},
+            }
+            for task in tasks
+        ]
+
+    # 担当者による絞り込みはオプション
+    return (
+        _today_tasks_query(date.today().isoformat())
+        .where(linked_contains("担当者", worker_name) if worker_name else None)
+        .select(*_TODAY_TASK_FIELDS)
+        .run()
+    )
 
 
 def get_today_tasks(worker_name: Optional[str] = None) -> str:
@@ -210,21 +963,7 @@ def get_today_tasks(worker_name: Optional[str] = None) -> str:
         worker_name: 担当者名。省略した場合は担当者で絞り込みません。
     """
     try:
-        task_table = _get_table("作業タスク")
-        today = date.today().isoformat()
-
-        # --- フィルタ式を動的に組み立て ---
-        filters = [f"IS_SAME({{予定日}}, '{today}', 'day')", "NOT({ステータス} = '完了')"]
-
-        # 担当者による絞り込みはオプション
-        if worker_name:
-            sanitized_name = _sanitize_airtable_string(worker_name)
-            # 担当者フィールドが存在しない環境ではこの条件を追加しない
-            filters.append(f"FIND('{sanitized_name}', ARRAYJOIN({{担当者}}))")
-
-        filter_formula = "AND(" + ", ".join(filters) + ")"
-
-        tasks = task_table.get_all(formula=filter_formula)
+        tasks = _today_task_records(worker_name)
 
         if not tasks:
             if worker_name:
@@ -235,12 +974,7 @@ def get_today_tasks(worker_name: Optional[str] = None) -> str:
         for task in tasks:
             fields = task.get("fields", {})
             task_name = fields.get("タスク名", "N/A")
-            # 圃場名フィールドはルックアップのため配列で返ることがある
-            field_val = fields.get("圃場名 (from 圃場データ) (from 関連する作付計画)")
-            if isinstance(field_val, list):
-                field_name = field_val[0] if field_val else "N/A"
-            else:
-                field_name = field_val or "N/A"
+            field_name = _first_value(fields.get(_TASK_FIELD_LOOKUP))
             task_list.append(f"・{task_name} (圃場: {field_name})")
 
         header = f"{worker_name}さんの本日のタスク:" if worker_name else "本日のタスク:"
@@ -249,15 +983,48 @@ def get_today_tasks(worker_name: Optional[str] = None) -> str:
         return f"タスクの取得中にエラーが発生しました: {e}"
 
 
+# リンク先テーブル・主フィールドのメタデータ (スキーマの fingerprint が変わったら作り直す)
+_link_schemas: TenantLocal[Dict[str, LinkSchema]] = TenantLocal(dict)
+_LINK_SCHEMA_LOCK = threading.Lock()
+
+
+def _link_schema() -> LinkSchema:
+    base_schema = airtable_base_schema()
+    # メタデータ API を使えないトークンではリンクを展開しない
+    fingerprint = base_schema.fingerprint if base_schema is not None else ""
+    cached = _link_schemas.get()
+    with _LINK_SCHEMA_LOCK:
+        if fingerprint not in cached:
+            cached.clear()
+            cached[fingerprint] = (
+                LinkSchema.from_tables(base_schema.tables_api()) if base_schema else LinkSchema()
+            )
+        return cached[fingerprint]
+
+
+def _link_resolver() -> LinkResolver:
+    """Returns a resolver for one tool call (its record cache is per request)."""
+
+    def fetch(table_name: str, formula: str, fields: Optional[List[str]]) -> List[Dict[str, Any]]:
+        return _get_table(table_name).get_all(formula=formula, fields=fields)
+
+    return LinkResolver(_link_schema(), fetch)
+
+
 def get_field_info(field_name: str) -> str:
-    """圃場名（`作業場所`）を指定して、関連する作付け情報や土壌データを取得する。"""
+    """圃場名（`作業場所`）を指定して、関連する作付け情報や土壌データを取得する。
+
+    リンクされた作付計画・作物・作業タスクなどのレコードも展開して返す
+    (展開の深さは AIRTABLE_LINK_DEPTH、既定 2)。
+    """
     try:
-        table = _get_table("圃場マスタ")
-        records = table.get_all(formula=f"{{作業場所}} = '{field_name}'")
+        records = Query("圃場マスタ").where(eq("作業場所", field_name)).run()
         if not records:
             return f"「{field_name}」という名前の圃場は見つかりませんでした。"
         # 1つの圃場名に複数のレコードが返ることはないと想定
-        return f"圃場「{field_name}」の情報:\n{records[0]['fields']}"
+        depth = int(getenv("AIRTABLE_LINK_DEPTH") or 2)
+        expanded = _link_resolver().expand("圃場マスタ", records[:1], depth=depth)[0]
+        return f"圃場「{field_name}」の情報:\n" + "\n".join(format_expanded(expanded))
     except Exception as e:
         return f"エラー: 圃場情報の取得中に問題が発生しました - {e}"
 
@@ -279,9 +1046,11 @@ def create_daily_report(reporter_name: str, content: str) -> str:
             "報告者": reporter_name,
             "報告内容": content,
         }
-        result = airtable_create_record("日報ログ", fields)
-        record_id = result.get("record", {}).get("id")
-        return f"日報を作成しました。(レコードID: {record_id})"
+        key = _report_key(reporter_name, content, today_str)
+        result = _write_record("日報ログ", "create", fields, idempotency_key=key)
+        if result["status"] == "queued":
+            return f"日報を受け付けました。(受付番号: {result['outbox_id']})"
+        return f"日報を作成しました。(レコードID: {result['record_id']})"
     except AirtableError as e:
         return f"エラー: 日報の作成に失敗しました - {e}"
     except Exception as e:
@@ -301,18 +1070,395 @@ def update_task_status(record_id: str, status: str) -> str:
     try:
         # "作業タスク" テーブルの "ステータス" フィールドを更新
         fields = {"ステータス": status}
-        result = airtable_update_record("作業タスク", record_id, fields)
-        updated_id = result.get("record", {}).get("id")
-        return f"タスク(ID: {updated_id})のステータスを「{status}」に更新しました。"
+        result = _write_record("作業タスク", "update", fields, record_id=record_id)
+        if result["status"] == "queued":
+            return (
+                f"タスク(ID: {record_id})のステータスを「{status}」に更新する処理を受け付けました。"
+                f"(受付番号: {result['outbox_id']})"
+            )
+        return f"タスク(ID: {result['record_id']})のステータスを「{status}」に更新しました。"
     except AirtableError as e:
         return f"エラー: タスクステータスの更新に失敗しました - {e}"
     except Exception as e:
         return f"予期せぬエラーが発生しました: {e}"
 
 
-def _sanitize_airtable_string(value: str) -> str:
-    """Sanitize string for use in Airtable formulas to prevent injection."""
-    return value.replace("'", "\\'").replace('"', '\\"')
+def update_task_statuses(record_ids: List[str], status: str) -> str:
+    """複数の作業タスクのステータスをまとめて更新する。
+
+    10件ずつのバッチ更新を並行して送信するため、班全体のタスク完了などを
+    1回のツール呼び出しで処理できる。
+
+    Args:
+        record_ids: 更新対象の作業タスクのレコードIDのリスト。
+        status: 新しいステータス（例: "完了", "保留"）。
+
+    Returns:
+        処理結果を示すメッセージ文字列。失敗したIDがあれば併記する。
+    """
+    if not record_ids:
+        return "更新対象のタスクが指定されていません。"
+    try:
+        fields = {"ステータス": status}
+        resume_outbox()
+        # 送信キューに更新が残っているタスクは、後から古い更新で上書きされないようキューに積む
+        outbox = get_outbox(start_worker=False)
+        pending = outbox.pending_records("作業タスク", record_ids)
+        direct_ids = [record_id for record_id in record_ids if record_id not in pending]
+        for record_id in record_ids:
+            if record_id in pending:
+                outbox.enqueue("作業タスク", "update", fields, record_id=record_id)
+        queued = len(record_ids) - len(direct_ids)
+        if queued:
+            outbox.start()
+        failed: List[str] = []
+        if direct_ids:
+            records = [{"id": record_id, "fields": dict(fields)} for record_id in direct_ids]
+            result = airtable_batch_update_records("作業タスク", records)
+            failed = [
+                f"{direct_ids[r['index']]} ({r.get('error')})"
+                for r in result["results"]
+                if r["status"] != "success"
+            ]
+        succeeded = len(direct_ids) - len(failed)
+        message = f"{succeeded}件のタスクのステータスを「{status}」に更新しました。"
+        if queued:
+            message += f"\n{queued}件は先に受け付けた更新の後に反映します。"
+        if failed:
+            message += f"\n更新に失敗したタスク({len(failed)}件): " + ", ".join(failed)
+        return message
+    except Exception as e:
+        return f"予期せぬエラーが発生しました: {e}"
+
+
+# 報告文との照合で自動更新してよい最低スコアと次点との最小差、候補として示す最低スコア
+_MATCH_THRESHOLD = 0.6
+_MATCH_MARGIN = 0.2
+_MATCH_MIN = 0.3
+
+
+def _task_match_score(report: str, fields: Dict[str, Any]) -> float:
+    """報告文 (正規化済み) がタスクをどの程度言及しているかを 0〜1.25 で返す。
+
+    タスク名のバイグラムのうち報告文に含まれる割合を基本点とし、
+    圃場名が報告文に含まれていれば加点する。
+    """
+    name = normalize(fields.get("タスク名"))
+    if not name:
+        return 0.0
+    grams = ngrams(name, 2) or {name}
+    score = sum(1 for gram in grams if gram in report) / len(grams)
+    field_name = normalize(_first_value(fields.get(_TASK_FIELD_LOOKUP)))
+    if field_name and field_name != "n/a" and field_name in report:
+        score += 0.25
+    return score
+
+
+def _task_candidates(report: str, tasks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    candidates = []
+    for task in tasks:
+        fields = task.get("fields", {})
+        candidates.append(
+            {
+                "record_id": task["id"],
+                "task_name": fields.get("タスク名", "N/A"),
+                "field_name": _first_value(fields.get(_TASK_FIELD_LOOKUP)),
+                "score": round(_task_match_score(report, fields), 3),
+            }
+        )
+    candidates.sort(key=lambda c: (-c["score"], c["record_id"]))
+    return candidates
+
+
+def report_task_completion(reporter_name: str, text: str, status: str = "完了") -> Dict[str, Any]:
+    """作業完了の報告を日報に記録し、該当する今日のタスクのステータスを更新する。
+
+    日報の作成と報告者の今日のタスク取得を並行して行い、報告文とタスク名・
+    圃場名を照合して対象タスクを特定する。対象が一意に決まらない場合は
+    更新せず、候補タスクをレコードID付きで返すので、ユーザーに確認した上で
+    update_task_status を呼び出すこと。
+
+    Args:
+        reporter_name: 報告者の名前。
+        text: 報告内容のテキスト（例: "A-3の消毒作業、終わりました"）。
+        status: 設定するステータス。既定は "完了"。
+
+    Returns:
+        result ("updated" / "ambiguous" / "no_match" / "no_tasks" / "error")、
+        日報の作成結果 (daily_report)、更新したタスク (updated_task)、
+        候補タスク一覧 (candidates: record_id, task_name, field_name, score)、
+        ユーザー向けの message を含む辞書。
+    """
+    today_str = date.today().isoformat()
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        report_future = executor.submit(
+            run_in_context(_write_record),
+            "日報ログ",
+            "create",
+            {"報告日": today_str, "報告者": reporter_name, "報告内容": text},
+            idempotency_key=_report_key(reporter_name, text, today_str),
+        )
+        tasks_future = executor.submit(run_in_context(_today_task_records), reporter_name)
+
+        try:
+            daily_report: Dict[str, Any] = report_future.result()
+        except Exception as e:
+            daily_report = {"status": "error", "error": str(e)}
+        try:
+            tasks = tasks_future.result()
+        except Exception as e:
+            return {
+                "result": "error",
+                "daily_report": daily_report,
+                "updated_task": None,
+                "candidates": [],
+                "message": f"タスクの取得中にエラーが発生しました: {e}",
+            }
+
+    candidates = _task_candidates(normalize(text), tasks)
+    result: Dict[str, Any] = {
+        "result": "no_tasks",
+        "daily_report": daily_report,
+        "updated_task": None,
+        "candidates": candidates,
+    }
+    if daily_report["status"] == "success":
+        report_note = f"日報を作成しました。(レコードID: {daily_report['record_id']})"
+    elif daily_report["status"] == "queued":
+        report_note = f"日報を受け付けました。(受付番号: {daily_report['outbox_id']})"
+    else:
+        report_note = f"日報の作成に失敗しました - {daily_report['error']}"
+
+    if not candidates:
+        result["message"] = f"{report_note}\n{reporter_name}さんの本日の未完了タスクはありません。"
+        return result
+
+    best = candidates[0]
+    runner_up = candidates[1]["score"] if len(candidates) > 1 else 0.0
+    if best["score"] < _MATCH_MIN:
+        result["result"] = "no_match"
+        result["message"] = f"{report_note}\n報告内容に該当するタスクを特定できませんでした。"
+        return result
+    if best["score"] < _MATCH_THRESHOLD or best["score"] - runner_up < _MATCH_MARGIN:
+        result["result"] = "ambiguous"
+        result["candidates"] = [
+            c
+            for c in candidates
+            if c["score"] >= _MATCH_MIN and best["score"] - c["score"] < _MATCH_MARGIN
+        ]
+        result["message"] = (
+            f"{report_note}\n該当するタスクが複数あります。どのタスクか確認してください。"
+        )
+        return result
+
+    try:
+        write = _write_record(
+            "作業タスク", "update", {"ステータス": status}, record_id=best["record_id"]
+        )
+    except Exception as e:
+        result["result"] = "error"
+        result["message"] = f"{report_note}\nタスクステータスの更新に失敗しました - {e}"
+        return result
+    result["result"] = "updated"
+    result["updated_task"] = {**best, "status": status, "write": write["status"]}
+    result["message"] = (
+        f"{report_note}\nタスク「{best['task_name']}」(圃場: {best['field_name']})"
+        f"のステータスを「{status}」に更新しました。"
+    )
+    return result
+
+
+# ---------------------------------------------------------------------------
+# Today's task digest – prefetched per-worker task lists
+# ---------------------------------------------------------------------------
+
+_DIGEST_FIELDS = ["タスク名", _TASK_FIELD_LOOKUP]
+# 担当者フィールドはベースによっては無い (未知の fields[] は 422 になる)
+_DIGEST_WORKER_FIELD = "担当者"
+# RECORD_ID() の OR 条件で一度に取り直すレコード数 (URL 長の制限対策)
+_DIGEST_ID_CHUNK = 50
+
+
+def _digest_has_workers() -> bool:
+    """Whether 作業タスク has the 担当者 field (unknown without the metadata API)."""
+    schema = airtable_base_schema()
+    if schema is None or not schema.has_table("作業タスク"):
+        return False
+    try:
+        schema.table("作業タスク").spec(_DIGEST_WORKER_FIELD)
+    except KeyError:
+        return False
+    return True
+
+
+def _load_today_tasks(day: str, record_ids: Optional[List[str]]) -> Iterator[Dict[str, Any]]:
+    """Streams the day's unfinished tasks with linked values as display text."""
+    query = _today_tasks_query(day)
+    fields = _DIGEST_FIELDS + ([_DIGEST_WORKER_FIELD] if _digest_has_workers() else [])
+    id_chunks = _chunked(record_ids, _DIGEST_ID_CHUNK) if record_ids else [None]
+    for chunk in id_chunks:
+        yield from airtable_iter_records(
+            "作業タスク",
+            filter_formula=query.where(record_id_in(chunk) if chunk else None).formula,
+            fields=fields,
+            page_size=_MAX_PAGE_SIZE,
+            cell_format="string",
+        )
+
+
+def _new_task_digest() -> TaskDigest:
+    digest = TaskDigest(
+        _load_today_tasks,
+        path=getenv("AIRTABLE_TASK_DIGEST_PATH") or DEFAULT_DIGEST_PATH,
+        max_age=float(getenv("AIRTABLE_TASK_DIGEST_MAX_AGE") or 900),
+        place_field=_TASK_FIELD_LOOKUP,
+    )
+    refresh_at = getenv("AIRTABLE_TASK_DIGEST_AT")
+    if refresh_at:
+        digest.start_scheduler(refresh_at)
+    return digest
+
+
+_task_digests: TenantLocal[TaskDigest] = TenantLocal(_new_task_digest)
+
+
+def _task_digest() -> Optional[TaskDigest]:
+    """Returns the digest, or ``None`` when disabled (or reading from the mirror)."""
+    if (getenv("AIRTABLE_TASK_DIGEST") or "on") == "off" or get_read_mode() == "mirror":
+        return None
+    return _task_digests.get()
+
+
+def _update_task_digest(table_name: str, action: str, records: List[Dict[str, Any]]) -> None:
+    digest = _task_digests.peek()
+    if table_name == "作業タスク" and digest is not None:
+        digest.apply_write(action, records)
+
+
+register_write_listener(_update_task_digest)
+
+
+def airtable_refresh_task_digest() -> Dict[str, Any]:
+    """Rebuilds today's per-worker task digest with one paged query.
+
+    Returns:
+        Dict with the number of tasks and workers in the digest.
+    """
+    digest = _task_digest()
+    if digest is None:
+        return {"status": "error", "error": "task digest is disabled"}
+    return {"status": "success", "digest": digest.refresh()}
+
+
+# ---------------------------------------------------------------------------
+# Text search – in-process n-gram index
+# ---------------------------------------------------------------------------
+
+# "index": ローカルの n-gram インデックスで検索 / "formula": 従来どおり FIND() 式を送る
+_SEARCH_MODES = ("index", "formula")
+
+# テーブル -> (インデックス対象フィールドと重み, 保持するフィールド)
+_TEXT_INDEX_SPECS: Dict[str, Tuple[Dict[str, float], List[str]]] = {
+    "資材マスター": (
+        {"資材名": 3.0, "主成分": 2.0, "メーカー": 1.0, "資材分類": 0.5},
+        _MATERIAL_FIELDS + ["主成分"],
+    ),
+    "作業タスク": ({"タスク名": 1.0}, _SEARCH_TASK_FIELDS),
+}
+_TEXT_INDEXES: TenantLocal[Dict[str, TableIndex]] = TenantLocal(dict)
+_TEXT_INDEXES_LOCK = threading.Lock()
+
+
+def _search_mode() -> str:
+    mode = getenv("AIRTABLE_SEARCH_MODE") or "index"
+    return mode if mode in _SEARCH_MODES else "index"
+
+
+def _snapshot(table_name: str, fields: List[str]) -> Iterator[Dict[str, Any]]:
+    """Streams a projected snapshot of a table (from the mirror in mirror mode)."""
+    if get_read_mode() == "mirror" and get_mirror().has_table(table_name):
+        for record in get_mirror().iter_table(table_name):
+            yield project_fields(record, fields)
+        return
+    record_class = _record_class(table_name)
+    records: Optional[Iterator[RecordBase]] = None
+    if record_class is not None:
+        try:
+            # 長いフィールド名の代わりにフィールド ID で受け取る (転送量・名前変更に強い)
+            records = _get_table(table_name).iter_typed(record_class, fields=fields)
+        except KeyError as e:
+            logger.warning("reading %s by field name: %s", table_name, e)
+    if records is None:
+        yield from _get_table(table_name).iter_all(fields=fields, page_size=_MAX_PAGE_SIZE)
+    else:
+        for record in records:
+            yield record.as_record()
+
+
+def _text_index(table_name: str) -> TableIndex:
+    indexes = _TEXT_INDEXES.get()
+    index = indexes.get(table_name)
+    if index is None:
+        with _TEXT_INDEXES_LOCK:
+            index = indexes.get(table_name)
+            if index is None:
+                text_fields, stored_fields = _TEXT_INDEX_SPECS[table_name]
+                index = TableIndex(
+                    table_name,
+                    text_fields,
+                    stored_fields,
+                    loader=_snapshot,
+                    max_age=float(getenv("AIRTABLE_INDEX_MAX_AGE") or 300),
+                )
+                indexes[table_name] = index
+    return index
+
+
+def _update_text_indexes(table_name: str, action: str, records: List[Dict[str, Any]]) -> None:
+    index = _TEXT_INDEXES.get().get(table_name)
+    if index is not None:
+        index.apply_write(action, records)
+
+
+register_write_listener(_update_text_indexes)
+
+
+def _search_materials_by_formula(
+    query: str, category: Optional[str], crop: Optional[str]
+) -> List[Dict[str, Any]]:
+    records = (
+        Query("資材マスター")
+        .where(
+            # 複数のフィールドをORで検索
+            any_of(*(contains(name, query) for name in ("資材名", "主成分", "メーカー", "資材分類")))
+            if query
+            else None,
+            eq("資材分類", category) if category else None,
+            contains("適用作物", crop) if crop else None,
+        )
+        .select(*_MATERIAL_FIELDS)
+        .run()
+    )
+    # FIND() は一致度を返さないので、資材名に一致するものを先頭に並べる
+    query_n = normalize(query)
+    if not query_n:
+        return records
+    return sorted(records, key=lambda r: query_n not in normalize(r["fields"].get("資材名")))
+
+
+def _search_materials_by_index(
+    query: str, category: Optional[str], crop: Optional[str]
+) -> List[Dict[str, Any]]:
+    category_n = normalize(category)
+    crop_n = normalize(crop)
+
+    def where(record: Dict[str, Any]) -> bool:
+        fields = record["fields"]
+        if category_n and normalize(fields.get("資材分類")) != category_n:
+            return False
+        return not crop_n or crop_n in normalize(fields.get("適用作物"))
+
+    return [record for _, record in _text_index("資材マスター").search(query, where=where)]
 
 
 def search_materials(
@@ -322,63 +1468,118 @@ def search_materials(
 ) -> str:
     """資材マスターテーブルから、指定された条件で資材を検索する。
 
+    資材名・主成分・メーカー・資材分類を対象に、カタカナ/ひらがな・全角/半角の違いを
+    吸収した部分一致で検索し、一致度の高い順に返す。
+
     Args:
         query: 検索キーワード。資材名や主成分などを対象に部分一致で検索する。
         category: "農薬", "肥料" などの資材分類で絞り込む（任意）。
         crop: 適用作物名で絞り込む（任意）。
 
     Returns:
-        検索結果のリスト、または見つからなかった場合のメッセージ。
+        一致度の高い順の検索結果（最初のページ）。続きがある場合は末尾に
+        show_more_results 用の cursor を示す。見つからなかった場合はその旨のメッセージ。
     """
     try:
-        table = _get_table("資材マスター")
-
-        # フィルタ式を動的に構築
-        formulas = []
-        sanitized_query = _sanitize_airtable_string(query)
-        if sanitized_query:
-            # 複数のフィールドをORで検索
-            or_clauses = [
-                f"FIND('{sanitized_query}', {{資材名}})",
-                f"FIND('{sanitized_query}', {{主成分}})",
-                f"FIND('{sanitized_query}', {{メーカー}})",
-            ]
-            formulas.append(f"OR({', '.join(or_clauses)})")
-
-        if category:
-            sanitized_category = _sanitize_airtable_string(category)
-            formulas.append(f"{{資材分類}} = '{sanitized_category}'")
-
-        if crop:
-            sanitized_crop = _sanitize_airtable_string(crop)
-            formulas.append(f"FIND('{sanitized_crop}', {{適用作物}})")
-
-        if not formulas:
+        if not (query or category or crop):
             return "検索条件が指定されていません。"
 
-        filter_formula = f"AND({', '.join(formulas)})"
-
-        records = table.get_all(formula=filter_formula)
+        if _search_mode() == "index":
+            records = _search_materials_by_index(query, category, crop)
+        else:
+            records = _search_materials_by_formula(query, category, crop)
 
         if not records:
             return "条件に合う資材は見つかりませんでした。"
 
-        results = [f"「{query}」に一致する資材が{len(records)}件見つかりました："]
+        items = []
         for record in records:
             fields = record["fields"]
-            info = (
+            items.append(
                 f"- {fields.get('資材名', 'N/A')} "
-                f"({fields.get('メーカー', 'N/A')}, {fields.get('規格・容量', 'N/A')})\\n"
-                f"  分類: {fields.get('資材分類', 'N/A')}\\n"
+                f"({fields.get('メーカー', 'N/A')}, {fields.get('規格・容量', 'N/A')})\n"
+                f"  分類: {fields.get('資材分類', 'N/A')}\n"
                 f"  適用作物: {fields.get('適用作物', 'N/A')}"
             )
-            results.append(info)
-
-        return "\\n".join(results)
+        label = query or category or crop
+        header = f"「{label}」に一致する資材が{len(records)}件見つかりました ({{range}})："
+        return get_result_pages().first_page("資材マスター", header, items)
     except Exception as e:
         return f"エラー: 資材の検索中に予期せぬ問題が発生しました - {e}"
 
 
+def show_more_results(cursor: str) -> str:
+    """search_materials / search_tasks の検索結果の続き（次のページ）を表示する。
+
+    検索結果が多い場合、各検索ツールは最初のページだけを返し、末尾に
+    cursor を示す。ユーザーが「もっと見る」「続き」などと言ったら、その cursor を
+    指定して呼び出す。Airtable への再検索は行わない。
+
+    Args:
+        cursor: 直前の検索結果の末尾に示された cursor（例: "Xb3k9Qa1.10"）。
+
+    Returns:
+        次のページの検索結果、または有効期限切れの旨のメッセージ。
+    """
+    return get_result_pages().next_page(cursor)
+
+
+def _invalidate_result_pages(table_name: str, action: str, records: List[Dict[str, Any]]) -> None:
+    get_result_pages().invalidate_table(table_name)
+
+
+register_write_listener(_invalidate_result_pages)
+
+
+def _parse_month(month: str) -> str:
+    """月指定 ("7月", "2025-07" など) を "YYYY-MM" 形式に揃える。年未指定は当年。"""
+    if re.match(r"^\d{4}-\d{2}$", month):
+        return month
+    digits = re.sub(r"\D", "", month)
+    if len(digits) == 1:
+        digits = f"0{digits}"
+    return f"{date.today().year}-{digits}"
+
+
+def _month_range(ym_str: str) -> Tuple[date, date]:
+    """YYYY-MM 形式の月を [その月の 1 日, 翌月 1 日) の範囲に変換する。"""
+    year, month = (int(part) for part in ym_str.split("-"))
+    start = date(year, month, 1)
+    end = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+    return start, end
+
+
+def _search_tasks_by_formula(
+    task_keyword: str, ym_str: Optional[str], field_name: Optional[str]
+) -> List[Dict[str, Any]]:
+    return (
+        Query("作業タスク")
+        .where(
+            contains("タスク名", task_keyword),
+            # 月指定がある場合 → 予定日がその月の 1 日以上、翌月 1 日未満
+            date_range("予定日", *_month_range(ym_str)) if ym_str else None,
+            linked_contains(_TASK_FIELD_LOOKUP, field_name) if field_name else None,
+        )
+        .select(*_SEARCH_TASK_FIELDS)
+        .order_by("予定日")
+        .run()
+    )
+
+
+def _search_tasks_by_index(
+    task_keyword: str, ym_str: Optional[str], field_name: Optional[str]
+) -> List[Dict[str, Any]]:
+    field_n = normalize(field_name)
+
+    def where(record: Dict[str, Any]) -> bool:
+        fields = record["fields"]
+        if ym_str and not str(fields.get("予定日", "")).startswith(ym_str):
+            return False
+        return not field_n or field_n in normalize(fields.get(_TASK_FIELD_LOOKUP))
+
+    return [record for _, record in _text_index("作業タスク").search(task_keyword, where=where)]
+
+
 def search_tasks(
     task_keyword: str,
     month: Optional[str] = None,
@@ -392,58 +1593,100 @@ def search_tasks(
         field_name: 圃場名で絞り込む場合に指定。
 
     Returns:
-        ヒットしたタスク一覧または見つからない旨のメッセージ。
+        ヒットしたタスク一覧（最初のページ、続きがある場合は末尾に cursor）
+        または見つからない旨のメッセージ。
     """
     try:
-        table = _get_table("作業タスク")
-
         if not task_keyword:
             return "検索キーワードが指定されていません。"
 
-        formulas: list[str] = []
-        sanitized_kw = _sanitize_airtable_string(task_keyword)
-        formulas.append(f"FIND('{sanitized_kw}', {{タスク名}})")
-
-        # 月指定がある場合 → 予定日の YYYY-MM で一致を取る
-        if month:
-            # "7月" → "07", "2025-07" はそのまま
-            import re
-
-            if re.match(r"^\d{4}-\d{2}$", month):
-                ym_str = month
-            else:
-                digits = re.sub(r"\D", "", month)
-                if len(digits) == 1:
-                    digits = f"0{digits}"
-                # 年未指定 → 当年
-                ym_str = f"{date.today().year}-{digits}"
-            ym_safe = _sanitize_airtable_string(ym_str)
-            formulas.append(f"SEARCH('{ym_safe}', DATETIME_FORMAT({{予定日}}, 'YYYY-MM'))")
-
-        if field_name:
-            fname = _sanitize_airtable_string(field_name)
-            formulas.append(
-                f"FIND('{fname}', ARRAYJOIN({{圃場名 (from 圃場データ) (from 関連する作付計画)}}))"
-            )
-
-        filter_formula = "AND(" + ", ".join(formulas) + ")"
-        records = table.get_all(formula=filter_formula)
+        ym_str = _parse_month(month) if month else None
+        if _search_mode() == "index":
+            records = _search_tasks_by_index(task_keyword, ym_str, field_name)
+        else:
+            records = _search_tasks_by_formula(task_keyword, ym_str, field_name)
 
         if not records:
             return "条件に合うタスクは見つかりませんでした。"
 
-        lines: list[str] = [f"条件に合うタスクが {len(records)} 件見つかりました:"]
+        items = []
         for rec in records:
             flds = rec["fields"]
             tname = flds.get("タスク名", "N/A")
             sched = flds.get("予定日", "N/A")
-            fld_val = flds.get("圃場名 (from 圃場データ) (from 関連する作付計画)")
-            if isinstance(fld_val, list):
-                fld_disp = fld_val[0] if fld_val else "N/A"
-            else:
-                fld_disp = fld_val or "N/A"
-            lines.append(f"・{sched}: {tname} (圃場: {fld_disp})")
+            fld_disp = _first_value(flds.get(_TASK_FIELD_LOOKUP))
+            items.append(f"・{sched}: {tname} (圃場: {fld_disp})")
 
-        return "\n".join(lines)
+        header = f"条件に合うタスクが {len(records)} 件見つかりました ({{range}}):"
+        return get_result_pages().first_page("作業タスク", header, items)
     except Exception as e:
         return f"エラー: タスク検索中に問題が発生しました - {e}"
+
+
+# ---------------------------------------------------------------------------
+# 作付計画 analytics – area-weighted fertiliser / material totals
+# ---------------------------------------------------------------------------
+
+def _new_planting_analytics() -> PlantingAnalytics:
+    max_age = float(getenv("AIRTABLE_ANALYTICS_MAX_AGE") or 300)
+    return PlantingAnalytics(loader=_snapshot, max_age=max_age)
+
+
+_analytics: TenantLocal[PlantingAnalytics] = TenantLocal(_new_planting_analytics)
+
+
+def _planting_analytics() -> PlantingAnalytics:
+    return _analytics.get()
+
+
+def _invalidate_planting_analytics(
+    table_name: str, action: str, records: List[Dict[str, Any]]
+) -> None:
+    analytics = _analytics.peek()
+    if analytics is not None and table_name in PLANTING_SOURCE_TABLES:
+        analytics.invalidate()
+
+
+register_write_listener(_invalidate_planting_analytics)
+
+
+def summarize_planting_materials(
+    crop: Optional[str] = None,
+    month: Optional[str] = None,
+    area: Optional[str] = None,
+    material: Optional[str] = None,
+    kind: Optional[str] = None,
+    group_by: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    """作付計画の元肥計画・資材使用量から、必要な肥料・資材の量を集計する。
+
+    各作付計画の「元肥計画 (肥料名 kg/10a)」「資材使用量」の 10a あたりの量に
+    「作つけ面積 (ha)」を掛け、作物・エリア・圃場・月・資材ごとに合計する。
+    「今月、大豆の圃場全体で肥料はどれだけ要る？」のような質問に使う。
+
+    Args:
+        crop: 作物名で絞り込む（部分一致、任意）。
+        month: 定植（直播は播種）予定の月。"2025-07" 形式または "7月" など（任意）。
+        area: 圃場のエリアで絞り込む（任意）。
+        material: 肥料・資材名で絞り込む（部分一致、任意）。
+        kind: "元肥" または "資材" に限定する（任意）。
+        group_by: 集計の軸。"crop", "area", "field", "month", "material", "kind"
+            から選ぶ（既定は ["material"]）。量は単位 (kg, L など) ごとに分けて合計する。
+
+    Returns:
+        集計結果の辞書。rows に軸ごとの合計量 (amount)・面積 (area_ha)・計画数、
+        totals_by_unit に単位ごとの総量、unparsed に読み取れなかった行数を含む。
+    """
+    try:
+        return _planting_analytics().summarize(
+            group_by=group_by or ["material"],
+            crop=crop,
+            area=area,
+            month=_parse_month(month) if month else None,
+            material=material,
+            kind=kind,
+        )
+    except (AnalyticsUnavailable, ValueError) as e:
+        return {"status": "error", "error": str(e)}
+    except Exception as e:
+        return {"status": "error", "error": f"作付計画の集計中に予期せぬ問題が発生しました - {e}"}
@@ -0,0 +1,338 @@
+"""asyncio counterparts of the tools in ``airtable_tools``.
+
+The blocking tools hold ADK's event loop for the whole Airtable round trip, so
+a turn that needs tasks, field info and materials runs them one after another.
+The coroutines here can be awaited concurrently (ADK runs async tools of one
+turn in parallel) and share the connection pool and per-base rate limiter of
+the blocking client through ``AsyncAirtableClient``.
+
+* Record / metadata operations call the API directly with the async client;
+  batch operations dispatch their 10-record chunks with ``asyncio.gather``.
+* ``airtable_get_records`` shares the read cache and single-flight group with
+  the blocking read path.
+* The domain tools, which also use the mirror and search index, run their
+  blocking implementation on the client's thread pool, so both flavours see
+  the same cached state.
+
+Function names and docstrings match the blocking versions, so the agent
+exposes the same tool names to the model.
+"""
+
+import asyncio
+import functools
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from . import airtable_tools as _sync
+from .airtable_cache import get_cache
+from .airtable_client import AirtableError, get_async_client
+from .airtable_tools import (
+    _batch_summary,
+    _chunked,
+    _list_params,
+    _meta_url,
+    _notify_write,
+    _query_key,
+    _record_results,
+    _succeeded_records,
+    _table_url,
+    get_read_mode,
+)
+from .instrumentation import record_cache, record_query
+from .singleflight import get_singleflight
+
+
+async def _request_json(method: str, url: str, **kwargs) -> Dict[str, Any]:
+    return await get_async_client().request_json(method, url, **kwargs)
+
+
+def _offload(func: Callable[..., Any]) -> Callable[..., Awaitable[Any]]:
+    """Wraps a blocking tool as a coroutine run on the current tenant's client pool."""
+
+    @functools.wraps(func)
+    async def wrapper(*args: Any, **kwargs: Any) -> Any:
+        return await get_async_client().run_blocking(func, *args, **kwargs)
+
+    return wrapper
+
+
+# ---------------------------------------------------------------------------
+# RECORD-LEVEL OPERATIONS
+# ---------------------------------------------------------------------------
+
+
+async def airtable_iter_records(
+    table_name: str,
+    view: Optional[str] = None,
+    filter_formula: Optional[str] = None,
+    fields: Optional[List[str]] = None,
+    sort: Optional[List[Dict[str, str]]] = None,
+    page_size: Optional[int] = None,
+    max_records: Optional[int] = None,
+    cell_format: Optional[str] = None,
+    time_zone: Optional[str] = None,
+    user_locale: Optional[str] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    """Async generator version of ``airtable_tools.airtable_iter_records``."""
+    url = _table_url(table_name)
+    params = _list_params(
+        view=view,
+        filter_formula=filter_formula,
+        fields=fields,
+        sort=sort,
+        page_size=page_size,
+        max_records=max_records,
+        cell_format=cell_format,
+        time_zone=time_zone,
+        user_locale=user_locale,
+    )
+    offset: Optional[str] = None
+    while True:
+        page_params = params + [("offset", offset)] if offset else params
+        data = await _request_json("GET", url, params=page_params)
+        for record in data.get("records", []):
+            yield record
+        offset = data.get("offset")
+        if not offset:
+            return
+
+
+async def airtable_get_records(
+    table_name: str,
+    view: Optional[str] = None,
+    filter_formula: Optional[str] = None,
+    max_records: Optional[int] = None,
+    fields: Optional[List[str]] = None,
+    sort: Optional[List[Dict[str, str]]] = None,
+) -> Dict[str, Any]:
+    """Async version of ``airtable_tools.airtable_get_records``.
+
+    Uses the same read cache and single-flight group as the blocking read
+    path, so identical queries from threads and tasks share one request.
+    """
+    if get_read_mode() != "api":
+        # ミラー参照はローカル I/O なので同期実装をそのまま使う
+        return await get_async_client().run_blocking(
+            _sync.airtable_get_records,
+            table_name,
+            view=view,
+            filter_formula=filter_formula,
+            max_records=max_records,
+            fields=fields,
+            sort=sort,
+        )
+
+    started = time.perf_counter()
+    cache = get_cache()
+    key = _query_key(table_name, filter_formula, view, fields, sort, max_records)
+    records = cache.get(key)
+    # 同期の _Table.get_all と同じく、TTL のあるテーブルだけキャッシュの参照を数える
+    if cache.ttl_for(table_name) > 0:
+        record_cache(table_name, records is not None)
+    source = "cache" if records is not None else "api"
+    if records is None:
+        generation = cache.generation(table_name)
+
+        async def fetch() -> List[Dict[str, Any]]:
+            return [
+                record
+                async for record in airtable_iter_records(
+                    table_name,
+                    view=view,
+                    filter_formula=filter_formula,
+                    fields=fields,
+                    sort=sort,
+                    max_records=max_records,
+                )
+            ]
+
+        # 書き込み前に始まった取得に相乗りしないよう世代もキーに含める
+        records = await get_singleflight().do_async((key, generation), fetch)
+        cache.set(key, table_name, records, generation)
+    record_query(table_name, source, time.perf_counter() - started, len(records))
+    return {"status": "success", "records": list(records)}
+
+
+async def airtable_create_record(table_name: str, fields: Dict[str, Any]) -> Dict[str, Any]:
+    """Creates a single record in the specified table.
+
+    Args:
+        table_name: Target table.
+        fields: Dict of field name -> value.
+    """
+    data = await _request_json("POST", _table_url(table_name), json={"fields": fields})
+    _notify_write(table_name, "create", [data])
+    return {"status": "success", "record": data}
+
+
+async def airtable_update_record(
+    table_name: str,
+    record_id: str,
+    fields: Dict[str, Any],
+) -> Dict[str, Any]:
+    """Updates a record.
+
+    Args:
+        table_name: Target table
+        record_id: The Airtable record ID (rec...)
+        fields: Partial set of fields to update.
+    """
+    url = f"{_table_url(table_name)}/{record_id}"
+    data = await _request_json("PATCH", url, json={"fields": fields})
+    _notify_write(table_name, "update", [data])
+    return {"status": "success", "record": data}
+
+
+async def airtable_delete_record(table_name: str, record_id: str) -> Dict[str, Any]:
+    """Deletes a record from a table."""
+    await _request_json("DELETE", f"{_table_url(table_name)}/{record_id}")
+    _notify_write(table_name, "delete", [{"id": record_id}])
+    return {"status": "success", "deleted_record_id": record_id}
+
+
+# ---------------------------------------------------------------------------
+# BATCH OPERATIONS
+# ---------------------------------------------------------------------------
+
+
+async def _dispatch_batches(
+    items: List[Any],
+    send: Callable[[List[Any]], Awaitable[List[Dict[str, Any]]]],
+) -> Dict[str, Any]:
+    """Async version of ``airtable_tools._dispatch_batches`` (same result shape)."""
+    chunks = _chunked(items)
+    outcomes = await asyncio.gather(*(send(chunk) for chunk in chunks), return_exceptions=True)
+
+    results: List[Dict[str, Any]] = []
+    for chunk, outcome in zip(chunks, outcomes):
+        if isinstance(outcome, AirtableError):
+            outcome = [{"status": "error", "error": str(outcome)}] * len(chunk)
+        elif isinstance(outcome, BaseException):
+            raise outcome
+        for result in outcome:
+            results.append({"index": len(results), **result})
+
+    return _batch_summary(results)
+
+
+async def airtable_batch_create_records(
+    table_name: str,
+    records: List[Dict[str, Any]],
+    typecast: bool = False,
+) -> Dict[str, Any]:
+    """Async version of ``airtable_tools.airtable_batch_create_records``."""
+    url = _table_url(table_name)
+
+    async def send(chunk: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        payload = {"records": [{"fields": fields} for fields in chunk], "typecast": typecast}
+        data = await _request_json("POST", url, json=payload)
+        return _record_results(data.get("records", []))
+
+    result = await _dispatch_batches(records, send)
+    _notify_write(table_name, "create", _succeeded_records(result))
+    return result
+
+
+async def airtable_batch_update_records(
+    table_name: str,
+    records: List[Dict[str, Any]],
+    upsert_fields: Optional[List[str]] = None,
+    typecast: bool = False,
+) -> Dict[str, Any]:
+    """Async version of ``airtable_tools.airtable_batch_update_records``."""
+    url = _table_url(table_name)
+
+    async def send(chunk: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        payload: Dict[str, Any] = {"records": chunk, "typecast": typecast}
+        if upsert_fields:
+            payload["performUpsert"] = {"fieldsToMergeOn": upsert_fields}
+        data = await _request_json("PATCH", url, json=payload)
+        results = _record_results(data.get("records", []))
+        if upsert_fields:
+            created = set(data.get("createdRecords", []))
+            for result in results:
+                result["created"] = result["id"] in created
+        return results
+
+    result = await _dispatch_batches(records, send)
+    _notify_write(table_name, "update", _succeeded_records(result))
+    return result
+
+
+async def airtable_batch_delete_records(table_name: str, record_ids: List[str]) -> Dict[str, Any]:
+    """Async version of ``airtable_tools.airtable_batch_delete_records``."""
+    url = _table_url(table_name)
+
+    async def send(chunk: List[str]) -> List[Dict[str, Any]]:
+        params = [("records[]", record_id) for record_id in chunk]
+        data = await _request_json("DELETE", url, params=params)
+        deleted = {rec.get("id"): rec.get("deleted", False) for rec in data.get("records", [])}
+        return [
+            {"status": "success", "id": record_id}
+            if deleted.get(record_id)
+            else {"status": "error", "id": record_id, "error": "not deleted"}
+            for record_id in chunk
+        ]
+
+    result = await _dispatch_batches(record_ids, send)
+    _notify_write(table_name, "delete", _succeeded_records(result))
+    return result
+
+
+# ---------------------------------------------------------------------------
+# TABLE-LEVEL (SCHEMA) OPERATIONS
+# ---------------------------------------------------------------------------
+
+
+async def airtable_create_table(table_name: str, fields: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Async version of ``airtable_tools.airtable_create_table``."""
+    data = await _request_json("POST", _meta_url(), json={"name": table_name, "fields": fields})
+    _sync._invalidate_base_schema()
+    return {"status": "success", "table": data}
+
+
+async def airtable_update_table(
+    table_id: str,
+    new_name: Optional[str] = None,
+    fields: Optional[List[Dict[str, Any]]] = None,
+) -> Dict[str, Any]:
+    """Async version of ``airtable_tools.airtable_update_table``."""
+    if not new_name and not fields:
+        raise ValueError("Provide at least new_name or fields to update.")
+    payload: Dict[str, Any] = {}
+    if new_name:
+        payload["name"] = new_name
+    if fields is not None:
+        payload["fields"] = fields
+    data = await _request_json("PATCH", _meta_url(table_id), json=payload)
+    _sync._invalidate_base_schema()
+    return {"status": "success", "table": data}
+
+
+async def airtable_delete_table(table_id: str) -> Dict[str, Any]:
+    """Async version of ``airtable_tools.airtable_delete_table``."""
+    await _request_json("DELETE", _meta_url(table_id))
+    _sync._invalidate_base_schema()
+    return {"status": "success", "deleted_table_id": table_id}
+
+
+async def airtable_list_tables() -> Dict[str, Any]:
+    """Lists all tables in the base with their schema."""
+    data = await _request_json("GET", _meta_url())
+    return {"status": "success", "tables": data.get("tables", [])}
+
+
+# ---------------------------------------------------------------------------
+# Domain tools (registered on the agent)
+# ---------------------------------------------------------------------------
+
+get_today_tasks = _offload(_sync.get_today_tasks)
+get_field_info = _offload(_sync.get_field_info)
+search_materials = _offload(_sync.search_materials)
+search_tasks = _offload(_sync.search_tasks)
+show_more_results = _offload(_sync.show_more_results)
+summarize_planting_materials = _offload(_sync.summarize_planting_materials)
+create_daily_report = _offload(_sync.create_daily_report)
+update_task_status = _offload(_sync.update_task_status)
+update_task_statuses = _offload(_sync.update_task_statuses)
+report_task_completion = _offload(_sync.report_task_completion)
@@ -0,0 +1,625 @@
+"""Metrics and per-turn tracing for agent tools and Airtable requests.
+
+When a LINE user reports that the agent was slow, the time may have gone to
+Gemini, to Airtable (including rate-limit waits and retries) or to the tools'
+own formatting. This module records all three:
+
+* ``instrument_tool`` wraps a tool (sync or async) and records its duration
+  and outcome, plus the Airtable time spent inside it.
+* ``record_http`` is called by ``AirtableClient`` once per logical request
+  with the table, method, final status, bytes sent / received, records
+  returned, retries and duration.
+* ``record_cache`` / ``record_query`` are called by the read path
+  (``_Table.get_all``) for cache hits and the source that answered a query.
+* ``adk_callbacks()`` returns ``root_agent`` callbacks that open a *turn* per
+  agent invocation (its ID is ADK's ``invocation_id``) and time every model
+  call.
+
+Every event carries the ID of the turn that caused it (``current_turn_id()``,
+a context variable that is copied to the threads tools run on), so one turn
+can be followed across tool calls and HTTP requests. Metrics and events are
+also labelled with the tenant (farm) they ran for (``settings.current_tenant()``),
+so throughput and latency can be compared between farms served by one process. Measurements go to
+in-process counters and histograms, exported with ``metrics_text()``
+(Prometheus text format) or ``metrics_snapshot()`` (JSON), and optionally to
+JSON log lines.
+
+Configuration:
+
+    AGENT_METRICS_LOG   "json" logs one JSON line per event to the
+                        ``agent.metrics`` logger (default off)
+    AGENT_METRICS_PORT  Port for ``serve_metrics()`` (/metrics, /metrics.json)
+"""
+
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+from urllib.parse import unquote, urlparse
+
+from .settings import current_tenant, getenv
+
+event_logger = logging.getLogger("agent.metrics")
+
+F = TypeVar("F", bound=Callable[..., Any])
+Labels = Tuple[Tuple[str, str], ...]
+
+# 秒単位のバケット (Airtable の 1 往復 ~ Gemini の 1 ターンまで)
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+_META_TABLE = "_meta"
+_BASE_PATH_RE = re.compile(r"/v0/(app[A-Za-z0-9]+)/([^/]+)")
+
+
+# ---------------------------------------------------------------------------
+# Metric registry
+# ---------------------------------------------------------------------------
+
+
+class Histogram:
+    """Cumulative-bucket histogram (Prometheus semantics)."""
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.total += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the ``q`` quantile (``None`` if empty)."""
+        if not self.total:
+            return None
+        rank = q * self.total
+        for bound, count in zip(self.buckets, self.counts):
+            if count >= rank:
+                return bound
+        return float("inf")
+
+
+class MetricsRegistry:
+    """Thread-safe counters, gauges and histograms keyed by name and labels."""
+
+    def __init__(self) -> None:
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._gauges: Dict[Tuple[str, Labels], float] = {}
+        self._histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self._help: Dict[str, Tuple[str, str]] = {}
+        self._lock = threading.Lock()
+
+    def describe(self, name: str, kind: str, text: str) -> None:
+        self._help[name] = (kind, text)
+
+    def inc(self, name: str, labels: Dict[str, Any], value: float = 1.0) -> None:
+        key = (name, _labels(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def set(self, name: str, labels: Dict[str, Any], value: float) -> None:
+        """Sets a gauge (a value that goes up and down, e.g. a queue depth)."""
+        with self._lock:
+            self._gauges[(name, _labels(labels))] = value
+
+    def observe(
+        self,
+        name: str,
+        labels: Dict[str, Any],
+        value: float,
+        buckets: Tuple[float, ...] = SECONDS_BUCKETS,
+    ) -> None:
+        key = (name, _labels(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+    def prometheus(self) -> str:
+        """Renders every metric in the Prometheus text exposition format."""
+        lines: List[str] = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items(), key=lambda item: item[0])
+            described = set()
+
+            def header(name: str, kind: str) -> None:
+                if name in described:
+                    return
+                described.add(name)
+                text = self._help.get(name, (kind, ""))[1]
+                if text:
+                    lines.append(f"# HELP {name} {text}")
+                lines.append(f"# TYPE {name} {kind}")
+
+            for (name, labels), value in counters:
+                header(name, "counter")
+                lines.append(f"{name}{_render_labels(labels)} {_number(value)}")
+            for (name, labels), value in sorted(self._gauges.items()):
+                header(name, "gauge")
+                lines.append(f"{name}{_render_labels(labels)} {_number(value)}")
+            for (name, labels), histogram in histograms:
+                header(name, "histogram")
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    bucket_labels = labels + (("le", _number(bound)),)
+                    lines.append(f"{name}_bucket{_render_labels(bucket_labels)} {count}")
+                inf_labels = labels + (("le", "+Inf"),)
+                lines.append(f"{name}_bucket{_render_labels(inf_labels)} {histogram.total}")
+                lines.append(f"{name}_sum{_render_labels(labels)} {_number(histogram.sum)}")
+                lines.append(f"{name}_count{_render_labels(labels)} {histogram.total}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> Dict[str, Any]:
+        """JSON-friendly view: counter / gauge values and histogram count / sum / p50 / p95."""
+        with self._lock:
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self._counters.items())
+            ]
+            gauges = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self._gauges.items())
+            ]
+            histograms = [
+                {
+                    "name": name,
+                    "labels": dict(labels),
+                    "count": h.total,
+                    "sum": round(h.sum, 6),
+                    "p50": h.quantile(0.5),
+                    "p95": h.quantile(0.95),
+                }
+                for (name, labels), h in sorted(self._histograms.items(), key=lambda item: item[0])
+            ]
+        return {"counters": counters, "gauges": gauges, "histograms": histograms}
+
+
+def _labels(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((k, "" if v is None else str(v)) for k, v in labels.items()))
+
+
+def _render_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        (k, v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')) for k, v in labels
+    )
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+_registry = MetricsRegistry()
+for _name, _kind, _text in (
+    ("agent_turns_total", "counter", "Agent turns (invocations)."),
+    ("agent_turn_seconds", "histogram", "Wall time of an agent turn."),
+    ("agent_model_calls_total", "counter", "LLM calls made by the agent."),
+    ("agent_model_seconds", "histogram", "Duration of one LLM call."),
+    ("agent_tool_calls_total", "counter", "Tool calls by tool and outcome."),
+    ("agent_tool_seconds", "histogram", "Duration of one tool call."),
+    ("airtable_requests_total", "counter", "Airtable HTTP requests by table, method and status."),
+    ("airtable_request_seconds", "histogram", "Duration of one Airtable request incl. retries."),
+    ("airtable_retries_total", "counter", "Retried attempts of Airtable requests."),
+    ("airtable_request_bytes_total", "counter", "Request body bytes sent to Airtable."),
+    ("airtable_response_bytes", "histogram", "Response body size of Airtable requests."),
+    ("airtable_records_returned_total", "counter", "Records in Airtable responses."),
+    ("airtable_cache_lookups_total", "counter", "Read-cache lookups by table and result."),
+    ("airtable_query_seconds", "histogram", "Duration of a table query by answering source."),
+):
+    _registry.describe(_name, _kind, _text)
+
+
+def get_registry() -> MetricsRegistry:
+    """Returns the process-wide metric registry."""
+    return _registry
+
+
+def metrics_text() -> str:
+    """All metrics in the Prometheus text format."""
+    return _registry.prometheus()
+
+
+def metrics_snapshot() -> Dict[str, Any]:
+    """All metrics as a JSON-serialisable dict."""
+    return _registry.snapshot()
+
+
+# ---------------------------------------------------------------------------
+# Turn / tool scopes
+# ---------------------------------------------------------------------------
+
+
+@dataclass
+class _Scope:
+    """Airtable and model time accumulated inside one turn or tool call."""
+
+    id: str
+    name: str = ""
+    started: float = field(default_factory=time.perf_counter)
+    api_calls: int = 0
+    api_seconds: float = 0.0
+    retries: int = 0
+    cache_hits: int = 0
+    cache_misses: int = 0
+    model_calls: int = 0
+    model_seconds: float = 0.0
+    tool_calls: int = 0
+    tool_seconds: float = 0.0
+    model_started: Optional[float] = None
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def add(self, **values: float) -> None:
+        with self.lock:
+            for name, value in values.items():
+                setattr(self, name, getattr(self, name) + value)
+
+
+_turn: contextvars.ContextVar[Optional[_Scope]] = contextvars.ContextVar("agent_turn", default=None)
+_tool: contextvars.ContextVar[Optional[_Scope]] = contextvars.ContextVar("agent_tool", default=None)
+_turns: Dict[str, _Scope] = {}
+_turns_lock = threading.Lock()
+# turn_scope() の中で begin_turn() した ID (コピーされたコンテキストとも同じリストを共有する)
+_opened: contextvars.ContextVar[Optional[List[str]]] = contextvars.ContextVar("agent_opened_turns", default=None)
+
+
+def current_turn_id() -> Optional[str]:
+    """ID of the agent turn the current code runs for (``None`` outside turns)."""
+    scope = _turn.get()
+    return scope.id if scope else None
+
+
+def _scopes() -> List[_Scope]:
+    return [scope for scope in (_turn.get(), _tool.get()) if scope is not None]
+
+
+def begin_turn(turn_id: Optional[str] = None) -> str:
+    """Starts a turn in the current context and returns its ID.
+
+    Used where the start and end of a turn are separate callbacks; pair it
+    with ``end_turn``. Prefer the ``turn()`` context manager otherwise.
+    """
+    scope = _Scope(id=turn_id or uuid.uuid4().hex[:16])
+    with _turns_lock:
+        _turns[scope.id] = scope
+    opened = _opened.get()
+    if opened is not None:
+        opened.append(scope.id)
+    _turn.set(scope)
+    return scope.id
+
+
+def end_turn(turn_id: Optional[str] = None, outcome: str = "ok") -> Optional[Dict[str, Any]]:
+    """Finishes a turn: records its metrics and emits a ``turn`` event."""
+    turn_id = turn_id or current_turn_id()
+    with _turns_lock:
+        scope = _turns.pop(turn_id, None) if turn_id else None
+    if scope is None:
+        return None
+    current = _turn.get()
+    if current is not None and current.id == scope.id:
+        _turn.set(None)
+    seconds = time.perf_counter() - scope.started
+    tenant = current_tenant()
+    _registry.inc("agent_turns_total", {"tenant": tenant, "outcome": outcome})
+    _registry.observe("agent_turn_seconds", {"tenant": tenant}, seconds)
+    event = {
+        "event": "turn",
+        "outcome": outcome,
+        "seconds": round(seconds, 4),
+        "model_calls": scope.model_calls,
+        "model_seconds": round(scope.model_seconds, 4),
+        "tool_calls": scope.tool_calls,
+        "tool_seconds": round(scope.tool_seconds, 4),
+        "airtable_calls": scope.api_calls,
+        "airtable_seconds": round(scope.api_seconds, 4),
+        "airtable_retries": scope.retries,
+        "cache_hits": scope.cache_hits,
+    }
+    _emit(event, turn_id=scope.id)
+    return event
+
+
+@contextmanager
+def turn(turn_id: Optional[str] = None) -> Iterator[str]:
+    """Runs the block as one turn (e.g. a router fast-path answer)."""
+    token = _turn.set(None)
+    turn_id = begin_turn(turn_id)
+    outcome = "ok"
+    try:
+        yield turn_id
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        end_turn(turn_id, outcome)
+        _turn.reset(token)
+
+
+@contextmanager
+def turn_scope() -> Iterator[None]:
+    """Ends the turns begun (``begin_turn``) in the block that are still open at its end.
+
+    Wraps an ADK run: a turn that raises (or is cancelled) before its
+    after-agent callback would otherwise stay in the turn table for good.
+    """
+    opened: List[str] = []
+    token = _opened.set(opened)
+    try:
+        yield
+    finally:
+        _opened.reset(token)
+        for turn_id in opened:
+            # after_agent で終わったターンは end_turn が何もしない
+            end_turn(turn_id, "error")
+
+
+def run_in_context(func: Callable[..., Any]) -> Callable[..., Any]:
+    """Binds ``func`` to a copy of the current context (turn ID) for another thread.
+
+    ``ThreadPoolExecutor.submit`` and ``run_in_executor`` do not carry
+    context variables over; ``executor.submit(run_in_context(fn), ...)`` does.
+    """
+    context = contextvars.copy_context()
+    return functools.partial(context.run, func)
+
+
+# ---------------------------------------------------------------------------
+# Events
+# ---------------------------------------------------------------------------
+
+
+def _log_json() -> bool:
+    return (getenv("AGENT_METRICS_LOG") or "").lower() == "json"
+
+
+def _emit(event: Dict[str, Any], turn_id: Optional[str] = None) -> None:
+    if not _log_json():
+        return
+    event = {"ts": round(time.time(), 3), "turn_id": turn_id or current_turn_id(), "tenant": current_tenant(), **event}
+    event_logger.info(json.dumps(event, ensure_ascii=False, default=str))
+
+
+def table_from_url(url: str) -> str:
+    """Table name addressed by an Airtable API URL (``_meta`` for the metadata API)."""
+    path = urlparse(url).path
+    if "/meta/" in path:
+        return _META_TABLE
+    match = _BASE_PATH_RE.search(path)
+    return unquote(match.group(2)) if match else ""
+
+
+def record_http(
+    method: str,
+    url: str,
+    status: Any,
+    seconds: float,
+    bytes_out: int = 0,
+    bytes_in: int = 0,
+    retries: int = 0,
+    records: Optional[int] = None,
+) -> None:
+    """Records one logical Airtable request (all attempts of it)."""
+    table = table_from_url(url)
+    labels = {"tenant": current_tenant(), "table": table, "method": method}
+    _registry.inc("airtable_requests_total", {**labels, "status": status})
+    _registry.observe("airtable_request_seconds", labels, seconds)
+    _registry.observe("airtable_response_bytes", labels, bytes_in, BYTES_BUCKETS)
+    if bytes_out:
+        _registry.inc("airtable_request_bytes_total", labels, bytes_out)
+    if retries:
+        _registry.inc("airtable_retries_total", labels, retries)
+    if records is not None:
+        _registry.inc("airtable_records_returned_total", {"tenant": labels["tenant"], "table": table}, records)
+    for scope in _scopes():
+        scope.add(api_calls=1, api_seconds=seconds, retries=retries)
+    _emit(
+        {
+            "event": "airtable_request",
+            "table": table,
+            "method": method,
+            "status": status,
+            "seconds": round(seconds, 4),
+            "bytes_out": bytes_out,
+            "bytes_in": bytes_in,
+            "records": records,
+            "retries": retries,
+        }
+    )
+
+
+def record_cache(table: str, hit: bool) -> None:
+    """Records a read-cache lookup."""
+    _registry.inc(
+        "airtable_cache_lookups_total",
+        {"tenant": current_tenant(), "table": table, "result": "hit" if hit else "miss"},
+    )
+    for scope in _scopes():
+        scope.add(**({"cache_hits": 1} if hit else {"cache_misses": 1}))
+
+
+def record_query(table: str, source: str, seconds: float, records: int) -> None:
+    """Records a table query and which source (cache / api / mirror) answered it."""
+    _registry.observe(
+        "airtable_query_seconds", {"tenant": current_tenant(), "table": table, "source": source}, seconds
+    )
+    _emit(
+        {
+            "event": "query",
+            "table": table,
+            "source": source,
+            "seconds": round(seconds, 4),
+            "records": records,
+        }
+    )
+
+
+# ---------------------------------------------------------------------------
+# Tool decorator
+# ---------------------------------------------------------------------------
+
+
+def _finish_tool(scope: _Scope, outcome: str) -> None:
+    seconds = time.perf_counter() - scope.started
+    tenant = current_tenant()
+    _registry.inc("agent_tool_calls_total", {"tenant": tenant, "tool": scope.name, "outcome": outcome})
+    _registry.observe("agent_tool_seconds", {"tenant": tenant, "tool": scope.name}, seconds)
+    parent = _turn.get()
+    if parent is not None:
+        parent.add(tool_calls=1, tool_seconds=seconds)
+    _emit(
+        {
+            "event": "tool",
+            "tool": scope.name,
+            "outcome": outcome,
+            "seconds": round(seconds, 4),
+            "airtable_calls": scope.api_calls,
+            "airtable_seconds": round(scope.api_seconds, 4),
+            "airtable_retries": scope.retries,
+            "cache_hits": scope.cache_hits,
+            "cache_misses": scope.cache_misses,
+        }
+    )
+
+
+def instrument_tool(func: F) -> F:
+    """Decorator recording duration, outcome and Airtable usage of a tool.
+
+    Works for plain and ``async`` functions; the signature and docstring are
+    kept (``functools.wraps``), so ADK builds the same tool declaration.
+    """
+    name = func.__name__
+
+    if inspect.iscoroutinefunction(func):
+
+        @functools.wraps(func)
+        async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+            scope = _Scope(id=uuid.uuid4().hex[:16], name=name)
+            token = _tool.set(scope)
+            outcome = "error"
+            try:
+                result = await func(*args, **kwargs)
+                outcome = "ok"
+                return result
+            finally:
+                _tool.reset(token)
+                _finish_tool(scope, outcome)
+
+        return async_wrapper  # type: ignore[return-value]
+
+    @functools.wraps(func)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        scope = _Scope(id=uuid.uuid4().hex[:16], name=name)
+        token = _tool.set(scope)
+        outcome = "error"
+        try:
+            result = func(*args, **kwargs)
+            outcome = "ok"
+            return result
+        finally:
+            _tool.reset(token)
+            _finish_tool(scope, outcome)
+
+    return wrapper  # type: ignore[return-value]
+
+
+# ---------------------------------------------------------------------------
+# ADK callbacks
+# ---------------------------------------------------------------------------
+
+
+def _before_agent(callback_context: Any) -> None:
+    begin_turn(callback_context.invocation_id)
+    return None
+
+
+def _after_agent(callback_context: Any) -> None:
+    end_turn(callback_context.invocation_id)
+    return None
+
+
+def _before_model(callback_context: Any, llm_request: Any) -> None:
+    scope = _turns.get(callback_context.invocation_id)
+    if scope is not None:
+        scope.model_started = time.perf_counter()
+    return None
+
+
+def _after_model(callback_context: Any, llm_response: Any) -> None:
+    scope = _turns.get(callback_context.invocation_id)
+    if scope is None or scope.model_started is None:
+        return None
+    seconds = time.perf_counter() - scope.model_started
+    scope.model_started = None
+    scope.add(model_calls=1, model_seconds=seconds)
+    _registry.inc("agent_model_calls_total", {"tenant": current_tenant()})
+    _registry.observe("agent_model_seconds", {"tenant": current_tenant()}, seconds)
+    _emit({"event": "model", "seconds": round(seconds, 4)}, turn_id=scope.id)
+    return None
+
+
+def adk_callbacks() -> Dict[str, Callable[..., Any]]:
+    """``Agent(**adk_callbacks())`` keyword arguments that trace turns and model calls."""
+    return {
+        "before_agent_callback": _before_agent,
+        "after_agent_callback": _after_agent,
+        "before_model_callback": _before_model,
+        "after_model_callback": _after_model,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Export endpoint
+# ---------------------------------------------------------------------------
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args: Any) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        if self.path.startswith("/metrics.json"):
+            body = json.dumps(metrics_snapshot(), ensure_ascii=False).encode("utf-8")
+            content_type = "application/json; charset=utf-8"
+        elif self.path.startswith("/metrics"):
+            body = metrics_text().encode("utf-8")
+            content_type = "text/plain; version=0.0.4; charset=utf-8"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def serve_metrics(port: Optional[int] = None, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """Serves ``/metrics`` (Prometheus) and ``/metrics.json`` on a daemon thread."""
+    port = port if port is not None else int(getenv("AGENT_METRICS_PORT") or 9464)
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="agent-metrics", daemon=True).start()
+    return server
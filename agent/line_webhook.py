@@ -0,0 +1,683 @@
+"""LINE Messaging API webhook that answers through ``root_agent``.
+
+A Gemini turn can take longer than LINE waits for a webhook response, so the
+handler never runs the agent itself. ``POST /callback``:
+
+1. verifies ``X-Line-Signature`` (HMAC-SHA256 of the body with the channel
+   secret) and rejects the request with 400 if it does not match;
+2. puts every text message event on a bounded queue and returns 200 at once;
+3. returns 503 without queuing anything when the queue is full, so LINE
+   redelivers the events later instead of them piling up in memory.
+
+``TurnDispatcher`` runs the queued messages on a fixed number of asyncio
+workers. Messages of one user are answered one at a time and in order (the
+second message of a conversation needs the session state of the first);
+different users are served in parallel. Each answer comes from the intent
+router's fast path or a full ``root_agent`` turn and is sent with the push API.
+Fast-path answers are added to the user's ADK session as well, so a follow-up
+such as 「それを完了に」 reaches the agent with the task list in its context.
+
+The sender's 担当者 name (for 「私のタスク」) comes from ``LINE_USER_WORKERS``,
+never from the LINE display name, which users choose freely. A sender who is
+not listed is answered without a worker name.
+
+With a tenant registry (``agent.tenants``, ``TENANTS_PATH``) one process
+serves several farms. Each tenant with its own LINE channel is reached at
+``POST /callback/<tenant>`` (or at ``/callback`` through the webhook's
+``destination``); every message is answered for the tenant of its user or
+channel, inside ``use_tenant()``, by that tenant's agent. Each tenant has its
+own queue and workers, so a busy farm gets the 503s instead of delaying the
+others.
+
+Queue depth, in-flight turns, queue wait, turn duration and push results are
+recorded per tenant in ``instrumentation`` and served at ``GET /metrics``.
+
+Configuration:
+
+    LINE_CHANNEL_SECRET        Channel secret (signature verification)
+    LINE_CHANNEL_ACCESS_TOKEN  Channel access token (push API)
+    LINE_API_ROOT              API endpoint (default https://api.line.me;
+                               e.g. scripts/fake_line_api.py for local runs)
+    LINE_WORKERS               Concurrent agent turns per tenant (default 4)
+    LINE_QUEUE_SIZE            Max queued + running messages per tenant (default 100)
+    LINE_TURN_TIMEOUT          Seconds before a turn is abandoned (default 120)
+    LINE_USER_WORKERS          Comma-separated ``LINE user ID=担当者名`` pairs
+
+Run it with ``python -m agent.line_webhook`` (listens on ``$PORT``, default 8080).
+"""
+
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import time
+import uuid
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional
+
+import httpx
+from fastapi import FastAPI, Request, Response
+
+from .airtable_outbox import resume_outbox
+from .instrumentation import get_registry, metrics_text, turn_scope
+from .settings import DEFAULT_TENANT, current_tenant, getenv, use_settings
+from .tenants import Tenant, TenantRegistry, get_tenants, use_tenant
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LINE_API_ROOT = "https://api.line.me"
+# push API の 1 メッセージあたりの文字数上限と、1 リクエストあたりのメッセージ数上限
+_TEXT_LIMIT = 5000
+_MESSAGES_PER_PUSH = 5
+_SEEN_EVENTS = 1024
+
+_BUSY_MESSAGE = "ただいま混み合っています。少し時間をおいてもう一度送ってください。"
+_TIMEOUT_MESSAGE = "処理に時間がかかっています。もう一度送ってください。"
+_ERROR_MESSAGE = "エラーが発生しました。時間をおいてもう一度お試しください。"
+
+_metrics = get_registry()
+for _name, _kind, _text in (
+    ("line_events_total", "counter", "Webhook events by result (queued / rejected / ignored / duplicate)."),
+    ("line_queue_depth", "gauge", "Messages waiting for a worker."),
+    ("line_inflight_turns", "gauge", "Messages being answered."),
+    ("line_queue_wait_seconds", "histogram", "Time a message waited in the queue."),
+    ("line_turn_seconds", "histogram", "Time to answer a message (router or agent)."),
+    ("line_turns_total", "counter", "Answered messages by outcome."),
+    ("line_push_total", "counter", "Push API calls by tenant and HTTP status."),
+):
+    _metrics.describe(_name, _kind, _text)
+
+
+def verify_signature(body: bytes, signature: Optional[str], channel_secret: str) -> bool:
+    """Checks ``X-Line-Signature`` (base64 HMAC-SHA256 of the raw body)."""
+    if not signature or not channel_secret:
+        return False
+    digest = hmac.new(channel_secret.encode("utf-8"), body, hashlib.sha256).digest()
+    return hmac.compare_digest(base64.b64encode(digest).decode("ascii"), signature)
+
+
+def split_text(text: str, limit: int = _TEXT_LIMIT) -> List[str]:
+    """Splits an answer into push-API-sized text messages, preferring line breaks."""
+    chunks: List[str] = []
+    while len(text) > limit:
+        cut = text.rfind("\n", 0, limit)
+        cut = cut if cut > 0 else limit
+        chunks.append(text[:cut])
+        text = text[cut:].lstrip("\n")
+    if text or not chunks:
+        chunks.append(text)
+    return chunks
+
+
+# ---------------------------------------------------------------------------
+# LINE API client
+# ---------------------------------------------------------------------------
+
+
+class LineApi:
+    """Push calls of the Messaging API (``httpx.AsyncClient``)."""
+
+    def __init__(
+        self,
+        access_token: str,
+        api_root: str = DEFAULT_LINE_API_ROOT,
+        retries: int = 3,
+        tenant: str = DEFAULT_TENANT,
+    ):
+        self.api_root = api_root.rstrip("/")
+        self.retries = retries
+        self.tenant = tenant
+        self._http = httpx.AsyncClient(
+            headers={"Authorization": f"Bearer {access_token}"},
+            timeout=httpx.Timeout(10.0, connect=5.0),
+        )
+
+    async def push(self, user_id: str, text: str) -> None:
+        """Pushes ``text`` to ``user_id`` (split into several messages if long)."""
+        chunks = split_text(text)
+        for start in range(0, len(chunks), _MESSAGES_PER_PUSH):
+            messages = [{"type": "text", "text": t} for t in chunks[start : start + _MESSAGES_PER_PUSH]]
+            await self._push_once({"to": user_id, "messages": messages})
+
+    async def _push_once(self, payload: Dict[str, Any]) -> None:
+        # 再送しても二重送信にならないよう、同じリトライキーで送り直す
+        headers = {"X-Line-Retry-Key": str(uuid.uuid4())}
+        url = f"{self.api_root}/v2/bot/message/push"
+        for attempt in range(self.retries + 1):
+            try:
+                resp = await self._http.post(url, json=payload, headers=headers)
+            except httpx.TransportError as e:
+                _metrics.inc("line_push_total", {"tenant": self.tenant, "status": "error"})
+                if attempt >= self.retries:
+                    raise
+                logger.warning("LINE push failed (%s); retrying", e)
+            else:
+                _metrics.inc("line_push_total", {"tenant": self.tenant, "status": resp.status_code})
+                # 409 はリトライキーで受理済み (前回の送信が届いている)
+                if resp.status_code < 300 or resp.status_code == 409:
+                    return
+                if (resp.status_code != 429 and resp.status_code < 500) or attempt >= self.retries:
+                    resp.raise_for_status()
+            await asyncio.sleep(min(8.0, 0.5 * 2**attempt))
+
+    async def close(self) -> None:
+        await self._http.aclose()
+
+
+# ---------------------------------------------------------------------------
+# Dispatcher
+# ---------------------------------------------------------------------------
+
+
+@dataclass
+class Message:
+    """A queued text message of one user."""
+
+    user_id: str
+    text: str
+    event_id: str = ""
+    received: float = field(default_factory=time.monotonic)
+    tenant: Optional[Tenant] = None
+
+
+# (メッセージ) -> 応答の送信まで行うコルーチン
+Handler = Callable[[Message], Awaitable[None]]
+
+
+class TurnDispatcher:
+    """Bounded queue of messages answered by a fixed pool of asyncio workers.
+
+    Messages of the same user are handled strictly one after another; a user
+    with several waiting messages is put back at the end of the ready queue
+    after each one, so one chatty user cannot starve the others.
+
+    Args:
+        handler: Answers one message (runs the agent and pushes the reply).
+        workers: Number of messages answered concurrently.
+        max_pending: Max messages queued or running; ``offer`` refuses more.
+        tenant: Tenant label of the queue metrics.
+    """
+
+    def __init__(
+        self, handler: Handler, workers: int = 4, max_pending: int = 100, tenant: str = DEFAULT_TENANT
+    ):
+        self._handler = handler
+        self.workers = workers
+        self.max_pending = max_pending
+        self.tenant = tenant
+        # ユーザーごとの未処理メッセージ。先頭は処理中のメッセージ
+        self._pending: Dict[str, Deque[Message]] = {}
+        self._ready: "asyncio.Queue[str]" = asyncio.Queue()
+        self._size = 0
+        self._inflight = 0
+        self._tasks: List["asyncio.Task[None]"] = []
+
+    @property
+    def depth(self) -> int:
+        """Messages waiting for a worker (not counting running ones)."""
+        return self._size - self._inflight
+
+    def offer(self, messages: List[Message]) -> bool:
+        """Queues all ``messages``, or none of them if that would exceed the bound."""
+        if self._size + len(messages) > self.max_pending:
+            return False
+        for message in messages:
+            queue = self._pending.get(message.user_id)
+            if queue is None:
+                self._pending[message.user_id] = deque([message])
+                self._ready.put_nowait(message.user_id)
+            else:
+                # 処理中または待機中のユーザーは、前のメッセージが終わるまで待たせる
+                queue.append(message)
+            self._size += 1
+        self._report()
+        return True
+
+    def _report(self) -> None:
+        _metrics.set("line_queue_depth", {"tenant": self.tenant}, self.depth)
+        _metrics.set("line_inflight_turns", {"tenant": self.tenant}, self._inflight)
+
+    async def _worker(self) -> None:
+        while True:
+            user_id = await self._ready.get()
+            queue = self._pending[user_id]
+            message = queue[0]
+            self._inflight += 1
+            self._report()
+            _metrics.observe(
+                "line_queue_wait_seconds", {"tenant": self.tenant}, time.monotonic() - message.received
+            )
+            try:
+                await self._handler(message)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("failed to answer LINE message %s", message.event_id)
+            finally:
+                queue.popleft()
+                self._size -= 1
+                self._inflight -= 1
+                if queue:
+                    self._ready.put_nowait(user_id)
+                else:
+                    del self._pending[user_id]
+                self._report()
+
+    def start(self) -> None:
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def join(self, timeout: Optional[float] = None) -> bool:
+        """Waits until every queued message has been answered."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._size:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(0.05)
+        return True
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Finishes queued messages (up to ``timeout``) and stops the workers."""
+        await self.join(timeout)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": self.depth,
+            "inflight": self._inflight,
+            "users": len(self._pending),
+            "max_pending": self.max_pending,
+            "workers": self.workers,
+        }
+
+
+# ---------------------------------------------------------------------------
+# Agent
+# ---------------------------------------------------------------------------
+
+
+class AgentResponder:
+    """Answers a message with the router fast path or a ``root_agent`` turn.
+
+    Each LINE user gets one ADK session (kept in memory), so follow-up
+    messages see the earlier conversation. Every tenant has its own runner,
+    agent (``build_agent(tenant)``) and sessions; the tenant is the one bound
+    by ``use_tenant()`` when the responder is called.
+    """
+
+    def __init__(self, app_name: str = "agri_agent", registry: Optional[TenantRegistry] = None):
+        self.app_name = app_name
+        self.registry = registry
+        self._runners: Dict[str, Any] = {}
+
+    def _get_runner(self) -> Any:
+        tenant = current_tenant()
+        if tenant not in self._runners:
+            from google.adk.runners import Runner
+            from google.adk.sessions import InMemorySessionService
+
+            if tenant == DEFAULT_TENANT:
+                from . import root_agent as agent
+            else:
+                from .agent import build_agent
+
+                agent = build_agent((self.registry or get_tenants()).get(tenant))
+            self._runners[tenant] = Runner(
+                app_name=self.app_name, agent=agent, session_service=InMemorySessionService()
+            )
+        return self._runners[tenant]
+
+    async def _session(self, runner: Any, user_id: str) -> Any:
+        sessions = runner.session_service
+        session = await sessions.get_session(
+            app_name=self.app_name, user_id=user_id, session_id=user_id
+        )
+        if session is None:
+            session = await sessions.create_session(
+                app_name=self.app_name, user_id=user_id, session_id=user_id
+            )
+        return session
+
+    async def run_agent(self, user_id: str, text: str) -> str:
+        from google.genai import types
+
+        runner = self._get_runner()
+        await self._session(runner, user_id)
+        parts: List[str] = []
+        message = types.Content(role="user", parts=[types.Part(text=text)])
+        # 例外やタイムアウトで after_agent が呼ばれなかったターンも計測を閉じる
+        with turn_scope():
+            async for event in runner.run_async(user_id=user_id, session_id=user_id, new_message=message):
+                if event.is_final_response() and event.content and event.content.parts:
+                    parts.extend(part.text for part in event.content.parts if part.text)
+        return "\n".join(parts).strip() or "回答を作成できませんでした。"
+
+    async def remember(self, user_id: str, text: str, answer: str) -> None:
+        """Adds a turn answered outside the agent to the user's session."""
+        from google.adk.events import Event
+        from google.genai import types
+
+        runner = self._get_runner()
+        session = await self._session(runner, user_id)
+        invocation_id = f"fast-{uuid.uuid4().hex}"
+        for author, role, message in (("user", "user", text), (runner.agent.name, "model", answer)):
+            event = Event(
+                invocation_id=invocation_id,
+                author=author,
+                content=types.Content(role=role, parts=[types.Part(text=message)]),
+            )
+            await runner.session_service.append_event(session, event)
+
+    async def __call__(self, user_id: str, text: str, user_name: Optional[str]) -> str:
+        from .router import get_router
+
+        result = await get_router().route_async(text, user_name=user_name)
+        if not result.handled:
+            return await self.run_agent(user_id, text)
+        # 高速経路の応答も会話の履歴に残し、続く「それを完了に」などをエージェントが
+        # 解釈できるようにする。履歴に残せなくても応答は返す
+        try:
+            await self.remember(user_id, text, result.answer or "")
+        except Exception:
+            logger.exception("failed to record the fast-path turn of %s in the session", user_id)
+        return result.answer or ""
+
+
+def worker_names(value: Optional[str]) -> Dict[str, str]:
+    """Parses ``LINE_USER_WORKERS`` (``U...=田中,U...=佐藤``) into user ID -> 担当者名."""
+    names: Dict[str, str] = {}
+    for pair in (value or "").split(","):
+        user_id, _, name = pair.partition("=")
+        if user_id.strip() and name.strip():
+            names[user_id.strip()] = name.strip()
+    return names
+
+
+# (LINE ユーザー ID, 本文, 担当者名) -> 応答文
+Responder = Callable[[str, str, Optional[str]], Awaitable[str]]
+
+
+# ---------------------------------------------------------------------------
+# Service
+# ---------------------------------------------------------------------------
+
+
+class LineWebhookService:
+    """Webhook parsing, deduplication and the answer pipeline of one channel.
+
+    Messages are answered for the tenant ``registry.resolve_line`` picks for
+    their user on the channel of ``tenant`` (``None`` for the process's own
+    channel), each tenant on its own ``TurnDispatcher``.
+    """
+
+    def __init__(
+        self,
+        channel_secret: str,
+        line_api: LineApi,
+        responder: Responder,
+        workers: int = 4,
+        max_pending: int = 100,
+        turn_timeout: float = 120.0,
+        tenant: Optional[Tenant] = None,
+        registry: Optional[TenantRegistry] = None,
+    ):
+        self.channel_secret = channel_secret
+        self.line_api = line_api
+        self.responder = responder
+        self.workers = workers
+        self.max_pending = max_pending
+        self.turn_timeout = turn_timeout
+        self.tenant = tenant
+        self.registry = registry or get_tenants()
+        self.dispatchers: Dict[str, TurnDispatcher] = {}
+        self._channel = tenant.id if tenant is not None else DEFAULT_TENANT
+        self._started = False
+        self._seen: "OrderedDict[str, None]" = OrderedDict()
+
+    @classmethod
+    def from_env(
+        cls,
+        responder: Optional[Responder] = None,
+        tenant: Optional[Tenant] = None,
+        registry: Optional[TenantRegistry] = None,
+    ) -> "LineWebhookService":
+        """Service of the process's channel, or of ``tenant``'s channel (its own LINE_* settings)."""
+        env = tenant.getenv if tenant is not None else getenv
+        secret = env("LINE_CHANNEL_SECRET")
+        token = env("LINE_CHANNEL_ACCESS_TOKEN")
+        if not secret or not token:
+            raise EnvironmentError(
+                "LINE_CHANNEL_SECRET and LINE_CHANNEL_ACCESS_TOKEN must be set for the LINE webhook."
+            )
+        return cls(
+            channel_secret=secret,
+            line_api=LineApi(
+                token,
+                env("LINE_API_ROOT") or DEFAULT_LINE_API_ROOT,
+                tenant=tenant.id if tenant is not None else DEFAULT_TENANT,
+            ),
+            responder=responder or AgentResponder(registry=registry),
+            workers=int(env("LINE_WORKERS") or 4),
+            max_pending=int(env("LINE_QUEUE_SIZE") or 100),
+            turn_timeout=float(env("LINE_TURN_TIMEOUT") or 120),
+            tenant=tenant,
+            registry=registry,
+        )
+
+    def dispatcher(self, tenant: Tenant) -> TurnDispatcher:
+        """The queue of ``tenant`` on this channel, created (and started) on first use."""
+        dispatcher = self.dispatchers.get(tenant.id)
+        if dispatcher is None:
+            dispatcher = self.dispatchers[tenant.id] = TurnDispatcher(
+                self.answer, workers=self.workers, max_pending=self.max_pending, tenant=tenant.id
+            )
+            if self._started:
+                dispatcher.start()
+        return dispatcher
+
+    def start(self) -> None:
+        self._started = True
+        self.dispatcher(self.tenant or self.registry.default())
+        for dispatcher in self.dispatchers.values():
+            dispatcher.start()
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        await asyncio.gather(*(d.stop(timeout) for d in self.dispatchers.values()))
+        self._started = False
+
+    def stats(self) -> Dict[str, Any]:
+        return {tenant: dispatcher.stats() for tenant, dispatcher in self.dispatchers.items()}
+
+    def _duplicate(self, event_id: str) -> bool:
+        # 再送 (isRedelivery) された同じイベントを二重に処理しない
+        if not event_id:
+            return False
+        if event_id in self._seen:
+            return True
+        self._seen[event_id] = None
+        if len(self._seen) > _SEEN_EVENTS:
+            self._seen.popitem(last=False)
+        return False
+
+    def parse(self, payload: Dict[str, Any]) -> List[Message]:
+        """Text messages from users in a webhook body (other events are ignored)."""
+        messages = []
+        for event in payload.get("events", []):
+            source = event.get("source") or {}
+            message = event.get("message") or {}
+            if (
+                event.get("type") != "message"
+                or message.get("type") != "text"
+                or source.get("type") != "user"
+            ):
+                _metrics.inc("line_events_total", {"tenant": self._channel, "result": "ignored"})
+                continue
+            if event.get("webhookEventId") in self._seen:
+                _metrics.inc("line_events_total", {"tenant": self._channel, "result": "duplicate"})
+                continue
+            messages.append(
+                Message(
+                    source["userId"],
+                    message.get("text", ""),
+                    event.get("webhookEventId", ""),
+                    tenant=self.registry.resolve_line(source["userId"], self.tenant),
+                )
+            )
+        return messages
+
+    def accept(self, body: bytes, signature: Optional[str]) -> int:
+        """Handles one webhook request and returns the HTTP status for LINE."""
+        if not verify_signature(body, signature, self.channel_secret):
+            return 400
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            return 400
+        by_tenant: Dict[str, List[Message]] = {}
+        for message in self.parse(payload):
+            by_tenant.setdefault(message.tenant.id, []).append(message)
+        status = 200
+        for tenant_id, messages in by_tenant.items():
+            dispatcher = self.dispatcher(messages[0].tenant)
+            labels = {"tenant": tenant_id}
+            if not dispatcher.offer(messages):
+                # 受け付けたテナントのイベントは処理済みとして記録し、再送時は重複として捨てる
+                _metrics.inc("line_events_total", {**labels, "result": "rejected"}, len(messages))
+                logger.warning("LINE queue full (%s); rejecting %d events", dispatcher.stats(), len(messages))
+                status = 503
+                continue
+            for message in messages:
+                self._duplicate(message.event_id)
+            _metrics.inc("line_events_total", {**labels, "result": "queued"}, len(messages))
+        return status
+
+    async def answer(self, message: Message) -> None:
+        """Runs one turn and pushes the answer (or an apology) to the user."""
+        started = time.perf_counter()
+        outcome = "ok"
+        tenant = message.tenant or self.registry.default()
+        labels = {"tenant": tenant.id}
+        try:
+            # 表示名はユーザーが自由に変えられるので、担当者の絞り込みには設定の対応表だけを使う
+            user_name = worker_names(tenant.getenv("LINE_USER_WORKERS")).get(message.user_id)
+            # wait_for が作るタスクはこのコンテキスト (テナントの設定) を引き継ぐ
+            with use_settings(tenant.settings):
+                text = await asyncio.wait_for(
+                    self.responder(message.user_id, message.text, user_name), self.turn_timeout
+                )
+        except asyncio.TimeoutError:
+            outcome, text = "timeout", _TIMEOUT_MESSAGE
+        except Exception:
+            logger.exception("agent turn failed for LINE message %s", message.event_id)
+            outcome, text = "error", _ERROR_MESSAGE
+        _metrics.observe("line_turn_seconds", labels, time.perf_counter() - started)
+        _metrics.inc("line_turns_total", {**labels, "outcome": outcome})
+        await self.line_api.push(message.user_id, text)
+
+
+def build_services(
+    registry: Optional[TenantRegistry] = None, responder: Optional[Responder] = None
+) -> Dict[str, LineWebhookService]:
+    """One service per LINE channel: the process's own (``default``) and each tenant's."""
+    registry = registry or get_tenants()
+    # 応答側はテナントごとに Runner を持つので、チャネル間で共有する
+    responder = responder or AgentResponder(registry=registry)
+    services: Dict[str, LineWebhookService] = {}
+    if getenv("LINE_CHANNEL_SECRET") and getenv("LINE_CHANNEL_ACCESS_TOKEN"):
+        services[DEFAULT_TENANT] = LineWebhookService.from_env(responder, registry=registry)
+    for tenant in registry.tenants():
+        if tenant.owns("LINE_CHANNEL_SECRET"):
+            services[tenant.id] = LineWebhookService.from_env(responder, tenant, registry)
+    if not services:
+        raise EnvironmentError(
+            "LINE_CHANNEL_SECRET and LINE_CHANNEL_ACCESS_TOKEN must be set for the LINE webhook."
+        )
+    return services
+
+
+def _destination(body: bytes) -> Optional[str]:
+    try:
+        return json.loads(body).get("destination")
+    except (ValueError, AttributeError):
+        return None
+
+
+def create_app(
+    service: Optional[LineWebhookService] = None,
+    services: Optional[Dict[str, LineWebhookService]] = None,
+    registry: Optional[TenantRegistry] = None,
+) -> FastAPI:
+    """FastAPI app with ``POST /callback[/<tenant>]``, ``GET /healthz`` and ``GET /metrics``.
+
+    Without ``service`` / ``services`` the channels come from ``build_services()``.
+    """
+    channels: Dict[str, LineWebhookService] = dict(services or {})
+    if service is not None:
+        channels[service.tenant.id if service.tenant is not None else DEFAULT_TENANT] = service
+    state: Dict[str, TenantRegistry] = {}
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+        state["registry"] = registry or get_tenants()
+        if not channels:
+            channels.update(build_services(state["registry"]))
+        for channel in channels.values():
+            channel.start()
+        # 再起動前に積まれたまま残っている書き込みを、農場ごとに配信し直す
+        for tenant in [state["registry"].default(), *state["registry"].tenants()]:
+            with use_tenant(tenant):
+                resume_outbox()
+        try:
+            yield
+        finally:
+            for channel in channels.values():
+                await channel.stop()
+                await channel.line_api.close()
+
+    app = FastAPI(title="Agri-Agent LINE webhook", lifespan=lifespan)
+
+    def _accept(channel: Optional[LineWebhookService], body: bytes, request: Request) -> Response:
+        if channel is None:
+            return Response("unknown channel", status_code=404)
+        status = channel.accept(body, request.headers.get("X-Line-Signature"))
+        return Response("OK" if status == 200 else _BUSY_MESSAGE, status_code=status)
+
+    @app.post("/callback")
+    async def callback(request: Request) -> Response:
+        body = await request.body()
+        # 複数のチャネルを 1 つの URL で受ける場合は、Webhook の destination (ボットのユーザー ID) で振り分ける
+        tenant = state["registry"].for_destination(_destination(body))
+        channel = channels.get(tenant.id) if tenant is not None else None
+        return _accept(channel or channels.get(DEFAULT_TENANT), body, request)
+
+    @app.post("/callback/{tenant_id}")
+    async def tenant_callback(tenant_id: str, request: Request) -> Response:
+        return _accept(channels.get(tenant_id), await request.body(), request)
+
+    @app.get("/healthz")
+    async def healthz() -> Dict[str, Any]:
+        return {"status": "ok", "channels": {name: channel.stats() for name, channel in channels.items()}}
+
+    @app.get("/metrics")
+    async def metrics() -> Response:
+        return Response(metrics_text(), media_type="text/plain; version=0.0.4")
+
+    return app
+
+
+def main() -> None:
+    import uvicorn
+
+    logging.basicConfig(level=logging.INFO)
+    uvicorn.run(create_app(), host="0.0.0.0", port=int(getenv("PORT") or 8080))
+
+
+if __name__ == "__main__":
+    main()
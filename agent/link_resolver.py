@@ -0,0 +1,194 @@
+"""Batched expansion of ``multipleRecordLinks`` fields.
+
+Link fields come back from the API as lists of ``rec...`` IDs, which the model
+cannot use. Expanding them one record at a time costs one request per link
+(N+1). ``LinkResolver`` works level by level instead, like a dataloader:
+
+1. collect every linked ID of the current level across all records, grouped
+   by target table and deduplicated;
+2. fetch each table's IDs in chunked ``OR(RECORD_ID() = '...', ...)`` queries;
+3. replace the ID lists with the fetched records and continue with them.
+
+A resolver caches every record it has fetched, so it is meant to live for one
+request (one tool call). Expansion to ``depth`` levels therefore costs at most
+``depth x tables x ceil(ids / chunk_size)`` requests however many records link
+to each other. Links back to a table already on the path (the inverse side of
+a link, e.g. 作物マスター.作付計画 when coming from 作付計画) are dropped from
+the result instead of being expanded.
+
+The link targets come from the base metadata (``LinkSchema.from_tables``),
+i.e. each link field's ``linkedTableId``.
+"""
+
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from .airtable_query import compile_where, record_id_in
+
+Record = Dict[str, Any]
+# (テーブル名, RECORD_ID() で絞り込む式, 取得フィールド) -> レコード一覧
+Fetcher = Callable[[str, str, Optional[List[str]]], List[Record]]
+
+
+@dataclass
+class LinkSchema:
+    """Primary field and link targets of every table in a base."""
+
+    primary_fields: Dict[str, str] = field(default_factory=dict)
+    links: Dict[str, Dict[str, str]] = field(default_factory=dict)
+
+    @classmethod
+    def from_tables(cls, tables: Iterable[Dict[str, Any]]) -> "LinkSchema":
+        """Builds the schema from the ``tables`` list of the metadata API."""
+        tables = list(tables)
+        names = {table["id"]: table["name"] for table in tables}
+        schema = cls()
+        for table in tables:
+            for spec in table.get("fields", []):
+                if spec.get("id") == table.get("primaryFieldId"):
+                    schema.primary_fields[table["name"]] = spec["name"]
+                if spec.get("type") == "multipleRecordLinks":
+                    target = names.get((spec.get("options") or {}).get("linkedTableId"))
+                    if target:
+                        schema.links.setdefault(table["name"], {})[spec["name"]] = target
+        return schema
+
+    def link_fields(self, table_name: str) -> Dict[str, str]:
+        return self.links.get(table_name, {})
+
+    def label(self, table_name: str, record: Record) -> str:
+        """Display name of a record (its primary field, else its ID)."""
+        value = record.get("fields", {}).get(self.primary_fields.get(table_name, ""))
+        if isinstance(value, list):
+            value = ", ".join(str(v) for v in value)
+        return str(value).strip() if value not in (None, "", []) else record["id"]
+
+
+class LinkResolver:
+    """Per-request loader that expands link fields with batched lookups.
+
+    Args:
+        schema: Link targets and primary fields of the base.
+        fetch: Runs a list-records query ``(table, formula, fields)``.
+        chunk_size: Record IDs per ``OR(RECORD_ID() = ...)`` query; keeps the
+            request URL well under Airtable's length limit.
+        table_fields: Optional projection per linked table.
+    """
+
+    def __init__(
+        self,
+        schema: LinkSchema,
+        fetch: Fetcher,
+        chunk_size: int = 50,
+        table_fields: Optional[Dict[str, List[str]]] = None,
+    ):
+        self.schema = schema
+        self._fetch = fetch
+        self.chunk_size = chunk_size
+        self.table_fields = dict(table_fields or {})
+        self._records: Dict[Tuple[str, str], Optional[Record]] = {}
+        self._lock = threading.Lock()
+        self.requests = 0
+
+    def load_many(self, table_name: str, record_ids: Iterable[str]) -> Dict[str, Record]:
+        """Returns ``{id: record}`` for the IDs, fetching only uncached ones."""
+        wanted = list(dict.fromkeys(record_ids))
+        with self._lock:
+            missing = [rid for rid in wanted if (table_name, rid) not in self._records]
+        for start in range(0, len(missing), self.chunk_size):
+            chunk = missing[start : start + self.chunk_size]
+            formula = compile_where((record_id_in(chunk),))
+            records = self._fetch(table_name, formula, self.table_fields.get(table_name))
+            with self._lock:
+                self.requests += 1
+                for rid in chunk:
+                    # 削除済み・権限外の ID も再取得しないよう None を記録する
+                    self._records.setdefault((table_name, rid), None)
+                for record in records:
+                    self._records[(table_name, record["id"])] = record
+        with self._lock:
+            found = {rid: self._records.get((table_name, rid)) for rid in wanted}
+        return {rid: record for rid, record in found.items() if record is not None}
+
+    def expand(self, table_name: str, records: List[Record], depth: int = 1) -> List[Record]:
+        """Returns copies of ``records`` with link fields expanded ``depth`` levels.
+
+        Expanded link values are lists of ``{"id", "table", "label", "fields"}``;
+        IDs that could not be fetched are kept as plain strings.
+        """
+        roots = [self._node(table_name, record, (table_name,)) for record in records]
+        level = roots
+        for _ in range(max(0, depth)):
+            # この階層のリンク ID をテーブルごとにまとめて一括取得する
+            wanted: Dict[str, List[str]] = {}
+            slots: List[Tuple[Record, str, str, Tuple[str, ...]]] = []
+            for node in level:
+                links = self.schema.link_fields(node["table"])
+                for name, target in links.items():
+                    value = node["fields"].get(name)
+                    if target in node["path"] or not isinstance(value, list) or not value:
+                        continue
+                    ids = [v for v in value if isinstance(v, str)]
+                    wanted.setdefault(target, []).extend(ids)
+                    slots.append((node, name, target, node["path"]))
+            if not slots:
+                break
+            loaded = {target: self.load_many(target, ids) for target, ids in wanted.items()}
+
+            next_level: List[Record] = []
+            for node, name, target, path in slots:
+                expanded: List[Any] = []
+                for rid in node["fields"][name]:
+                    record = loaded[target].get(rid) if isinstance(rid, str) else None
+                    if record is None:
+                        expanded.append(rid)
+                        continue
+                    child = self._node(target, record, path + (target,))
+                    expanded.append(child)
+                    next_level.append(child)
+                node["fields"][name] = expanded
+            level = next_level
+        return [self._strip(node) for node in roots]
+
+    def _node(self, table_name: str, record: Record, path: Tuple[str, ...]) -> Record:
+        fields = dict(record.get("fields", {}))
+        if len(path) > 1:
+            # 逆方向のリンクは親の情報の繰り返しなので結果から外す
+            for name, target in self.schema.link_fields(table_name).items():
+                if target in path[:-1]:
+                    fields.pop(name, None)
+        return {
+            "id": record["id"],
+            "table": table_name,
+            "label": self.schema.label(table_name, record),
+            "fields": fields,
+            "path": path,
+        }
+
+    def _strip(self, node: Any) -> Any:
+        if not isinstance(node, dict):
+            return node
+        fields = {
+            name: [self._strip(v) for v in value] if isinstance(value, list) else value
+            for name, value in node["fields"].items()
+        }
+        return {"id": node["id"], "table": node["table"], "label": node["label"], "fields": fields}
+
+
+def format_expanded(record: Record, indent: int = 0) -> List[str]:
+    """Renders an expanded record as indented ``- name: value`` lines."""
+    pad = "  " * indent
+    lines: List[str] = []
+    for name, value in record["fields"].items():
+        children = [v for v in value if isinstance(v, dict)] if isinstance(value, list) else []
+        if children:
+            lines.append(f"{pad}- {name}:")
+            for child in children:
+                lines.append(f"{pad}  - {child['label']} (ID: {child['id']})")
+                lines.extend(format_expanded(child, indent + 2))
+        elif isinstance(value, list):
+            lines.append(f"{pad}- {name}: {', '.join(str(v) for v in value)}")
+        else:
+            lines.append(f"{pad}- {name}: {value}")
+    return lines
@@ -0,0 +1,270 @@
+"""Area-weighted material and fertiliser totals over 作付計画.
+
+Questions such as 「今月、大豆の圃場全体で肥料はどれだけ要る？」 need every
+作付計画 row: the per-10a rates written in ``元肥計画 (肥料名 kg/10a)`` and
+``資材使用量`` have to be parsed and multiplied by ``作つけ面積 (ha)``, then
+summed per crop / area / month / material. Doing that over record-by-record
+tool output is slow for the model and easy to get wrong, so
+``PlantingAnalytics`` does it in pandas and returns only the aggregates.
+
+The plans are loaded once into a columnar frame (one row per plan and
+material line), with the planning text split and parsed by vectorised string
+operations. The frame is rebuilt after ``max_age`` seconds or when 作付計画,
+作物マスター or 圃場データ is written through ``airtable_tools``.
+
+Planning text is one material per line (``、`` / ``,`` also separate), e.g.::
+
+    BB化成 40            -> 40 kg/10a (元肥計画 defaults to kg)
+    ダコニール 1.5L       -> 1.5 L/10a
+    苦土石灰：100kg/反    -> 100 kg/10a
+    硫安 2kg/a           -> 20 kg/10a
+
+Rates without an area unit are per 10a, as in the column name of 元肥計画.
+Lines that do not end in a number are counted as ``unparsed``.
+
+numpy and pandas are optional dependencies; they are imported on first use
+and ``AnalyticsUnavailable`` is raised when they are not installed.
+"""
+
+import threading
+import time
+import unicodedata
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+from .text_index import normalize
+
+if TYPE_CHECKING:  # pragma: no cover
+    import pandas as pd
+
+Record = Dict[str, Any]
+# (テーブル名, フィールド) -> レコードのスナップショット。airtable_tools._snapshot を渡す
+Loader = Callable[[str, List[str]], Iterable[Record]]
+
+PLAN_TABLE = "作付計画"
+CROP_TABLE = "作物マスター"
+FIELD_TABLE = "圃場データ"
+# 書き込まれると集計をやり直すテーブル
+SOURCE_TABLES = (PLAN_TABLE, CROP_TABLE, FIELD_TABLE)
+_FIELD_LOOKUP = "圃場名 (from 圃場データ)"
+_AREA_FIELD = "作つけ面積 (ha)"
+_PLAN_FIELDS = [
+    "ID",
+    "作物マスター",
+    "圃場データ",
+    _FIELD_LOOKUP,
+    _AREA_FIELD,
+    "播種予定日",
+    "定植予定日",
+    "元肥計画 (肥料名 kg/10a)",
+    "資材使用量",
+]
+
+# (種別, 列, 単位が書かれていないときの単位)
+_SOURCES = (
+    ("元肥", "元肥計画 (肥料名 kg/10a)", "kg"),
+    ("資材", "資材使用量", ""),
+)
+
+# 集計の軸として指定できる列
+GROUP_KEYS = ("crop", "area", "field", "month", "material", "kind")
+
+_SEPARATORS = r"[\n、,;；]"
+# 「名前 数量 単位 / 面積単位」。名前と数量の間の「:」「：」「=」も許容する
+_QUANTITY = (
+    r"^(?P<material>.*?)[\s:=]*(?P<rate>\d+(?:\.\d+)?)\s*"
+    r"(?P<unit>[^\d\s/]*)\s*(?:/\s*(?P<per>10a|a|ha|反))?$"
+)
+# 面積単位 -> 1 ha あたりの倍率 (1 ha = 10 x 10a = 100 a)
+_PER_HA = {"10a": 10.0, "反": 10.0, "a": 100.0, "ha": 1.0}
+_UNIT_ALIASES = {"l": "L", "ℓ": "L", "ml": "mL", "cc": "mL", "キロ": "kg", "リットル": "L"}
+
+
+class AnalyticsUnavailable(RuntimeError):
+    """numpy / pandas are not installed."""
+
+
+def _pandas() -> Any:
+    try:
+        import pandas as pd  # type: ignore
+    except ModuleNotFoundError as e:  # pragma: no cover – optional dependency
+        raise AnalyticsUnavailable(
+            "作付計画の集計には numpy と pandas が必要です (pip install numpy pandas)。"
+        ) from e
+    return pd
+
+
+def _first(value: Any) -> Any:
+    return value[0] if isinstance(value, list) and value else value
+
+
+def _text(value: Any) -> str:
+    if isinstance(value, list):
+        value = "\n".join(str(v) for v in value)
+    return unicodedata.normalize("NFKC", str(value or ""))
+
+
+def build_frame(
+    plans: Iterable[Record],
+    crop_names: Dict[str, str],
+    field_areas: Dict[str, str],
+) -> "pd.DataFrame":
+    """One row per (plan, material line) with the area-weighted ``amount``.
+
+    Columns: plan, crop, area, field, month, area_ha, kind, material, unit,
+    rate, amount. Unparsed lines have a missing ``rate`` and ``amount``.
+    """
+    pd = _pandas()
+    rows = []
+    for record in plans:
+        fields = record.get("fields", {})
+        area_ha = fields.get(_AREA_FIELD)
+        rows.append(
+            {
+                "plan": record["id"],
+                "crop": ", ".join(crop_names.get(i, i) for i in fields.get("作物マスター") or []) or "不明",
+                "area": field_areas.get(_first(fields.get("圃場データ")) or "", "不明"),
+                "field": _first(fields.get(_FIELD_LOOKUP)) or "不明",
+                # 元肥・資材は定植 (直播は播種) の月に使う
+                "month": str(fields.get("定植予定日") or fields.get("播種予定日") or "")[:7] or "不明",
+                "area_ha": float(area_ha) if isinstance(area_ha, (int, float)) else float("nan"),
+                **{kind: _text(fields.get(column)) for kind, column, _ in _SOURCES},
+            }
+        )
+    columns = ["plan", "crop", "area", "field", "month", "area_ha"]
+    frame = pd.DataFrame.from_records(rows, columns=columns + [kind for kind, _, _ in _SOURCES])
+
+    parts = []
+    for kind, _, default_unit in _SOURCES:
+        lines = frame[kind].str.split(_SEPARATORS).explode().str.strip()
+        lines = lines[lines.fillna("") != ""]
+        parsed = lines.str.extract(_QUANTITY)
+        parsed["material"] = parsed["material"].where(parsed["rate"].notna(), lines.to_numpy()).str.strip()
+        parsed["rate"] = parsed["rate"].astype(float)
+        unit = parsed["unit"].fillna("").replace(_UNIT_ALIASES)
+        parsed["unit"] = unit.where(unit != "", default_unit)
+        parsed["per_ha"] = parsed.pop("per").map(_PER_HA).fillna(_PER_HA["10a"])
+        parsed["kind"] = kind
+        # 行の index は元の計画の位置 (explode で重複する) なので、位置で計画の列を付け足す
+        plan_columns = frame.loc[parsed.index, columns].reset_index(drop=True)
+        parts.append(pd.concat([plan_columns, parsed.reset_index(drop=True)], axis=1))
+    if not parts or not sum(len(p) for p in parts):
+        return pd.DataFrame(columns=columns + ["kind", "material", "unit", "rate", "amount"])
+    long = pd.concat(parts, ignore_index=True)
+    long["amount"] = long["rate"].to_numpy() * long["per_ha"].to_numpy() * long["area_ha"].to_numpy()
+    return long.drop(columns="per_ha")
+
+
+def _round(value: float) -> float:
+    return round(float(value), 2)
+
+
+def summarize(
+    frame: "pd.DataFrame",
+    group_by: Sequence[str] = ("material",),
+    crop: Optional[str] = None,
+    area: Optional[str] = None,
+    month: Optional[str] = None,
+    material: Optional[str] = None,
+    kind: Optional[str] = None,
+    limit: int = 20,
+) -> Dict[str, Any]:
+    """Totals of ``frame`` grouped by ``group_by`` (and unit) after filtering.
+
+    ``crop`` / ``area`` / ``material`` match partially (kana and width
+    insensitive), ``month`` is ``YYYY-MM`` and ``kind`` is 元肥 or 資材.
+    """
+    import numpy as np
+
+    unknown = [key for key in group_by if key not in GROUP_KEYS]
+    if unknown:
+        raise ValueError(f"unknown group_by keys: {', '.join(unknown)} (choose from {', '.join(GROUP_KEYS)})")
+
+    mask = np.ones(len(frame), dtype=bool)
+    for column, value in (("crop", crop), ("area", area), ("material", material)):
+        if value:
+            mask &= frame[column].map(normalize).str.contains(normalize(value), regex=False).to_numpy()
+    if month:
+        mask &= (frame["month"] == month).to_numpy()
+    if kind:
+        mask &= (frame["kind"] == kind).to_numpy()
+    selected = frame[mask]
+    parsed = selected[selected["rate"].notna()]
+    unparsed = selected[selected["rate"].isna()]
+
+    keys = list(group_by) + ["unit"]
+    rows: List[Dict[str, Any]] = []
+    if len(parsed):
+        totals = parsed.groupby(keys, sort=False).agg(
+            amount=("amount", "sum"), plans=("plan", "nunique")
+        )
+        # 同じ計画に同じ資材が 2 行あっても面積は 1 回だけ数える
+        areas = parsed.drop_duplicates(keys + ["plan"]).groupby(keys, sort=False)["area_ha"].sum()
+        totals = totals.join(areas).sort_values("amount", ascending=False)
+        for index, row in totals.iterrows():
+            values = index if isinstance(index, tuple) else (index,)
+            rows.append(
+                {
+                    **dict(zip(keys, values)),
+                    "amount": _round(row["amount"]),
+                    "area_ha": _round(row["area_ha"]),
+                    "plans": int(row["plans"]),
+                }
+            )
+    plans = selected.drop_duplicates("plan")
+    return {
+        "status": "success",
+        "group_by": list(group_by),
+        "filters": {
+            key: value
+            for key, value in (("crop", crop), ("area", area), ("month", month), ("material", material), ("kind", kind))
+            if value
+        },
+        "plans": int(len(plans)),
+        "area_ha": _round(np.nansum(plans["area_ha"].to_numpy())) if len(plans) else 0.0,
+        "totals_by_unit": {
+            unit: _round(amount) for unit, amount in parsed.groupby("unit")["amount"].sum().items()
+        },
+        "rows": rows[:limit],
+        "more_rows": max(0, len(rows) - limit),
+        "unparsed": {
+            "count": int(len(unparsed)),
+            "examples": unparsed["material"].drop_duplicates().head(3).tolist(),
+        },
+    }
+
+
+class PlantingAnalytics:
+    """Cached analytics frame of 作付計画, rebuilt after ``max_age`` seconds.
+
+    Args:
+        loader: ``loader(table, fields)`` returning a snapshot of the table.
+        max_age: Seconds before the frame is rebuilt from a new snapshot.
+    """
+
+    def __init__(self, loader: Loader, max_age: float = 300.0):
+        self.loader = loader
+        self.max_age = max_age
+        self._frame: Optional["pd.DataFrame"] = None
+        self._built_at = 0.0
+        self._lock = threading.Lock()
+
+    def _load(self) -> "pd.DataFrame":
+        crop_names = {r["id"]: r["fields"].get("作物名", r["id"]) for r in self.loader(CROP_TABLE, ["作物名"])}
+        field_areas = {
+            r["id"]: r["fields"].get("エリア") or "不明" for r in self.loader(FIELD_TABLE, ["エリア"])
+        }
+        return build_frame(self.loader(PLAN_TABLE, _PLAN_FIELDS), crop_names, field_areas)
+
+    def frame(self) -> "pd.DataFrame":
+        with self._lock:
+            if self._frame is None or time.monotonic() - self._built_at > self.max_age:
+                self._frame = self._load()
+                self._built_at = time.monotonic()
+            return self._frame
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._frame = None
+
+    def summarize(self, **kwargs: Any) -> Dict[str, Any]:
+        return summarize(self.frame(), **kwargs)
@@ -0,0 +1,161 @@
+"""Paged tool output for searches that can match hundreds of records.
+
+Everything a tool returns stays in the model's context for the rest of the
+conversation, so a broad query such as 「肥料」 used to make every following
+turn slower and more expensive. ``ResultPages`` keeps the full, already ranked
+result list in memory and lets a tool return only its first page: at most
+``page_size`` items and ``char_budget`` characters, followed by an opaque
+cursor. ``show_more_results(cursor)`` serves the next page from the stored
+list without another Airtable query.
+
+Cursors are ``<result id>.<offset>``, so asking for the same page twice
+returns the same page. Stored results expire after ``ttl`` seconds, are
+evicted LRU beyond ``max_entries``, and are dropped when the table they came
+from is written through ``airtable_tools``.
+
+Configuration (read when the store is first used):
+
+    AGENT_RESULT_CHAR_BUDGET   Max characters per response (default 1200)
+    AGENT_RESULT_PAGE_SIZE     Max items per response (default 10)
+    AGENT_RESULT_TTL           Seconds a result set can be paged (default 600)
+    AGENT_RESULT_MAX_ENTRIES   Max stored result sets (default 256)
+"""
+
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Tuple
+
+from .settings import TenantLocal, getenv
+
+_EXPIRED_MESSAGE = "検索結果の有効期限が切れました。もう一度検索してください。"
+
+
+@dataclass
+class _ResultSet:
+    table: str
+    header: str
+    items: List[str]
+    expires_at: float
+
+
+class ResultPages:
+    """Thread-safe TTL / LRU store of formatted result lists, served page by page."""
+
+    def __init__(
+        self,
+        char_budget: int = 1200,
+        page_size: int = 10,
+        ttl: float = 600.0,
+        max_entries: int = 256,
+    ):
+        self.char_budget = char_budget
+        self.page_size = page_size
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, _ResultSet]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.pages_served = 0
+        self.expired = 0
+
+    @classmethod
+    def from_env(cls) -> "ResultPages":
+        return cls(
+            char_budget=int(getenv("AGENT_RESULT_CHAR_BUDGET") or 1200),
+            page_size=int(getenv("AGENT_RESULT_PAGE_SIZE") or 10),
+            ttl=float(getenv("AGENT_RESULT_TTL") or 600),
+            max_entries=int(getenv("AGENT_RESULT_MAX_ENTRIES") or 256),
+        )
+
+    def first_page(self, table: str, header: str, items: List[str]) -> str:
+        """Formats the first page of ``items`` and stores the rest behind a cursor.
+
+        ``header`` may contain ``{range}``, which is replaced by the shown
+        item numbers (e.g. ``1〜10件目``).
+        """
+        text, end = self._page(header, items, 0)
+        if end < len(items):
+            result_id = secrets.token_urlsafe(6)
+            with self._lock:
+                self._entries[result_id] = _ResultSet(table, header, items, time.monotonic() + self.ttl)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            text += self._more(result_id, end, len(items))
+        with self._lock:
+            self.pages_served += 1
+        return text
+
+    def next_page(self, cursor: str) -> str:
+        """Page starting at ``cursor`` (as printed by the previous page)."""
+        result_id, _, offset = cursor.strip().partition(".")
+        with self._lock:
+            entry = self._entries.get(result_id)
+            if entry is None or entry.expires_at <= time.monotonic() or not offset.isdigit():
+                if entry is not None and entry.expires_at <= time.monotonic():
+                    del self._entries[result_id]
+                self.expired += 1
+                return _EXPIRED_MESSAGE
+            self._entries.move_to_end(result_id)
+            self.pages_served += 1
+        start = min(int(offset), len(entry.items))
+        text, end = self._page(entry.header, entry.items, start)
+        if end < len(entry.items):
+            text += self._more(result_id, end, len(entry.items))
+        return text
+
+    def _page(self, header: str, items: List[str], start: int) -> Tuple[str, int]:
+        # 予算に収まる所まで項目を詰める。1 件目が予算を超える場合も切り詰めて 1 件は返す
+        lines: List[str] = []
+        used = len(header) + 16
+        end = start
+        while end < len(items) and end - start < self.page_size:
+            item = items[end]
+            if lines and used + len(item) + 1 > self.char_budget:
+                break
+            if not lines and used + len(item) > self.char_budget:
+                item = item[: max(0, self.char_budget - used - 1)] + "…"
+            lines.append(item)
+            used += len(item) + 1
+            end += 1
+        shown = f"{start + 1}〜{end}件目" if end > start else "該当なし"
+        return "\n".join([header.replace("{range}", shown)] + lines), end
+
+    @staticmethod
+    def _more(result_id: str, offset: int, total: int) -> str:
+        return (
+            f"\n(残り {total - offset} 件。続きは show_more_results で"
+            f' cursor="{result_id}.{offset}" を指定してください)'
+        )
+
+    def invalidate_table(self, table: str) -> int:
+        """Drops every stored result of ``table`` and returns how many were removed."""
+        with self._lock:
+            stale = [key for key, entry in self._entries.items() if entry.table == table]
+            for key in stale:
+                del self._entries[key]
+            return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "pages_served": self.pages_served,
+                "expired": self.expired,
+                "char_budget": self.char_budget,
+                "page_size": self.page_size,
+            }
+
+
+_pages: TenantLocal[ResultPages] = TenantLocal(ResultPages.from_env)
+
+
+def get_result_pages() -> ResultPages:
+    """Returns the current tenant's result store, creating it on first use."""
+    return _pages.get()
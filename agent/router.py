@@ -0,0 +1,359 @@
+"""Deterministic fast path for high-frequency LINE messages.
+
+Messages such as "今日のタスク" or "A-3の情報" always map to exactly one tool
+call, yet going through ``root_agent`` costs a multi-second gemini-2.5-pro turn.
+``IntentRouter`` answers them directly:
+
+1. Entity patterns (regexes) extract tool arguments such as a field name from
+   the message with its punctuation and spaces intact (they bound names). An
+   entity that swallows one of the intent's keywords ("今日山田さん") makes the
+   message ambiguous.
+2. A small keyword classifier scores each intent by how much of the message is
+   explained by its keywords, the extracted entities and neutral filler words
+   ("の", "教えて", ...). A message like "今日のタスク教えて" is fully explained
+   (confidence 1.0); "今日のタスクが終わったらA-3に何kg撒けばいい？" is not.
+   A negation or cancellation ("中止", "ません", ...) halves the confidence:
+   "今日の作業は中止です" is a report, not a request for the task list.
+3. If exactly one intent clears the threshold its tool is called and the
+   formatted answer returned; otherwise the caller falls back to the agent.
+
+Every decision is counted per path and intent (``stats()``).
+
+Configuration:
+
+    AGENT_ROUTER_THRESHOLD  Minimum confidence for the fast path (default 0.8)
+    AGENT_ROUTER_INTENTS    Comma-separated intent names to enable (default all)
+"""
+
+import re
+import threading
+import unicodedata
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Pattern, Tuple
+
+from .instrumentation import instrument_tool, turn
+from .settings import getenv
+from .text_index import normalize
+
+# 意図の判定に影響しない語 (助詞・依頼表現など)。長い語から順に照合する
+_FILLERS = sorted(
+    (
+        "の は を が に で も って について 教えて おしえて ください 下さい ちょうだい "
+        "見せて みせて 知りたい しりたい 確認 かくにん 一覧 いちらん 何 なに ある あります "
+        "ますか ですか です か よ ね お願い おねがい します して どう どんな 全部 ぜんぶ"
+    ).split(),
+    key=len,
+    reverse=True,
+)
+_PUNCT_CHARS = r"\s?？!！。、,.…「」『』()（）"
+_PUNCT_RE = re.compile(rf"[{_PUNCT_CHARS}]+")
+# 否定・取り消しの語。含まれる文は一覧の要求ではなく報告や指示のことが多い
+_NEGATIONS = "中止 取り消 取消 キャンセル やめ 止め 延期 休み ません ない なし 無し".split()
+_NEGATION_PENALTY = 0.5
+
+
+@dataclass
+class Intent:
+    """A high-frequency request that maps to one tool call.
+
+    Attributes:
+        name: Intent name used in stats and configuration.
+        tool: Tool function returning the formatted answer string.
+        keyword_groups: Each group needs at least one keyword present.
+        optional_keywords: Keywords that count as explained text but are not
+            required (e.g. "私").
+        entities: Tool parameter -> regex with one named group of the same
+            name; matched spans count as explained text.
+        required_entities: Parameters that must be extracted.
+        build_args: Optional hook ``(entities, text, user_name) -> kwargs``;
+            returning ``None`` leaves the message to the agent.
+    """
+
+    name: str
+    tool: Callable[..., str]
+    keyword_groups: List[List[str]]
+    optional_keywords: List[str] = field(default_factory=list)
+    entities: Dict[str, Pattern[str]] = field(default_factory=dict)
+    required_entities: List[str] = field(default_factory=list)
+    build_args: Optional[Callable[[Dict[str, str], str, Optional[str]], Optional[Dict[str, Any]]]] = None
+
+
+@dataclass
+class RouteResult:
+    """Outcome of routing one message."""
+
+    handled: bool
+    intent: Optional[str]
+    confidence: float
+    answer: Optional[str] = None
+    reason: str = ""
+    args: Dict[str, Any] = field(default_factory=dict)
+
+
+def _prepare(text: str) -> Tuple[str, str]:
+    """Returns (NFKC text without spaces/punctuation, folded text for keywords)."""
+    base = _PUNCT_RE.sub("", unicodedata.normalize("NFKC", text))
+    folded = normalize(base)
+    # 長さが変わる特殊な文字が含まれる場合は位置対応を保つため元の文字列を使う
+    return base, folded if len(folded) == len(base) else base
+
+
+def _mark(covered: List[bool], folded: str, word: str) -> bool:
+    word = normalize(word)
+    found = False
+    start = folded.find(word)
+    while word and start >= 0:
+        found = True
+        for i in range(start, start + len(word)):
+            covered[i] = True
+        start = folded.find(word, start + len(word))
+    return found
+
+
+def _mark_span(covered: List[bool], base: str, span: str) -> None:
+    start = base.find(span)
+    while span and start >= 0:
+        for i in range(start, start + len(span)):
+            covered[i] = True
+        start = base.find(span, start + len(span))
+
+
+class IntentRouter:
+    """Routes messages to a single tool call when the intent is unambiguous."""
+
+    def __init__(self, intents: List[Intent], threshold: float = 0.8):
+        self.intents = list(intents)
+        self.threshold = threshold
+        self._stats: Counter = Counter()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, intents: Optional[List[Intent]] = None) -> "IntentRouter":
+        intents = intents if intents is not None else default_intents()
+        enabled = getenv("AGENT_ROUTER_INTENTS")
+        if enabled:
+            names = {name.strip() for name in enabled.split(",")}
+            intents = [intent for intent in intents if intent.name in names]
+        threshold = float(getenv("AGENT_ROUTER_THRESHOLD") or 0.8)
+        return cls(intents, threshold=threshold)
+
+    # -- classification ----------------------------------------------------
+
+    def score(self, intent: Intent, text: str) -> Tuple[float, Dict[str, str]]:
+        """Returns (confidence, extracted entities) of ``intent`` for ``text``."""
+        base, folded = _prepare(text)
+        if not base:
+            return 0.0, {}
+        covered = [False] * len(base)
+
+        entities: Dict[str, str] = {}
+        # 句読点・空白を境界に使えるよう、エンティティは除去前の文字列から探す
+        raw = unicodedata.normalize("NFKC", text)
+        keywords = [normalize(word) for group in intent.keyword_groups for word in group]
+        for param, pattern in intent.entities.items():
+            match = pattern.search(raw)
+            if match:
+                value = match.group(param)
+                if any(word in normalize(value) for word in keywords):
+                    # 「今日山田さん」のようにキーワードを飲み込んだ値は信用しない
+                    return 0.0, entities
+                entities[param] = value
+                _mark_span(covered, base, _PUNCT_RE.sub("", match.group(0)))
+        if any(param not in entities for param in intent.required_entities):
+            return 0.0, entities
+
+        for group in intent.keyword_groups:
+            # 全キーワードを照合してカバー範囲に反映する (any() の短絡評価は使わない)
+            hits = [_mark(covered, folded, word) for word in group]
+            if not any(hits):
+                return 0.0, entities
+        for word in intent.optional_keywords:
+            _mark(covered, folded, word)
+        for word in _FILLERS:
+            _mark(covered, folded, word)
+        confidence = sum(covered) / len(base)
+        if any(normalize(word) in folded for word in _NEGATIONS):
+            confidence *= _NEGATION_PENALTY
+        return confidence, entities
+
+    def classify(self, text: str) -> RouteResult:
+        """Picks the best intent without calling any tool."""
+        scored = []
+        for intent in self.intents:
+            confidence, entities = self.score(intent, text)
+            scored.append((confidence, intent, entities))
+        scored.sort(key=lambda item: item[0], reverse=True)
+        if not scored or scored[0][0] < self.threshold:
+            best = scored[0] if scored else (0.0, None, {})
+            return RouteResult(
+                False, best[1].name if best[1] else None, best[0], reason="low_confidence"
+            )
+        if len(scored) > 1 and scored[1][0] >= self.threshold:
+            return RouteResult(False, scored[0][1].name, scored[0][0], reason="ambiguous")
+        confidence, intent, entities = scored[0]
+        return RouteResult(True, intent.name, confidence, args=dict(entities))
+
+    # -- routing -----------------------------------------------------------
+
+    def _intent(self, name: str) -> Intent:
+        return next(intent for intent in self.intents if intent.name == name)
+
+    def _prepare_call(self, text: str, user_name: Optional[str]) -> RouteResult:
+        result = self.classify(text)
+        if result.handled:
+            intent = self._intent(result.intent)
+            if intent.build_args is not None:
+                args = intent.build_args(result.args, text, user_name)
+                if args is None:
+                    result.handled, result.reason = False, "missing_entity"
+                else:
+                    result.args = args
+        return result
+
+    def _record(self, result: RouteResult) -> None:
+        with self._lock:
+            if result.handled:
+                self._stats[("fast", result.intent)] += 1
+            else:
+                self._stats[("agent", result.reason)] += 1
+
+    def route(self, text: str, user_name: Optional[str] = None) -> RouteResult:
+        """Answers ``text`` directly if possible; ``handled=False`` means use the agent."""
+        result = self._prepare_call(text, user_name)
+        if result.handled:
+            # 高速経路の応答も 1 ターンとして計測する
+            with turn():
+                result.answer = self._intent(result.intent).tool(**result.args)
+        self._record(result)
+        return result
+
+    def handle(
+        self,
+        text: str,
+        fallback: Callable[[str], str],
+        user_name: Optional[str] = None,
+    ) -> str:
+        """Returns the fast-path answer, or ``fallback(text)`` (the full agent)."""
+        result = self.route(text, user_name)
+        return result.answer if result.handled else fallback(text)
+
+    async def route_async(self, text: str, user_name: Optional[str] = None) -> RouteResult:
+        """asyncio version of ``route``; tools run on the shared client pool."""
+        from .airtable_client import get_async_client
+
+        result = self._prepare_call(text, user_name)
+        if result.handled:
+            tool = self._intent(result.intent).tool
+            with turn():
+                result.answer = await get_async_client().run_blocking(tool, **result.args)
+        self._record(result)
+        return result
+
+    async def handle_async(
+        self,
+        text: str,
+        fallback: Callable[[str], Awaitable[str]],
+        user_name: Optional[str] = None,
+    ) -> str:
+        """asyncio version of ``handle``."""
+        result = await self.route_async(text, user_name)
+        return result.answer if result.handled else await fallback(text)
+
+    def stats(self) -> Dict[str, Any]:
+        """Counts per path: ``{"fast": {intent: n}, "agent": {reason: n}, ...}``."""
+        with self._lock:
+            out: Dict[str, Any] = {"fast": {}, "agent": {}}
+            for (path, key), count in self._stats.items():
+                out[path][key] = count
+        total = sum(out["fast"].values()) + sum(out["agent"].values())
+        out["total"] = total
+        out["fast_ratio"] = sum(out["fast"].values()) / total if total else 0.0
+        return out
+
+
+# ---------------------------------------------------------------------------
+# Default intents
+# ---------------------------------------------------------------------------
+
+_SELF_WORDS = ["私", "わたし", "自分", "僕", "ぼく", "俺", "おれ"]
+# 個人名ではなく全員を指す語 (「みなさんの今日の作業」は担当者で絞り込まない)
+_GROUP_WORDS = ["みなさん", "皆さん", "皆様", "みなさま", "全員", "みんな"]
+
+# 担当者名: 文頭・句読点・空白・助詞の直後から「さん・くん・君」の直前まで。途中に助詞
+# を含むもの (「タスクを田中さん」) と全員を指す語は名前として扱わない
+_WORKER_RE = re.compile(
+    rf"(?:^|(?<=[のはもへと{_PUNCT_CHARS}]))(?!みな|皆)"
+    rf"(?P<worker_name>[^のはをがにで\d{_PUNCT_CHARS}]{{1,10}}?)(?:さん|くん|君)"
+)
+# 圃場 ID: 「A3」「a-3」「Ａ－３」などを「A-3」の形にそろえる
+_FIELD_RE = re.compile(r"(?P<field_name>[A-Za-z]{1,3}-?\d{1,3})")
+_FIELD_PARTS_RE = re.compile(r"([A-Za-z]+)-?(\d+)")
+
+
+def _today_tasks_args(
+    entities: Dict[str, str], text: str, user_name: Optional[str]
+) -> Optional[Dict[str, Any]]:
+    worker = entities.get("worker_name")
+    if not worker and any(word in text for word in _SELF_WORDS):
+        if not user_name:
+            # 送信者の担当者名が分からない「私のタスク」は全員分を返さずエージェントに任せる
+            return None
+        worker = user_name
+    return {"worker_name": worker} if worker else {}
+
+
+def normalize_field_id(value: str) -> str:
+    """"a3" / "A3" / "a-3" -> "A-3" (the form used by the 圃場 records)."""
+    match = _FIELD_PARTS_RE.fullmatch(unicodedata.normalize("NFKC", value).replace("ー", "-").strip())
+    if match is None:
+        return value
+    return f"{match.group(1).upper()}-{match.group(2)}"
+
+
+def _field_info_args(
+    entities: Dict[str, str], text: str, user_name: Optional[str]
+) -> Dict[str, Any]:
+    return {"field_name": normalize_field_id(entities["field_name"])}
+
+
+def default_intents() -> List[Intent]:
+    """Intents for the most frequent messages (today's tasks, field info)."""
+    from .airtable_tools import get_field_info, get_today_tasks
+
+    return [
+        Intent(
+            name="today_tasks",
+            tool=instrument_tool(get_today_tasks),
+            keyword_groups=[
+                ["今日", "本日", "きょう"],
+                ["タスク", "作業", "仕事", "予定", "やること"],
+            ],
+            optional_keywords=_SELF_WORDS + _GROUP_WORDS,
+            entities={"worker_name": _WORKER_RE},
+            build_args=_today_tasks_args,
+        ),
+        Intent(
+            name="field_info",
+            tool=instrument_tool(get_field_info),
+            keyword_groups=[["情報", "詳細", "データ", "状況", "作付", "土壌"]],
+            optional_keywords=["圃場", "畑", "ほ場"],
+            entities={"field_name": _FIELD_RE},
+            required_entities=["field_name"],
+            build_args=_field_info_args,
+        ),
+    ]
+
+
+_router: Optional[IntentRouter] = None
+_router_lock = threading.Lock()
+
+
+def get_router() -> IntentRouter:
+    """Returns the process-wide router configured from the environment."""
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = IntentRouter.from_env()
+    return _router
@@ -0,0 +1,209 @@
+"""Lazily resolved connection settings of the agent.
+
+Nothing is read at import time: ``get_settings()`` and ``getenv()`` load
+``.env`` (when python-dotenv is installed) on first use, so ``agent``
+can be imported by tooling without credentials and a webhook's cold start
+does not pay for configuration it does not use yet. Missing credentials
+raise ``EnvironmentError`` when a request actually needs them.
+
+    AIRTABLE_API_KEY / AIRTABLE_PAT   Personal access token
+    AIRTABLE_BASE_ID                  Base the tools work on
+    AIRTABLE_API_ROOT                 API endpoint (default https://api.airtable.com/v0;
+                                      e.g. scripts/fake_airtable.py for local runs)
+
+One process can serve several farms (tenants, see ``agent.tenants``).
+``use_settings()`` binds a tenant's settings to the current context (a
+context variable, so it follows asyncio tasks and ``run_in_context``
+threads); ``get_settings()`` and ``getenv()`` then answer for that tenant,
+and ``TenantLocal`` keeps one client, cache, mirror, ... per tenant instead
+of one per process.
+"""
+
+import contextvars
+import os
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Generic, Iterator, List, Mapping, Optional, Tuple, TypeVar
+from urllib.parse import quote
+
+T = TypeVar("T")
+
+DEFAULT_TENANT = "default"
+
+DEFAULT_API_ROOT = "https://api.airtable.com/v0"
+
+_dotenv_loaded = False
+
+
+def load_dotenv_once() -> None:
+    """Loads ``.env`` into the environment the first time it is called."""
+    global _dotenv_loaded
+    if _dotenv_loaded:
+        return
+    _dotenv_loaded = True
+    try:
+        from dotenv import load_dotenv  # type: ignore
+    except ModuleNotFoundError:  # pragma: no cover – optional dependency
+        # dotenv is optional; skip loading .env if the library isn't available.
+        return
+    load_dotenv()
+
+
+def getenv(name: str, default: Optional[str] = None) -> Optional[str]:
+    """``os.getenv`` that loads ``.env`` first; every agent setting is read through it.
+
+    Inside ``use_settings()`` the bound tenant's own values take precedence.
+    """
+    load_dotenv_once()
+    bound = _bound.get()
+    if bound is not None and name in bound.env:
+        return bound.env[name]
+    return os.getenv(name, default)
+
+
+@dataclass(frozen=True)
+class Settings:
+    """Airtable credentials and endpoint (of one tenant).
+
+    ``env`` holds the tenant's overrides of other settings (paths, rate
+    limits, LINE channel, ...), returned by ``getenv()`` while bound.
+    """
+
+    api_key: Optional[str] = None
+    base_id: Optional[str] = None
+    api_root: str = DEFAULT_API_ROOT
+    tenant: str = DEFAULT_TENANT
+    env: Mapping[str, str] = field(default_factory=dict, compare=False, hash=False, repr=False)
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        return cls(
+            api_key=getenv("AIRTABLE_API_KEY") or getenv("AIRTABLE_PAT"),
+            base_id=getenv("AIRTABLE_BASE_ID"),
+            api_root=(getenv("AIRTABLE_API_ROOT") or DEFAULT_API_ROOT).rstrip("/"),
+        )
+
+    @classmethod
+    def for_tenant(cls, tenant: str, env: Mapping[str, str]) -> "Settings":
+        """Settings of a tenant; credentials are never taken from the process environment."""
+        return cls(
+            api_key=env.get("AIRTABLE_API_KEY") or env.get("AIRTABLE_PAT"),
+            base_id=env.get("AIRTABLE_BASE_ID"),
+            api_root=(
+                env.get("AIRTABLE_API_ROOT") or getenv("AIRTABLE_API_ROOT") or DEFAULT_API_ROOT
+            ).rstrip("/"),
+            tenant=tenant,
+            env=dict(env),
+        )
+
+    def require_api_key(self) -> str:
+        if not self.api_key:
+            raise EnvironmentError(
+                f"AIRTABLE_API_KEY is not set{self._for()}. "
+                "Add it to your environment or .env file."
+            )
+        return self.api_key
+
+    def require_base_id(self) -> str:
+        if not self.base_id:
+            raise EnvironmentError(
+                f"AIRTABLE_BASE_ID is not set{self._for()}. "
+                "Add it to your environment or .env file."
+            )
+        return self.base_id
+
+    def _for(self) -> str:
+        return "" if self.tenant == DEFAULT_TENANT else f" for tenant {self.tenant!r}"
+
+    def table_url(self, table_name: str) -> str:
+        return f"{self.api_root}/{self.require_base_id()}/{quote(table_name, safe='')}"
+
+    def meta_url(self, table_id: Optional[str] = None) -> str:
+        """Metadata API URL of the base's tables (or of one table)."""
+        url = f"{self.api_root}/meta/bases/{self.require_base_id()}/tables"
+        return f"{url}/{table_id}" if table_id else url
+
+
+_settings: Optional[Settings] = None
+_settings_lock = threading.Lock()
+# use_settings() で現在のコンテキストに結び付けたテナントの設定
+_bound: contextvars.ContextVar[Optional[Settings]] = contextvars.ContextVar(
+    "agent_settings", default=None
+)
+
+
+def get_settings() -> Settings:
+    """Returns the bound tenant's settings, else the process-wide ones (resolved on first use)."""
+    global _settings
+    bound = _bound.get()
+    if bound is not None:
+        return bound
+    if _settings is None:
+        with _settings_lock:
+            if _settings is None:
+                _settings = Settings.from_env()
+    return _settings
+
+
+def set_settings(settings: Optional[Settings]) -> None:
+    """Replaces the settings (``None`` re-reads the environment on next use)."""
+    global _settings
+    with _settings_lock:
+        _settings = settings
+
+
+@contextmanager
+def use_settings(settings: Settings) -> Iterator[Settings]:
+    """Binds ``settings`` (a tenant) to the current context for the ``with`` block."""
+    token = _bound.set(settings)
+    try:
+        yield settings
+    finally:
+        _bound.reset(token)
+
+
+def current_tenant() -> str:
+    """ID of the tenant the current code runs for (``"default"`` when none is bound)."""
+    bound = _bound.get()
+    return bound.tenant if bound is not None else DEFAULT_TENANT
+
+
+class TenantLocal(Generic[T]):
+    """One lazily created ``factory()`` result per tenant.
+
+    Replaces process-wide singletons: ``get()`` returns the instance of the
+    tenant bound by ``use_settings()`` (``factory`` runs in that tenant's
+    context, so it reads that tenant's settings).
+    """
+
+    def __init__(self, factory: Callable[[], T]):
+        self.factory = factory
+        self._values: Dict[str, T] = {}
+        self._lock = threading.Lock()
+
+    def get(self) -> T:
+        tenant = current_tenant()
+        value = self._values.get(tenant)
+        if value is None:
+            with self._lock:
+                value = self._values.get(tenant)
+                if value is None:
+                    value = self._values[tenant] = self.factory()
+        return value
+
+    def peek(self) -> Optional[T]:
+        """The current tenant's instance if it has been created, else ``None``."""
+        return self._values.get(current_tenant())
+
+    def set(self, value: Optional[T]) -> None:
+        """Replaces the current tenant's instance (``None`` recreates it on next use)."""
+        with self._lock:
+            if value is None:
+                self._values.pop(current_tenant(), None)
+            else:
+                self._values[current_tenant()] = value
+
+    def items(self) -> List[Tuple[str, T]]:
+        with self._lock:
+            return list(self._values.items())
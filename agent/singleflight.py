@@ -0,0 +1,113 @@
+"""Single-flight coalescing of identical concurrent calls.
+
+Around shift start many workers ask for today's tasks within the same second,
+producing identical list-records queries. ``SingleFlight`` lets the first
+caller for a key (the leader) run the request while every concurrent caller
+with the same key waits for, and shares, the leader's result or exception.
+
+Threads and asyncio tasks share the same in-flight table: the leader publishes
+its result through a ``concurrent.futures.Future``, which blocking followers
+wait on directly and coroutine followers await via ``asyncio.wrap_future``.
+A coroutine follower awaits it through ``asyncio.shield``, so cancelling one
+follower never cancels the shared future for the leader and the others.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import Future, InvalidStateError
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple, TypeVar
+
+from .settings import TenantLocal
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Deduplicates concurrent calls that share a key."""
+
+    def __init__(self) -> None:
+        self._inflight: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.executions = 0
+        self.deduplicated = 0
+
+    def _join(self, key: Hashable) -> Tuple[Future, bool]:
+        with self._lock:
+            self.calls += 1
+            future = self._inflight.get(key)
+            if future is not None:
+                self.deduplicated += 1
+                return future, False
+            future = Future()
+            self._inflight[key] = future
+            self.executions += 1
+            return future, True
+
+    def _leave(self, key: Hashable) -> None:
+        with self._lock:
+            self._inflight.pop(key, None)
+
+    @staticmethod
+    def _publish(future: Future, result: Any = None, error: Optional[BaseException] = None) -> None:
+        # 共有の Future が既に完了 (キャンセル) していても、リーダー自身の結果は返す
+        if future.done():
+            return
+        try:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+        except InvalidStateError:
+            pass
+
+    def do(self, key: Hashable, fn: Callable[[], T]) -> T:
+        """Runs ``fn`` unless a call with ``key`` is already in flight."""
+        future, leader = self._join(key)
+        if not leader:
+            return future.result()
+        try:
+            result = fn()
+        except BaseException as e:
+            self._publish(future, error=e)
+            raise
+        else:
+            self._publish(future, result)
+            return result
+        finally:
+            self._leave(key)
+
+    async def do_async(self, key: Hashable, factory: Callable[[], Awaitable[T]]) -> T:
+        """Coroutine version of ``do``; ``factory`` returns the awaitable to run."""
+        future, leader = self._join(key)
+        if not leader:
+            # 待っている 1 つのタスクがキャンセルされても、共有の Future はキャンセルしない
+            return await asyncio.shield(asyncio.wrap_future(future))
+        try:
+            result = await factory()
+        except BaseException as e:
+            self._publish(future, error=e)
+            raise
+        else:
+            self._publish(future, result)
+            return result
+        finally:
+            self._leave(key)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "executions": self.executions,
+                "deduplicated": self.deduplicated,
+                "in_flight": len(self._inflight),
+            }
+
+
+# 同じクエリでもテナント (ベース) が違えば別の呼び出しになる
+_flights: TenantLocal[SingleFlight] = TenantLocal(SingleFlight)
+
+
+def get_singleflight() -> SingleFlight:
+    """Returns the current tenant's single-flight group used by the read path."""
+    return _flights.get()
@@ -0,0 +1,296 @@
+"""Per-worker digest of today's unfinished tasks.
+
+Around shift start every worker asks for today's tasks, and ``get_today_tasks``
+used to send one ``IS_SAME({予定日}, today)`` + ``FIND(..., ARRAYJOIN({担当者}))``
+query per worker. ``TaskDigest`` pulls today's unfinished 作業タスク once
+(paged, projected to the few fields the tools use, ``cellFormat=string`` so
+that 担当者 and the 圃場名 lookup arrive as display text), groups them by
+担当者 and answers every later request with a dictionary lookup.
+
+The digest lives in memory and in a JSON file, so a restarted process does not
+have to pull it again. It is kept current by write notifications: tasks marked
+完了 or moved to another day are dropped immediately, newly created tasks are
+fetched by record ID on the next lookup, and the whole digest is rebuilt after
+``max_age`` seconds to pick up edits made in the Airtable UI.
+
+``start_scheduler`` rebuilds the digest every day at a fixed time (e.g. before
+shift start); ``scripts/prefetch_today_tasks.py`` does the same from cron. A
+running process reloads the file when its modification time changes, so a
+digest prefetched by another process is picked up on the next lookup.
+"""
+
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DIGEST_PATH = ".task_digest.json"
+
+Record = Dict[str, Any]
+# (予定日, レコードID の絞り込み) -> 今日の未完了タスク (cellFormat=string のレコード)
+Loader = Callable[[str, Optional[List[str]]], Iterable[Record]]
+
+_DONE_STATUS = "完了"
+
+
+def _split_names(value: Any) -> List[str]:
+    # cellFormat=string では複数の値が ", " 区切りの 1 つの文字列になる
+    if isinstance(value, list):
+        return [str(v).strip() for v in value if str(v).strip()]
+    return [name.strip() for name in str(value or "").split(",") if name.strip()]
+
+
+class TaskDigest:
+    """Today's unfinished tasks grouped by worker.
+
+    Args:
+        loader: Fetches today's unfinished tasks (all, or only the given IDs).
+        path: JSON file the digest is persisted to (``None`` keeps it in memory).
+        max_age: Seconds before the digest is rebuilt from Airtable.
+        task_field / place_field / worker_field: Field names in the records.
+    """
+
+    def __init__(
+        self,
+        loader: Loader,
+        path: Optional[str] = DEFAULT_DIGEST_PATH,
+        max_age: float = 900.0,
+        task_field: str = "タスク名",
+        place_field: str = "圃場名",
+        worker_field: str = "担当者",
+    ):
+        self._loader = loader
+        self.path = path
+        self.max_age = max_age
+        self.task_field = task_field
+        self.place_field = place_field
+        self.worker_field = worker_field
+        self.day: Optional[str] = None
+        self.built_at: Optional[float] = None
+        self._tasks: Dict[str, Dict[str, Any]] = {}
+        self._by_worker: Dict[str, List[str]] = {}
+        self._dirty: Set[str] = set()
+        self._lock = threading.RLock()
+        self._refresh_lock = threading.Lock()
+        self._scheduler: Optional[threading.Thread] = None
+        # 最後に読み書きしたファイルの更新時刻 (他のプロセスが書き直したら読み直す)
+        self._mtime: Optional[float] = None
+        self._load()
+
+    # -- persistence -------------------------------------------------------
+
+    def _file_mtime(self) -> Optional[float]:
+        try:
+            return os.stat(self.path).st_mtime if self.path else None
+        except OSError:
+            return None
+
+    def _load(self) -> None:
+        mtime = self._file_mtime()
+        if mtime is None:
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:  # type: ignore[arg-type]
+                data = json.load(f)
+        except (OSError, ValueError):
+            logger.warning("ignoring unreadable task digest %s", self.path)
+            return
+        with self._lock:
+            self._mtime = mtime
+            self.day = data.get("day")
+            self.built_at = data.get("built_at")
+            self._tasks = {task["record_id"]: task for task in data.get("tasks", [])}
+            self._regroup()
+
+    def _save(self) -> None:
+        if not self.path:
+            return
+        data = {"day": self.day, "built_at": self.built_at, "tasks": list(self._tasks.values())}
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+        self._mtime = self._file_mtime()
+
+    def _reload_if_changed(self) -> None:
+        mtime = self._file_mtime()
+        if mtime is not None and mtime != self._mtime:
+            # cron の先読み (scripts/prefetch_today_tasks.py) など、別プロセスが書き直した
+            self._load()
+
+    # -- building ----------------------------------------------------------
+
+    def _task(self, record: Record) -> Dict[str, Any]:
+        fields = record.get("fields", {})
+        return {
+            "record_id": record["id"],
+            "task_name": fields.get(self.task_field) or "N/A",
+            "field_name": fields.get(self.place_field) or "N/A",
+            "workers": _split_names(fields.get(self.worker_field)),
+        }
+
+    def _regroup(self) -> None:
+        by_worker: Dict[str, List[str]] = {}
+        for record_id, task in self._tasks.items():
+            for worker in task["workers"]:
+                by_worker.setdefault(worker, []).append(record_id)
+        self._by_worker = by_worker
+
+    def refresh(self, day: Optional[str] = None) -> Dict[str, Any]:
+        """Rebuilds the digest for ``day`` (default today) with one paged query."""
+        day = day or date.today().isoformat()
+        started = time.monotonic()
+        tasks = {task["record_id"]: task for task in map(self._task, self._loader(day, None))}
+        with self._lock:
+            self.day = day
+            self.built_at = time.time()
+            self._tasks = tasks
+            self._dirty.clear()
+            self._regroup()
+            self._save()
+        return {
+            "day": day,
+            "tasks": len(tasks),
+            "workers": len(self._by_worker),
+            "seconds": round(time.monotonic() - started, 3),
+        }
+
+    def _stale(self, today: str) -> bool:
+        return (
+            self.day != today or self.built_at is None or time.time() - self.built_at > self.max_age
+        )
+
+    def _ensure_fresh(self) -> None:
+        today = date.today().isoformat()
+        self._reload_if_changed()
+        if self._stale(today):
+            # 同時に来た問い合わせで何度も全件取得しないよう 1 スレッドだけが再構築する
+            with self._refresh_lock:
+                if self._stale(today):
+                    self.refresh(today)
+            return
+        with self._lock:
+            dirty = sorted(self._dirty)
+            self._dirty.clear()
+        if dirty:
+            # 作成・再スケジュールされたタスクだけを ID 指定で取り直す
+            try:
+                fetched = {rec["id"]: self._task(rec) for rec in self._loader(today, dirty)}
+            except Exception:
+                # 取り直せなかったレコードは次の問い合わせで再び取りに行く
+                with self._lock:
+                    self._dirty.update(dirty)
+                raise
+            with self._lock:
+                for record_id in dirty:
+                    if record_id in fetched:
+                        self._tasks[record_id] = fetched[record_id]
+                    else:
+                        self._tasks.pop(record_id, None)
+                self._regroup()
+                self._save()
+
+    # -- lookups -----------------------------------------------------------
+
+    def tasks_for(self, worker_name: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Returns today's unfinished tasks, of ``worker_name`` if given.
+
+        Like the ``FIND()`` filter it replaces, a worker name matches every
+        担当者 that contains it (e.g. "田中" matches "田中太郎").
+        """
+        self._ensure_fresh()
+        return self._lookup(worker_name)
+
+    def snapshot_for(self, worker_name: Optional[str] = None) -> Optional[List[Dict[str, Any]]]:
+        """Like ``tasks_for`` but without refreshing: the last digest built today, else ``None``.
+
+        Used when Airtable cannot be reached, so the tasks are possibly stale.
+        """
+        self._reload_if_changed()
+        if self.day != date.today().isoformat():
+            return None
+        return self._lookup(worker_name)
+
+    def _lookup(self, worker_name: Optional[str]) -> List[Dict[str, Any]]:
+        with self._lock:
+            if not worker_name:
+                ids = list(self._tasks)
+            else:
+                ids = []
+                for worker, worker_ids in self._by_worker.items():
+                    if worker_name in worker:
+                        ids.extend(i for i in worker_ids if i not in ids)
+            return [dict(self._tasks[record_id]) for record_id in ids]
+
+    def workers(self) -> Dict[str, int]:
+        """Number of unfinished tasks per worker."""
+        self._ensure_fresh()
+        with self._lock:
+            return {worker: len(ids) for worker, ids in self._by_worker.items()}
+
+    # -- incremental updates ----------------------------------------------
+
+    def apply_write(self, action: str, records: List[Record]) -> None:
+        """Applies a write to 作業タスク made through ``airtable_tools``."""
+        if self.day is None:
+            return
+        with self._lock:
+            changed = False
+            for record in records:
+                record_id = record["id"]
+                fields = record.get("fields", {})
+                if action == "delete":
+                    changed |= self._tasks.pop(record_id, None) is not None
+                    continue
+                scheduled = fields.get("予定日")
+                done = fields.get("ステータス") == _DONE_STATUS
+                if done or (scheduled and scheduled != self.day):
+                    changed |= self._tasks.pop(record_id, None) is not None
+                elif (
+                    action == "create"
+                    or record_id not in self._tasks
+                    or "予定日" not in fields
+                    or self.worker_field in fields
+                    or self.place_field in fields
+                ):
+                    # 担当者・圃場名は表示形式で取り直す必要がある (担当替えも次の問い合わせで反映)
+                    self._dirty.add(record_id)
+                elif self.task_field in fields:
+                    self._tasks[record_id]["task_name"] = fields[self.task_field]
+                    changed = True
+            if changed:
+                self._regroup()
+                self._save()
+
+    # -- scheduling --------------------------------------------------------
+
+    def start_scheduler(self, at: str) -> None:
+        """Rebuilds the digest every day at ``at`` ("HH:MM", local time)."""
+        hour, minute = (int(part) for part in at.split(":"))
+        if self._scheduler is not None and self._scheduler.is_alive():
+            return
+
+        def run() -> None:
+            while True:
+                now = datetime.now()
+                target = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+                if target <= now:
+                    target += timedelta(days=1)
+                time.sleep((target - now).total_seconds())
+                try:
+                    stats = self.refresh()
+                    logger.info("task digest refreshed: %s", stats)
+                except Exception:
+                    logger.exception("task digest refresh failed")
+
+        # 起動したテナントの設定で読み込む
+        self._scheduler = threading.Thread(
+            target=contextvars.copy_context().run, args=(run,), name="task-digest", daemon=True
+        )
+        self._scheduler.start()
@@ -0,0 +1,217 @@
+"""Tenant registry: one process serving the Airtable bases of several farms.
+
+Each farm (tenant) has its own base ID and token, and usually its own LINE
+channel. A tenant's ``Settings`` are bound to the current context with
+``use_tenant()``; while bound, every tool in ``airtable_tools`` and
+``async_airtable_tools`` works on that tenant's base through that tenant's
+own connection pool, rate-limit buckets, read cache, mirror, outbox, search
+indexes and schema (see ``settings.TenantLocal``). A slow or rate-limited
+farm therefore only waits on its own budget.
+
+Tenants are read from the JSON file at ``TENANTS_PATH``::
+
+    {
+      "farm-a": {
+        "env": {
+          "AIRTABLE_API_KEY": "$FARM_A_PAT",
+          "AIRTABLE_BASE_ID": "appXXXXXXXXXXXXXX",
+          "LINE_CHANNEL_SECRET": "$FARM_A_LINE_SECRET",
+          "LINE_CHANNEL_ACCESS_TOKEN": "$FARM_A_LINE_TOKEN",
+          "AIRTABLE_RATE_LIMIT": "5"
+        },
+        "line_destination": "U0123...",
+        "line_users": ["U4567..."]
+      }
+    }
+
+``env`` overrides any setting for the tenant; values starting with ``$`` are
+read from the process environment, so tokens need not be written to the
+file (a variable that is not set fails the registry load). Credentials are never inherited from the process environment, while
+other settings are. File paths (mirror, outbox, digest, schema) default to
+the process-wide path with the tenant ID inserted before the extension.
+
+A LINE message is served for the tenant that lists its user in
+``line_users``, else the tenant of the channel it arrived on (the
+``/callback/<tenant>`` path or the webhook's ``destination``), else the
+``default`` tenant: the process environment, as in a single-farm deployment.
+"""
+
+import functools
+import inspect
+import json
+import os
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, FrozenSet, Iterator, List, Optional, TypeVar, Union
+
+from .airtable_mirror import DEFAULT_MIRROR_PATH
+from .airtable_outbox import DEFAULT_OUTBOX_PATH
+from .airtable_schema import DEFAULT_SCHEMA_PATH
+from .settings import DEFAULT_TENANT, Settings, get_settings, getenv, use_settings
+from .task_digest import DEFAULT_DIGEST_PATH
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+# テナントごとに別のファイルを使う設定 (未指定ならテナント ID 付きのパスにする)
+_PATH_SETTINGS = {
+    "AIRTABLE_MIRROR_PATH": DEFAULT_MIRROR_PATH,
+    "AIRTABLE_OUTBOX_PATH": DEFAULT_OUTBOX_PATH,
+    "AIRTABLE_TASK_DIGEST_PATH": DEFAULT_DIGEST_PATH,
+    "AIRTABLE_SCHEMA_PATH": DEFAULT_SCHEMA_PATH,
+}
+
+
+def tenant_path(path: str, tenant: str) -> str:
+    """``path`` with the tenant ID before the extension (``.mirror.sqlite3`` -> ``.mirror.farm-a.sqlite3``)."""
+    if tenant == DEFAULT_TENANT:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}.{tenant}{ext}"
+
+
+@dataclass(frozen=True)
+class Tenant:
+    """One farm: its settings and the LINE users / channel it answers."""
+
+    id: str
+    settings: Settings
+    line_users: FrozenSet[str] = frozenset()
+    line_destination: Optional[str] = None
+
+    @classmethod
+    def from_config(cls, tenant_id: str, config: Dict[str, Any]) -> "Tenant":
+        env: Dict[str, str] = {}
+        for name, value in (config.get("env") or {}).items():
+            value = str(value)
+            if value.startswith("$"):
+                resolved = getenv(value[1:])
+                if not resolved:
+                    # 空のトークンのまま動かして後から 401 になるより、読み込み時に止める
+                    raise ValueError(
+                        f"tenant {tenant_id!r}: environment variable {value[1:]} "
+                        f"(referenced by {name}) is not set"
+                    )
+                value = resolved
+            env[name] = value
+        for name, default in _PATH_SETTINGS.items():
+            env.setdefault(name, tenant_path(getenv(name) or default, tenant_id))
+        return cls(
+            id=tenant_id,
+            settings=Settings.for_tenant(tenant_id, env),
+            line_users=frozenset(config.get("line_users") or ()),
+            line_destination=config.get("line_destination"),
+        )
+
+    def getenv(self, name: str, default: Optional[str] = None) -> Optional[str]:
+        """A setting as seen by this tenant (its own value, else the process one)."""
+        with use_settings(self.settings):
+            return getenv(name, default)
+
+    def owns(self, name: str) -> bool:
+        """True if the tenant sets ``name`` itself (e.g. has its own LINE channel)."""
+        return bool(self.settings.env.get(name))
+
+
+class TenantRegistry:
+    """Tenants by ID, LINE user and LINE channel."""
+
+    def __init__(self, tenants: List[Tenant]):
+        self._tenants: Dict[str, Tenant] = {tenant.id: tenant for tenant in tenants}
+        self._by_user = {user: tenant for tenant in tenants for user in tenant.line_users}
+        self._by_destination = {t.line_destination: t for t in tenants if t.line_destination}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Dict[str, Any]]) -> "TenantRegistry":
+        return cls([Tenant.from_config(tenant_id, config) for tenant_id, config in data.items()])
+
+    @classmethod
+    def from_file(cls, path: str) -> "TenantRegistry":
+        with open(path, encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+    @classmethod
+    def from_env(cls) -> "TenantRegistry":
+        path = getenv("TENANTS_PATH")
+        return cls.from_file(path) if path else cls([])
+
+    def default(self) -> Tenant:
+        """The ``default`` tenant (the process environment unless the file defines it)."""
+        return self._tenants.get(DEFAULT_TENANT) or Tenant(DEFAULT_TENANT, get_settings())
+
+    def get(self, tenant_id: str) -> Tenant:
+        if tenant_id == DEFAULT_TENANT:
+            return self.default()
+        try:
+            return self._tenants[tenant_id]
+        except KeyError:
+            raise KeyError(f"unknown tenant: {tenant_id}") from None
+
+    def tenants(self) -> List[Tenant]:
+        """Every configured tenant (without the implicit ``default`` one)."""
+        return list(self._tenants.values())
+
+    def for_destination(self, destination: Optional[str]) -> Optional[Tenant]:
+        return self._by_destination.get(destination) if destination else None
+
+    def resolve_line(self, user_id: str, channel: Optional[Tenant] = None) -> Tenant:
+        """Tenant that answers ``user_id`` arriving on the channel of ``channel``."""
+        return self._by_user.get(user_id) or channel or self.default()
+
+
+_registry: Optional[TenantRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_tenants() -> TenantRegistry:
+    """Returns the process-wide registry, loading ``TENANTS_PATH`` on first use."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = TenantRegistry.from_env()
+    return _registry
+
+
+def set_tenants(registry: Optional[TenantRegistry]) -> None:
+    """Replaces the registry (``None`` reloads ``TENANTS_PATH`` on next use)."""
+    global _registry
+    with _registry_lock:
+        _registry = registry
+
+
+def _resolve(tenant: Union[str, Tenant]) -> Tenant:
+    return get_tenants().get(tenant) if isinstance(tenant, str) else tenant
+
+
+@contextmanager
+def use_tenant(tenant: Union[str, Tenant]) -> Iterator[Tenant]:
+    """Runs the ``with`` block (and the threads / tasks it starts) for ``tenant``."""
+    tenant = _resolve(tenant)
+    with use_settings(tenant.settings):
+        yield tenant
+
+
+def bind_tenant(func: F, tenant: Union[str, Tenant]) -> F:
+    """Wraps a tool (sync or async) so that every call runs for ``tenant``.
+
+    The signature and docstring are kept (``functools.wraps``), so ADK builds
+    the same tool declaration as for the unbound tool.
+    """
+    tenant = _resolve(tenant)
+
+    if inspect.iscoroutinefunction(func):
+
+        @functools.wraps(func)
+        async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+            with use_settings(tenant.settings):
+                return await func(*args, **kwargs)
+
+        return async_wrapper  # type: ignore[return-value]
+
+    @functools.wraps(func)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        with use_settings(tenant.settings):
+            return func(*args, **kwargs)
+
+    return wrapper  # type: ignore[return-value]
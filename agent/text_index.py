@@ -0,0 +1,217 @@
+"""In-process n-gram index for Japanese substring search.
+
+``search_materials`` and ``search_tasks`` used to send ``FIND()`` formulas that
+make Airtable scan the whole table on every query, and only matched exact
+substrings. ``NgramIndex`` keeps an inverted index of bigrams and trigrams over
+selected text fields instead. Text is normalised before indexing and querying
+(NFKC, lower case, katakana -> hiragana, whitespace removed), so "ｶﾘ" / "カリ" /
+"かり" and full-/half-width variants all match each other.
+
+``TableIndex`` wraps an ``NgramIndex`` for one Airtable table: it is built from
+a paged snapshot on first use, rebuilt after ``max_age`` seconds, and kept up to
+date in between from the write notifications of ``airtable_tools``.
+"""
+
+import threading
+import time
+import unicodedata
+from collections import defaultdict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+Record = Dict[str, Any]
+
+# カタカナ (ァ-ヶ) をひらがなへ寄せる変換表
+_KANA_TABLE = {code: code - 0x60 for code in range(ord("ァ"), ord("ヶ") + 1)}
+
+
+def normalize(text: Any) -> str:
+    """Normalises text for matching (NFKC, lower case, hiragana, no spaces)."""
+    if text is None:
+        return ""
+    if isinstance(text, list):
+        text = " ".join(str(v) for v in text)
+    text = unicodedata.normalize("NFKC", str(text)).lower().translate(_KANA_TABLE)
+    return "".join(text.split())
+
+
+def ngrams(text: str, n: int) -> Set[str]:
+    if len(text) < n:
+        return set()
+    return {text[i : i + n] for i in range(len(text) - n + 1)}
+
+
+class NgramIndex:
+    """Bigram + trigram inverted index over weighted text fields.
+
+    Args:
+        text_fields: Field name -> ranking weight, e.g. ``{"資材名": 3.0}``.
+        min_overlap: Share of the query's n-grams a field must contain to be
+            returned when it does not contain the whole query (typo tolerance).
+    """
+
+    def __init__(self, text_fields: Dict[str, float], min_overlap: float = 0.75):
+        self.text_fields = dict(text_fields)
+        self.min_overlap = min_overlap
+        self._records: Dict[str, Record] = {}
+        self._texts: Dict[Tuple[str, str], str] = {}
+        self._postings: Dict[str, Set[Tuple[str, str]]] = defaultdict(set)
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def add(self, record: Record) -> None:
+        """Adds or replaces a record (``{"id": ..., "fields": {...}}``)."""
+        with self._lock:
+            self.remove(record["id"])
+            self._records[record["id"]] = record
+            fields = record.get("fields", {})
+            for name in self.text_fields:
+                text = normalize(fields.get(name))
+                if not text:
+                    continue
+                key = (record["id"], name)
+                self._texts[key] = text
+                for gram in ngrams(text, 2) | ngrams(text, 3):
+                    self._postings[gram].add(key)
+
+    def remove(self, record_id: str) -> None:
+        with self._lock:
+            if self._records.pop(record_id, None) is None:
+                return
+            for name in self.text_fields:
+                text = self._texts.pop((record_id, name), None)
+                if text is None:
+                    continue
+                for gram in ngrams(text, 2) | ngrams(text, 3):
+                    keys = self._postings.get(gram)
+                    if keys is not None:
+                        keys.discard((record_id, name))
+                        if not keys:
+                            del self._postings[gram]
+
+    def replace_all(self, records: Iterable[Record]) -> None:
+        with self._lock:
+            self._records.clear()
+            self._texts.clear()
+            self._postings.clear()
+            for record in records:
+                self.add(record)
+
+    def get(self, record_id: str) -> Optional[Record]:
+        return self._records.get(record_id)
+
+    def search(
+        self,
+        query: str,
+        where: Optional[Callable[[Record], bool]] = None,
+        limit: Optional[int] = None,
+    ) -> List[Tuple[float, Record]]:
+        """Returns ``(score, record)`` pairs, best first.
+
+        A field that contains the whole (normalised) query scores its full
+        weight; otherwise it scores ``weight * overlap`` if at least
+        ``min_overlap`` of the query's n-grams occur in it. An empty query
+        matches every record that passes ``where``.
+        """
+        q = normalize(query)
+        with self._lock:
+            if not q:
+                hits = [(0.0, rec) for rec in self._records.values()]
+            else:
+                hits = [(score, self._records[rid]) for rid, score in self._score(q).items()]
+            if where is not None:
+                hits = [hit for hit in hits if where(hit[1])]
+        hits.sort(key=lambda hit: (-hit[0], hit[1]["id"]))
+        return hits[:limit] if limit is not None else hits
+
+    def _score(self, q: str) -> Dict[str, float]:
+        n = 3 if len(q) >= 3 else 2
+        grams = ngrams(q, n)
+        if not grams:
+            # 1 文字のクエリは n-gram を引けないので正規化済みテキストを走査する
+            candidates = {key for key, text in self._texts.items() if q in text}
+        else:
+            counts: Dict[Tuple[str, str], int] = defaultdict(int)
+            for gram in grams:
+                for key in self._postings.get(gram, ()):
+                    counts[key] += 1
+            needed = max(1, int(len(grams) * self.min_overlap + 0.999))
+            candidates = {key for key, count in counts.items() if count >= needed}
+
+        scores: Dict[str, float] = defaultdict(float)
+        for record_id, name in candidates:
+            text = self._texts[(record_id, name)]
+            weight = self.text_fields[name]
+            if q in text:
+                score = weight * (1.5 if text.startswith(q) else 1.0)
+            else:
+                score = weight * len(grams & ngrams(text, n)) / len(grams)
+            scores[record_id] = max(scores[record_id], score)
+        return scores
+
+
+class TableIndex:
+    """An ``NgramIndex`` over one table, loaded lazily and refreshed periodically.
+
+    Args:
+        table_name: Airtable table name.
+        text_fields: Field name -> weight for the indexed text fields.
+        stored_fields: Fields kept on each record for filtering and formatting.
+        loader: Callable returning the table snapshot (projected to
+            ``stored_fields``); called on first use and after ``max_age``.
+        max_age: Seconds before the snapshot is rebuilt, to pick up edits made
+            outside this process (e.g. in the Airtable UI).
+    """
+
+    def __init__(
+        self,
+        table_name: str,
+        text_fields: Dict[str, float],
+        stored_fields: List[str],
+        loader: Callable[[str, List[str]], Iterable[Record]],
+        max_age: float = 300.0,
+    ):
+        self.table_name = table_name
+        self.stored_fields = list(stored_fields)
+        self.index = NgramIndex(text_fields)
+        self._loader = loader
+        self.max_age = max_age
+        self._built_at: Optional[float] = None
+        self._build_lock = threading.Lock()
+
+    def ensure_fresh(self) -> NgramIndex:
+        if self._built_at is None or time.monotonic() - self._built_at > self.max_age:
+            with self._build_lock:
+                if self._built_at is None or time.monotonic() - self._built_at > self.max_age:
+                    self.index.replace_all(self._loader(self.table_name, self.stored_fields))
+                    self._built_at = time.monotonic()
+        return self.index
+
+    def search(
+        self,
+        query: str,
+        where: Optional[Callable[[Record], bool]] = None,
+        limit: Optional[int] = None,
+    ) -> List[Tuple[float, Record]]:
+        return self.ensure_fresh().search(query, where=where, limit=limit)
+
+    def apply_write(self, action: str, records: List[Record]) -> None:
+        """Applies a create / update / delete made through ``airtable_tools``."""
+        if self._built_at is None:
+            return
+        for record in records:
+            if action == "delete":
+                self.index.remove(record["id"])
+                continue
+            fields = record.get("fields", {})
+            if action == "update":
+                # PATCH の応答は全フィールドを含むが、念のため既存値とマージする
+                previous = self.index.get(record["id"])
+                if previous is not None:
+                    fields = {**previous.get("fields", {}), **fields}
+            kept = {name: fields[name] for name in self.stored_fields if name in fields}
+            self.index.add({"id": record["id"], "fields": kept})
+
+    def invalidate(self) -> None:
+        self._built_at = None
@@ -0,0 +1,143 @@
+"""benchmark_startup.py
+agent パッケージのコールドスタート時間 (import と最初のツール呼び出し) を計測するスクリプト。
+
+debug_run.py と同じ手順 (パッケージの import → root_agent の構築 → ツール呼び出し) を
+新しい Python プロセスで --repeat 回実行し、各段階の所要時間の中央値を表示します。
+ツール呼び出しは scripts/fake_airtable.py のローカルサーバーに対して行うため、
+認証情報は不要です。
+
+計測する段階:
+- import_agent:     import agent                (ADK を読み込まないこと)
+- import_tools:     import agent.airtable_tools (同上。requests / dotenv も読み込まない)
+- build_root_agent: agent.root_agent            (ここで google.adk を読み込む)
+- first_call:       最初の get_today_tasks()     (設定の解決・HTTP クライアントの作成を含む)
+- second_call:      2 回目の get_today_tasks()
+
+予算 (--max-*-ms) を超えた段階があるか、ツールの import で重い依存関係が読み込まれた
+場合は終了コード 1 を返すので、CI の回帰ゲートとして使えます。
+
+使い方:
+    python scripts/benchmark_startup.py
+    python scripts/benchmark_startup.py --repeat 10 --max-import-ms 200 --json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Any, Dict, List
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "scripts"))
+sys.path.insert(0, str(ROOT))
+
+from fake_airtable import FAKE_BASE_ID, FakeAirtable, start_server  # noqa: E402
+
+# import 時に読み込まれてはいけないモジュール
+HEAVY_MODULES = ["google.adk", "google.genai", "requests", "dotenv", "pandas", "numpy"]
+
+# 子プロセスで実行する計測コード。結果を 1 行の JSON で出力する
+_PROBE = """
+import json, sys, time
+heavy = {heavy!r}
+loaded = lambda: sorted(m for m in heavy if m in sys.modules)
+out = {{}}
+t = time.perf_counter()
+import agent
+out["import_agent"] = time.perf_counter() - t
+t = time.perf_counter()
+import agent.airtable_tools as tools
+out["import_tools"] = time.perf_counter() - t
+out["heavy_after_import"] = loaded()
+t = time.perf_counter()
+agent.root_agent
+out["build_root_agent"] = time.perf_counter() - t
+t = time.perf_counter()
+tools.get_today_tasks()
+out["first_call"] = time.perf_counter() - t
+t = time.perf_counter()
+tools.get_today_tasks()
+out["second_call"] = time.perf_counter() - t
+print(json.dumps(out))
+"""
+
+STAGES = ["import_agent", "import_tools", "build_root_agent", "first_call", "second_call"]
+
+
+def run_probe(api_root: str) -> Dict[str, Any]:
+    env = {
+        **os.environ,
+        "PYTHONPATH": str(ROOT),
+        "AIRTABLE_API_ROOT": api_root,
+        "AIRTABLE_API_KEY": "fake",
+        "AIRTABLE_BASE_ID": FAKE_BASE_ID,
+        "AIRTABLE_TASK_DIGEST": "off",
+        "AIRTABLE_READ_MODE": "api",
+    }
+    env.pop("AIRTABLE_PAT", None)
+    proc = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(heavy=HEAVY_MODULES)],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=5, help="計測するプロセス数")
+    parser.add_argument("--latency", type=float, default=0.05, help="ローカルサーバーの遅延 (秒)")
+    parser.add_argument("--max-import-ms", type=float, default=500, help="import_tools の予算")
+    parser.add_argument("--max-root-agent-ms", type=float, default=5000, help="build_root_agent の予算")
+    parser.add_argument("--max-first-call-ms", type=float, default=1500, help="first_call の予算")
+    parser.add_argument("--json", action="store_true", help="結果を JSON で出力する")
+    args = parser.parse_args()
+
+    server = start_server(FakeAirtable(latency=args.latency, jitter=0.0, rate_limit=0))
+    runs: List[Dict[str, Any]] = []
+    try:
+        for _ in range(args.repeat):
+            runs.append(run_probe(server.api_root))
+    finally:
+        server.shutdown()
+
+    medians = {stage: round(statistics.median(r[stage] for r in runs) * 1000, 1) for stage in STAGES}
+    heavy = sorted({m for r in runs for m in r["heavy_after_import"]})
+    budgets = {
+        "import_tools": args.max_import_ms,
+        "build_root_agent": args.max_root_agent_ms,
+        "first_call": args.max_first_call_ms,
+    }
+    failures = [
+        f"{stage}: {medians[stage]}ms > {budget}ms"
+        for stage, budget in budgets.items()
+        if medians[stage] > budget
+    ]
+    if heavy:
+        failures.append(f"heavy modules loaded on import: {', '.join(heavy)}")
+
+    if args.json:
+        print(
+            json.dumps(
+                {"median_ms": medians, "heavy_after_import": heavy, "failures": failures},
+                ensure_ascii=False,
+                indent=2,
+            )
+        )
+    else:
+        for stage in STAGES:
+            budget = budgets.get(stage)
+            print(f"{stage:18s} {medians[stage]:8.1f}ms" + (f"  (budget {budget:.0f}ms)" if budget else ""))
+        print(f"heavy modules after import: {', '.join(heavy) or 'none'}")
+        for failure in failures:
+            print(f"FAIL {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
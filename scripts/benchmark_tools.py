@@ -0,0 +1,249 @@
+"""benchmark_tools.py
+airtable_tools の全ツールを、ローカルの Airtable 互換サーバーに対して並行実行するベンチマーク。
+
+scripts/fake_airtable.py のサーバーをスレッドで起動し、AIRTABLE_API_ROOT をそこへ
+向けてから agent.airtable_tools を読み込みます (本番の Base・認証情報は不要)。
+ツールごとに --workers 個のスレッドから --iterations 回ずつ呼び出し、以下を表示します。
+
+- p50 / p95 レイテンシ (ms) と スループット (呼び出し/秒)
+- 1 呼び出しあたりの API リクエスト数 (サーバー側の集計) と 429 の回数
+- エラー数
+
+使い方:
+    python scripts/benchmark_tools.py                          # 全ツール、4 並列 x 5 回
+    python scripts/benchmark_tools.py --workers 8 --iterations 20 get_today_tasks search_tasks
+    python scripts/benchmark_tools.py --cold --json > bench.json   # 毎回キャッシュを捨てる
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import date
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from fake_airtable import FAKE_BASE_ID, WORKERS, FakeAirtable, seed_data, start_server  # noqa: E402
+
+# (ツール名, 呼び出し) 。呼び出しは (ワーカー番号, 回数, 乱数) を受け取る
+Call = Callable[[int, int, random.Random], Any]
+
+
+@dataclass
+class Result:
+    tool: str
+    calls: int
+    errors: int
+    seconds: float
+    latencies: List[float]
+    requests: int
+    throttled: int
+
+    def summary(self) -> Dict[str, Any]:
+        ordered = sorted(self.latencies) or [0.0]
+        return {
+            "tool": self.tool,
+            "calls": self.calls,
+            "errors": self.errors,
+            "p50_ms": round(statistics.median(ordered) * 1000, 1),
+            "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 1),
+            "throughput": round(self.calls / self.seconds, 2) if self.seconds else 0.0,
+            "api_calls_per_call": round(self.requests / self.calls, 2) if self.calls else 0.0,
+            "http_429": self.throttled,
+        }
+
+
+def _configure_env(api_root: str, workdir: str, rate_limit: float) -> None:
+    # 設定は最初のツール呼び出し時に読まれるので、それより前に環境変数を差し替える
+    os.environ.update(
+        {
+            "AIRTABLE_API_ROOT": api_root,
+            "AIRTABLE_API_KEY": "fake",
+            "AIRTABLE_BASE_ID": FAKE_BASE_ID,
+            "AIRTABLE_RATE_LIMIT": str(rate_limit),
+            "AIRTABLE_MIRROR_PATH": os.path.join(workdir, "mirror.sqlite3"),
+            "AIRTABLE_OUTBOX_PATH": os.path.join(workdir, "outbox.sqlite3"),
+            "AIRTABLE_TASK_DIGEST_PATH": os.path.join(workdir, "task_digest.json"),
+            "AIRTABLE_SCHEMA_PATH": os.path.join(workdir, "schema.json"),
+        }
+    )
+    os.environ.pop("AIRTABLE_PAT", None)
+
+
+def _tool_calls(tools: Any, fake: FakeAirtable) -> Dict[str, Call]:
+    """Benchmark call of every tool, with arguments drawn from the seeded base."""
+    task_ids = [r["id"] for r in fake.data["作業タスク"]]
+    places = [r["fields"]["作業場所"] for r in fake.data["圃場マスタ"]]
+    month = date.today().strftime("%Y-%m")
+    table = "日報ログ"
+
+    def report(w: int, i: int, rng: random.Random) -> Dict[str, Any]:
+        return {"報告者": WORKERS[w % len(WORKERS)], "報告内容": f"bench {w}-{i}-{rng.random()}"}
+
+    def created_ids(w: int, i: int, rng: random.Random, n: int) -> List[str]:
+        result = tools.airtable_batch_create_records(table, [report(w, i, rng) for _ in range(n)])
+        return [r["id"] for r in result["results"] if r.get("id")]
+
+    def table_lifecycle(w: int, i: int, rng: random.Random) -> Any:
+        created = tools.airtable_create_table(
+            f"bench_{w}_{i}_{rng.randrange(10**6)}", [{"name": "Name", "type": "singleLineText"}]
+        )
+        table_id = created["table"]["id"]
+        tools.airtable_update_table(table_id, new_name=f"bench_{table_id}")
+        return tools.airtable_delete_table(table_id)
+
+    def update_record(w: int, i: int, rng: random.Random) -> Any:
+        record_id = tools.airtable_create_record(table, report(w, i, rng))["record"]["id"]
+        tools.airtable_update_record(table, record_id, {"報告内容": "updated"})
+        return tools.airtable_delete_record(table, record_id)
+
+    def batch_update(w: int, i: int, rng: random.Random) -> Any:
+        ids = created_ids(w, i, rng, 12)
+        tools.airtable_batch_update_records(table, [{"id": rid, "fields": {"報告内容": "x"}} for rid in ids])
+        return tools.airtable_batch_delete_records(table, ids)
+
+    def more_results(w: int, i: int, rng: random.Random) -> Any:
+        page = tools.search_tasks(rng.choice(["防除", "収穫", "除草"]))
+        cursor = page.rpartition('cursor="')[2].partition('"')[0]
+        return tools.show_more_results(cursor) if cursor else page
+
+    return {
+        # エージェントに登録されているツール
+        "get_today_tasks": lambda w, i, rng: tools.get_today_tasks(WORKERS[w % len(WORKERS)]),
+        "get_field_info": lambda w, i, rng: tools.get_field_info(rng.choice(places)),
+        "search_materials": lambda w, i, rng: tools.search_materials(rng.choice(["ダコニール", "BB化成", "硫安"])),
+        "search_tasks": lambda w, i, rng: tools.search_tasks(rng.choice(["防除", "収穫", "除草"]), month),
+        "search_tasks+show_more_results": more_results,
+        "summarize_planting_materials": lambda w, i, rng: tools.summarize_planting_materials(
+            month=month, group_by=["crop", "material"]
+        ),
+        "create_daily_report": lambda w, i, rng: tools.create_daily_report(WORKERS[w % len(WORKERS)], f"bench {w}-{i}"),
+        "update_task_status": lambda w, i, rng: tools.update_task_status(rng.choice(task_ids), "作業中"),
+        "update_task_statuses": lambda w, i, rng: tools.update_task_statuses(rng.sample(task_ids, 3), "作業中"),
+        "report_task_completion": lambda w, i, rng: tools.report_task_completion(
+            WORKERS[w % len(WORKERS)], f"{rng.choice(places)}の防除終わりました"
+        ),
+        # 汎用のレコード・テーブル操作
+        "airtable_get_records": lambda w, i, rng: tools.airtable_get_records("作業タスク", max_records=100),
+        "airtable_iter_records": lambda w, i, rng: sum(1 for _ in tools.airtable_iter_records("作業タスク")),
+        "airtable_create/update/delete_record": update_record,
+        "airtable_batch_create_records": lambda w, i, rng: created_ids(w, i, rng, 25),
+        "airtable_batch_update/delete_records": batch_update,
+        "airtable_list_tables": lambda w, i, rng: tools.airtable_list_tables(),
+        "airtable_create/update/delete_table": table_lifecycle,
+        "airtable_sync_mirror": lambda w, i, rng: tools.airtable_sync_mirror(["作業タスク"]),
+        "airtable_refresh_task_digest": lambda w, i, rng: tools.airtable_refresh_task_digest(),
+    }
+
+
+def _reset_caches(tools: Any) -> None:
+    from agent.airtable_cache import get_cache
+
+    get_cache().clear()
+    tools._TEXT_INDEXES.get().clear()
+
+
+def run_tool(
+    name: str,
+    call: Call,
+    fake: FakeAirtable,
+    workers: int,
+    iterations: int,
+    before_call: Optional[Callable[[], None]] = None,
+) -> Result:
+    """Calls ``call`` ``iterations`` times from each of ``workers`` threads."""
+    latencies: List[float] = []
+    errors: List[str] = []
+    fake.reset_stats()
+
+    def worker(w: int) -> None:
+        rng = random.Random(w)
+        for i in range(iterations):
+            if before_call:
+                before_call()
+            started = time.perf_counter()
+            try:
+                call(w, i, rng)
+            except Exception as e:  # noqa: BLE001 - 失敗も計測結果として数える
+                errors.append(f"{type(e).__name__}: {e}")
+                print(f"  {name}: {errors[-1]}", file=sys.stderr)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(worker, range(workers)))
+    seconds = time.perf_counter() - started
+    with fake.lock:
+        stats = dict(fake.stats)
+    return Result(
+        tool=name,
+        calls=workers * iterations,
+        errors=len(errors),
+        seconds=seconds,
+        latencies=latencies,
+        requests=stats.get("requests", 0),
+        throttled=stats.get("429", 0),
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("tools", nargs="*", help="計測するツール名 (省略時は全ツール)")
+    parser.add_argument("--workers", type=int, default=4, help="同時に呼び出すスレッド数")
+    parser.add_argument("--iterations", type=int, default=5, help="スレッドあたりの呼び出し回数")
+    parser.add_argument("--latency", type=float, default=0.08, help="サーバーの平均遅延 (秒)")
+    parser.add_argument("--jitter", type=float, default=0.04, help="サーバーの遅延のゆらぎ (秒)")
+    parser.add_argument("--rate-limit", type=float, default=5.0, help="サーバーの毎秒リクエスト上限 (0 で無制限)")
+    parser.add_argument("--penalty", type=float, default=1.0, help="429 の後に拒否し続ける秒数")
+    parser.add_argument("--client-rate-limit", type=float, default=5.0, help="クライアント側の毎秒リクエスト上限")
+    parser.add_argument("--seed", type=int, default=42, help="架空データの乱数シード")
+    parser.add_argument("--cold", action="store_true", help="呼び出しごとに読み取りキャッシュを捨てる")
+    parser.add_argument("--json", action="store_true", help="結果を JSON で出力する")
+    args = parser.parse_args()
+
+    fake = FakeAirtable(seed_data(args.seed), args.latency, args.jitter, args.rate_limit, args.penalty)
+    server = start_server(fake)
+    workdir = tempfile.mkdtemp(prefix="airtable-bench-")
+    _configure_env(server.api_root, workdir, args.client_rate_limit)
+
+    from agent import airtable_tools as tools
+
+    calls = _tool_calls(tools, fake)
+    unknown = [name for name in args.tools if name not in calls]
+    if unknown:
+        parser.error(f"unknown tools: {', '.join(unknown)} (choose from {', '.join(calls)})")
+
+    before_call = (lambda: _reset_caches(tools)) if args.cold else None
+    results = []
+    for name in args.tools or calls:
+        result = run_tool(name, calls[name], fake, args.workers, args.iterations, before_call)
+        results.append(result.summary())
+        if not args.json:
+            row = result.summary()
+            print(
+                f"{name:40s} p50={row['p50_ms']:8.1f}ms p95={row['p95_ms']:8.1f}ms "
+                f"{row['throughput']:7.2f}/s api/call={row['api_calls_per_call']:5.2f} "
+                f"429={row['http_429']} errors={row['errors']}"
+            )
+    server.shutdown()
+    if args.json:
+        print(
+            json.dumps(
+                {"config": vars(args), "results": results},
+                ensure_ascii=False,
+                indent=2,
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""export_airtable.py
+Airtable Base の全テーブルを Parquet (または CSV) に書き出すバックアップ・分析用スクリプト。
+
+テーブル一覧はメタデータ API から取得し、複数のテーブルを並行してページングします
+(Base ごとのレート制限は共有のクライアントが守ります)。レコードは 1000 件ずつ
+ファイルへ書き出すので、大きなテーブルでもメモリに全件を載せません。
+列の型はスキーマのフィールド型から決まります (日付・日時・数値・真偽値・リスト)。
+
+出力: <出力先>/<実行時刻>/<テーブル名>.parquet と manifest.json
+--incremental では、前回のエクスポート以降に作成・更新されたレコードだけを書き出します
+(テーブルごとのウォーターマークは <出力先>/export_state.json)。
+
+Parquet には pyarrow が必要です (pip install pyarrow)。メタデータ API を使うため
+トークンには schema.bases:read のスコープが必要です。
+
+使い方:
+    python scripts/export_airtable.py                        # 全テーブルを Parquet に
+    python scripts/export_airtable.py --format csv 作業タスク   # 指定テーブルを CSV に
+    python scripts/export_airtable.py --incremental          # 前回以降の差分だけ
+    python scripts/export_airtable.py --since 2025-05-01T00:00:00Z
+    python scripts/export_airtable.py --tenant farm-a        # TENANTS_PATH の農場のベース
+"""
+
+import argparse
+import os
+import sys
+from pathlib import Path
+from typing import Any, Dict
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from agent.airtable_export import DEFAULT_EXPORT_DIR, FORMATS, ExportUnavailable, export_base  # noqa: E402
+from agent.settings import DEFAULT_TENANT, getenv  # noqa: E402
+from agent.tenants import use_tenant  # noqa: E402
+
+
+def _print_table(name: str, stats: Dict[str, Any]) -> None:
+    print(
+        f"{name}: {stats['records']} records in {stats['seconds']}s "
+        f"({stats['records_per_second']} records/s, {stats['bytes']} bytes)"
+        + (f" since {stats['since']}" if stats["since"] else "")
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("tables", nargs="*", help="書き出すテーブル名 (省略時は全テーブル)")
+    parser.add_argument("--format", choices=FORMATS, default="parquet")
+    parser.add_argument("--out", help="出力先 (既定: AIRTABLE_EXPORT_DIR、テナント指定時は exports/<テナント>)")
+    parser.add_argument("--incremental", action="store_true", help="前回のエクスポート以降の差分だけを書き出す")
+    parser.add_argument("--since", help="この日時 (ISO 8601) 以降に更新されたレコードだけを書き出す")
+    parser.add_argument("--workers", type=int, help="同時に書き出すテーブル数 (既定: AIRTABLE_EXPORT_WORKERS または 4)")
+    parser.add_argument("--batch-size", type=int, default=1000, help="1 回に書き出す行数")
+    parser.add_argument("--tenant", default=DEFAULT_TENANT, help="対象の農場 (TENANTS_PATH のテナント ID)")
+    args = parser.parse_args()
+
+    out = args.out or getenv("AIRTABLE_EXPORT_DIR") or DEFAULT_EXPORT_DIR
+    if not args.out and args.tenant != DEFAULT_TENANT:
+        out = os.path.join(out, args.tenant)
+
+    with use_tenant(args.tenant):
+        try:
+            manifest = export_base(
+                out,
+                fmt=args.format,
+                tables=args.tables or None,
+                incremental=args.incremental,
+                since=args.since,
+                workers=args.workers,
+                batch_size=args.batch_size,
+                on_table=_print_table,
+            )
+        except (ExportUnavailable, LookupError, EnvironmentError) as e:
+            # KeyError (未知のテーブル名) の str() は引用符で囲まれるので、メッセージだけを表示する
+            sys.exit(f"エラー: {e.args[0] if e.args else e}")
+
+    for name, error in manifest["errors"].items():
+        print(f"{name}: 失敗しました - {error}")
+    print(
+        f"{manifest['mode']} export of {len(manifest['tables'])} tables to {manifest['path']}: "
+        f"{manifest['records']} records in {manifest['seconds']}s ({manifest['records_per_second']} records/s)"
+    )
+    if manifest["errors"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
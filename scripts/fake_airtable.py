@@ -0,0 +1,623 @@
+"""fake_airtable.py
+認証情報なしでエージェントを動かすための、ローカルの Airtable API 互換サーバー。
+
+農場の架空データ (圃場・作物・作付計画・作業タスク・資材など) を乱数シードから
+生成し、エージェントが使う以下のエンドポイントを実装します。
+
+- GET    /v0/{base}/{table}           offset ページング、filterByFormula、fields[]、
+                                      sort、maxRecords、cellFormat=string、
+                                      returnFieldsByFieldId
+- GET    /v0/{base}/{table}/{id}
+- POST   /v0/{base}/{table}           単一 / バッチ (最大 10 件) 作成
+- PATCH  /v0/{base}/{table}[/{id}]    単一 / バッチ更新、performUpsert
+- DELETE /v0/{base}/{table}[/{id}]    単一 / バッチ (records[]) 削除
+- GET / POST /v0/meta/bases/{base}/tables   メタデータ (スキーマ) の取得・テーブル作成
+
+テーブルとフィールドは docs/Airtable_Schema_Summary.md のものに合わせ、存在しない
+フィールドを fields[] に指定すると実際の API と同じく 422 (UNKNOWN_FIELD_NAME) を返します。
+
+リクエストごとに遅延 (既定 80ms ± 40ms) を入れ、Base ごとに毎秒 5 リクエストを
+超えると 429 を返します。/__stats で API 呼び出し数、POST /__reset で集計をリセット。
+
+使い方:
+    python scripts/fake_airtable.py --port 8787
+    AIRTABLE_API_ROOT=http://127.0.0.1:8787/v0 AIRTABLE_API_KEY=fake \\
+        AIRTABLE_BASE_ID=appFakeFarmBase01 python debug_run.py
+"""
+
+import argparse
+import itertools
+import json
+import random
+import sys
+import threading
+import time
+from collections import Counter, deque
+from datetime import date, datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, unquote, urlparse
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from agent.airtable_formula import FormulaError, filter_records  # noqa: E402
+from agent.airtable_mirror import sort_records  # noqa: E402
+
+FAKE_BASE_ID = "appFakeFarmBase01"
+_BATCH_LIMIT = 10
+_MAX_PAGE_SIZE = 100
+
+_LOOKUP_PLAN_FIELD = "圃場名 (from 圃場データ)"
+_LOOKUP_TASK_FIELD = "圃場名 (from 圃場データ) (from 関連する作付計画)"
+
+# テーブル名 -> [(フィールド名, 型, リンク先テーブル)]。先頭が主フィールド
+# docs/Airtable_Schema_Summary.md にあるフィールドだけを持つ (圃場マスタと日報ログは
+# ドキュメントに無いが、ツールが読み書きするので同じ名前で用意する)
+SCHEMA: Dict[str, List[Tuple[str, str, Optional[str]]]] = {
+    "圃場データ": [
+        ("圃場名", "multilineText", None),
+        ("エリア", "singleSelect", None),
+        ("面積(ha)", "number", None),
+        ("作付詳細", "multipleRecordLinks", "作付計画"),
+        ("メモ", "singleLineText", None),
+    ],
+    "圃場マスタ": [
+        ("作業場所", "singleLineText", None),
+        ("エリア", "singleSelect", None),
+        ("土壌", "singleLineText", None),
+        ("作付計画", "multipleRecordLinks", "作付計画"),
+    ],
+    "作物マスター": [
+        ("作物名", "singleLineText", None),
+        ("分類", "singleSelect", None),
+        ("作付計画", "multipleRecordLinks", "作付計画"),
+    ],
+    "作付計画": [
+        ("ID", "singleLineText", None),
+        ("播種回次", "number", None),
+        ("作物マスター", "multipleRecordLinks", "作物マスター"),
+        ("品種名", "singleSelect", None),
+        ("播種予定日", "date", None),
+        ("定植予定日", "date", None),
+        ("圃場データ", "multipleRecordLinks", "圃場データ"),
+        (_LOOKUP_PLAN_FIELD, "multipleLookupValues", None),
+        ("作つけ面積 (ha)", "number", None),
+        ("元肥計画 (肥料名 kg/10a)", "multilineText", None),
+        ("資材使用量", "multilineText", None),
+        ("収穫予定", "date", None),
+        ("作業タスク 3", "multipleRecordLinks", "作業タスク"),
+    ],
+    "作業タスク": [
+        ("タスク名", "singleLineText", None),
+        ("関連する作付計画", "multipleRecordLinks", "作付計画"),
+        (_LOOKUP_TASK_FIELD, "multipleLookupValues", None),
+        ("ステータス", "singleSelect", None),
+        ("予定日", "date", None),
+        ("実施日", "date", None),
+    ],
+    "資材マスター": [
+        ("資材名", "singleLineText", None),
+        ("資材分類", "singleSelect", None),
+        ("メーカー", "singleLineText", None),
+        ("規格・容量", "singleLineText", None),
+        ("単価", "currency", None),
+        ("主成分", "singleLineText", None),
+        ("適用作物", "singleLineText", None),
+    ],
+    "作業者マスター": [
+        ("作業者名", "singleLineText", None),
+        ("役割", "singleSelect", None),
+    ],
+    "日報ログ": [
+        ("報告内容", "multilineText", None),
+        ("報告日", "date", None),
+        ("報告者", "singleLineText", None),
+    ],
+}
+
+WORKERS = ["田中", "佐藤", "鈴木", "高橋", "伊藤", "渡辺"]
+CROPS = [
+    ("トマト", "果菜類"),
+    ("キャベツ", "葉茎菜類"),
+    ("大豆", "豆類"),
+    ("ブロッコリー", "葉茎菜類"),
+    ("たまねぎ", "根菜類"),
+    ("にんじん", "根菜類"),
+    ("ばれいしょ", "根菜類"),
+    ("スイートコーン", "果菜類"),
+]
+TASK_NAMES = ["播種", "定植", "防除", "除草", "追肥", "収穫", "灌水", "耕起", "消毒作業", "土壌分析"]
+FERTILIZERS = ["苦土石灰", "BB化成", "硫安", "過リン酸石灰", "塩化加里", "鶏ふん堆肥", "ようりん"]
+MATERIAL_BASES = [
+    ("ダコニール", "農薬", "クミアイ化学", "TPN", "トマト"),
+    ("アミスター", "農薬", "シンジェンタ", "アゾキシストロビン", "キャベツ"),
+    ("スミチオン", "農薬", "住友化学", "MEP", "大豆"),
+    ("カリグリーン", "農薬", "アリスタ", "炭酸水素カリウム", "トマト"),
+    ("ラウンドアップ", "除草剤", "日産化学", "グリホサート", "全般"),
+    ("BB化成", "肥料", "JA全農", "NPK", "全般"),
+    ("苦土石灰", "肥料", "JA全農", "炭酸カルシウム", "全般"),
+    ("硫安", "肥料", "三菱商事", "硫酸アンモニウム", "全般"),
+    ("マルチフィルム", "資材", "タキイ", "ポリエチレン", "全般"),
+]
+
+
+def _created(rng: random.Random) -> str:
+    moment = datetime(2025, 1, 1, tzinfo=timezone.utc) + timedelta(minutes=rng.randrange(200000))
+    return moment.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+def seed_data(
+    seed: int = 42,
+    fields: int = 40,
+    plans: int = 80,
+    tasks: int = 800,
+    materials: int = 180,
+    today: Optional[date] = None,
+) -> Dict[str, List[Dict[str, Any]]]:
+    """Generates a deterministic farm base (linked tables stay consistent)."""
+    rng = random.Random(seed)
+    today = today or date.today()
+    ids = itertools.count(1)
+
+    def rid() -> str:
+        return f"rec{next(ids):014d}"
+
+    data: Dict[str, List[Dict[str, Any]]] = {name: [] for name in SCHEMA}
+
+    def add(table: str, record_fields: Dict[str, Any]) -> Dict[str, Any]:
+        record = {"id": rid(), "createdTime": _created(rng), "fields": record_fields}
+        record["lastModifiedTime"] = record["createdTime"]
+        data[table].append(record)
+        return record
+
+    areas = ["北", "南", "東", "西"]
+    plots = []
+    for i in range(fields):
+        name = f"{'ABCD'[i % 4]}-{i // 4 + 1}"
+        area = areas[i % 4]
+        plots.append(
+            (
+                add("圃場データ", {"圃場名": name, "エリア": area, "面積(ha)": round(rng.uniform(0.3, 2.5), 2)}),
+                add("圃場マスタ", {"作業場所": name, "エリア": area, "土壌": rng.choice(["黒ボク土", "灰色低地土", "砂壌土"])}),
+            )
+        )
+    crops = [add("作物マスター", {"作物名": name, "分類": kind}) for name, kind in CROPS]
+    for worker in WORKERS:
+        add("作業者マスター", {"作業者名": worker, "役割": rng.choice(["社員", "パート"])})
+
+    plan_records = []
+    for i in range(plans):
+        plot_data, plot_master = rng.choice(plots)
+        crop = rng.choice(crops)
+        sow = today + timedelta(days=rng.randint(-120, 60))
+        area_ha = round(min(plot_data["fields"]["面積(ha)"], rng.uniform(0.2, 2.0)), 2)
+        fert = rng.sample(FERTILIZERS, rng.randint(1, 3))
+        plan = add(
+            "作付計画",
+            {
+                "ID": f"{crop['fields']['作物名']}-{i + 1:03d}",
+                "播種回次": rng.randint(1, 3),
+                "作物マスター": [crop["id"]],
+                "品種名": rng.choice(["早生", "中生", "晩生"]),
+                "播種予定日": sow.isoformat(),
+                "定植予定日": (sow + timedelta(days=30)).isoformat(),
+                "圃場データ": [plot_data["id"]],
+                _LOOKUP_PLAN_FIELD: [plot_data["fields"]["圃場名"]],
+                "作つけ面積 (ha)": area_ha,
+                "元肥計画 (肥料名 kg/10a)": "\n".join(f"{f} {rng.choice([20, 40, 60, 80, 100])}" for f in fert),
+                "資材使用量": "\n".join(
+                    f"{m[0]} {rng.choice([0.5, 1, 1.5, 2])}L" for m in rng.sample(MATERIAL_BASES[:5], 2)
+                ),
+                "収穫予定": (sow + timedelta(days=rng.randint(70, 140))).isoformat(),
+            },
+        )
+        for link in (plot_data, plot_master, crop):
+            link["fields"].setdefault("作付詳細" if link is plot_data else "作付計画", []).append(plan["id"])
+        plan_records.append(plan)
+
+    for i in range(tasks):
+        plan = rng.choice(plan_records)
+        # 3 割ほどを「今日」の予定にして、今日のタスク系ツールの負荷を再現する
+        offset = 0 if rng.random() < 0.3 else rng.randint(-60, 60)
+        status = "完了" if offset < 0 and rng.random() < 0.8 else rng.choice(["未着手", "未着手", "作業中"])
+        task = add(
+            "作業タスク",
+            {
+                "タスク名": f"{rng.choice(TASK_NAMES)}",
+                "関連する作付計画": [plan["id"]],
+                _LOOKUP_TASK_FIELD: list(plan["fields"][_LOOKUP_PLAN_FIELD]),
+                "ステータス": status,
+                "予定日": (today + timedelta(days=offset)).isoformat(),
+            },
+        )
+        plan["fields"].setdefault("作業タスク 3", []).append(task["id"])
+
+    for i in range(materials):
+        name, kind, maker, ingredient, crop = MATERIAL_BASES[i % len(MATERIAL_BASES)]
+        add(
+            "資材マスター",
+            {
+                "資材名": f"{name}{'' if i < len(MATERIAL_BASES) else i}",
+                "資材分類": kind,
+                "メーカー": maker,
+                "規格・容量": rng.choice(["500ml", "1L", "5kg", "20kg", "100m"]),
+                "単価": rng.randint(500, 20000),
+                "主成分": ingredient,
+                "適用作物": crop,
+            },
+        )
+    return data
+
+
+def schema_tables(
+    schema: Dict[str, List[Tuple[str, str, Optional[str]]]],
+    table_ids: Dict[str, str],
+) -> List[Dict[str, Any]]:
+    """Metadata API response body (``tables``) for ``schema``."""
+    tables = []
+    for name, spec in schema.items():
+        fields = []
+        for j, (field_name, field_type, target) in enumerate(spec):
+            entry: Dict[str, Any] = {"id": f"fld{table_ids[name][3:]}{j:03d}", "name": field_name, "type": field_type}
+            if target:
+                entry["options"] = {"linkedTableId": table_ids[target]}
+            fields.append(entry)
+        tables.append({"id": table_ids[name], "name": name, "primaryFieldId": fields[0]["id"], "fields": fields})
+    return tables
+
+
+class FakeAirtable:
+    """In-memory base plus the latency / rate-limit model of the fake server."""
+
+    def __init__(
+        self,
+        data: Optional[Dict[str, List[Dict[str, Any]]]] = None,
+        latency: float = 0.08,
+        jitter: float = 0.04,
+        rate_limit: float = 5.0,
+        penalty: float = 1.0,
+    ):
+        self.data = data if data is not None else seed_data()
+        self.schema = {name: list(spec) for name, spec in SCHEMA.items()}
+        self.table_ids = {name: f"tbl{i:014d}" for i, name in enumerate(self.schema, 1)}
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        # 本物の Airtable は 429 の後 30 秒拒否し続ける。ベンチマーク用に短くできる
+        self.penalty = penalty
+        self.lock = threading.RLock()
+        self.stats: Counter = Counter()
+        self._recent: Deque[float] = deque()
+        self._blocked_until = 0.0
+        self._ids = itertools.count(10**9)
+
+    # -- request model -----------------------------------------------------
+
+    def admit(self) -> bool:
+        """Returns False if the request exceeds the per-base rate limit."""
+        now = time.monotonic()
+        with self.lock:
+            if now < self._blocked_until:
+                return False
+            while self._recent and now - self._recent[0] >= 1.0:
+                self._recent.popleft()
+            if self.rate_limit and len(self._recent) >= self.rate_limit:
+                self._blocked_until = now + self.penalty
+                return False
+            self._recent.append(now)
+            return True
+
+    def delay(self) -> None:
+        time.sleep(max(0.0, self.latency + random.uniform(-self.jitter, self.jitter)))
+
+    def reset_stats(self) -> None:
+        with self.lock:
+            self.stats.clear()
+
+    # -- data helpers --------------------------------------------------------
+
+    @property
+    def tables(self) -> List[Dict[str, Any]]:
+        return schema_tables(self.schema, self.table_ids)
+
+    def table(self, name: str) -> Optional[List[Dict[str, Any]]]:
+        return self.data.get(name)
+
+    def spec(self, table: str) -> Dict[str, Tuple[str, Optional[str]]]:
+        return {name: (ftype, target) for name, ftype, target in self.schema.get(table, [])}
+
+    def field_ids(self, table: str) -> Dict[str, str]:
+        """Field name -> field ID of ``table`` (as in the metadata API)."""
+        return {f["name"]: f["id"] for t in self.tables if t["name"] == table for f in t["fields"]}
+
+    def new_id(self) -> str:
+        return f"rec{next(self._ids):014d}"
+
+    def public(
+        self,
+        record: Dict[str, Any],
+        fields: Optional[List[str]] = None,
+        table: str = "",
+        as_string: bool = False,
+        field_ids: Optional[Dict[str, str]] = None,
+    ) -> Dict[str, Any]:
+        values = {
+            name: value
+            for name, value in record["fields"].items()
+            if value not in (None, "", []) and (not fields or name in fields)
+        }
+        if as_string:
+            values = {name: self.to_string(table, name, value) for name, value in values.items()}
+        if field_ids:
+            values = {field_ids.get(name, name): value for name, value in values.items()}
+        return {"id": record["id"], "createdTime": record["createdTime"], "fields": values}
+
+    def to_string(self, table: str, field_name: str, value: Any) -> str:
+        _, target = self.spec(table).get(field_name, ("", None))
+        if target and isinstance(value, list):
+            primary = self.schema[target][0][0]
+            by_id = {rec["id"]: rec for rec in self.data.get(target, [])}
+            value = [by_id[v]["fields"].get(primary, v) if v in by_id else v for v in value]
+        if isinstance(value, list):
+            return ", ".join(str(v) for v in value)
+        return str(value)
+
+    def write(self, table: str, record_id: Optional[str], fields: Dict[str, Any], replace: bool = False) -> Dict[str, Any]:
+        now = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+        rows = self.data[table]
+        if record_id is None:
+            record = {"id": self.new_id(), "createdTime": now, "lastModifiedTime": now, "fields": dict(fields)}
+            rows.append(record)
+            return record
+        for record in rows:
+            if record["id"] == record_id:
+                record["fields"] = dict(fields) if replace else {**record["fields"], **fields}
+                record["lastModifiedTime"] = now
+                return record
+        raise KeyError(record_id)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "FakeAirtableServer"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args: Any) -> None:  # 標準エラーへのアクセスログを抑止
+        pass
+
+    # -- plumbing --------------------------------------------------------------
+
+    def _send(self, status: int, body: Any) -> None:
+        payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _error(self, status: int, kind: str, message: str = "") -> None:
+        self._send(status, {"error": {"type": kind, "message": message or kind}})
+
+    def _body(self) -> Dict[str, Any]:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _dispatch(self, method: str) -> None:
+        fake = self.server.fake
+        url = urlparse(self.path)
+        parts = [unquote(p) for p in url.path.strip("/").split("/")]
+        query = parse_qsl(url.query, keep_blank_values=True)
+
+        if parts == ["__stats"]:
+            with fake.lock:
+                return self._send(200, dict(fake.stats))
+        if parts == ["__reset"]:
+            fake.reset_stats()
+            return self._send(200, {})
+
+        body = self._body() if method in ("POST", "PATCH") else {}
+        fake.delay()
+        if not fake.admit():
+            with fake.lock:
+                fake.stats["429"] += 1
+            return self._error(429, "RATE_LIMIT_REACHED", "Rate limit exceeded.")
+        with fake.lock:
+            fake.stats["requests"] += 1
+            fake.stats[f"{method}"] += 1
+
+        if not parts or parts[0] != "v0":
+            return self._error(404, "NOT_FOUND")
+        if parts[1:3] == ["meta", "bases"] and len(parts) >= 5 and parts[4] == "tables":
+            return self._meta(method, body, parts[5] if len(parts) > 5 else None)
+        if len(parts) < 3:
+            return self._error(404, "NOT_FOUND")
+        table, record_id = parts[2], (parts[3] if len(parts) > 3 else None)
+        with fake.lock:
+            fake.stats[f"{method} {table}"] += 1
+            rows = fake.table(table)
+            if rows is None:
+                return self._error(404, "TABLE_NOT_FOUND", f"Could not find table {table}")
+            handler = getattr(self, f"_{method.lower()}")
+            return handler(table, rows, record_id, query, body)
+
+    def do_GET(self) -> None:
+        self._dispatch("GET")
+
+    def do_POST(self) -> None:
+        self._dispatch("POST")
+
+    def do_PATCH(self) -> None:
+        self._dispatch("PATCH")
+
+    def do_DELETE(self) -> None:
+        self._dispatch("DELETE")
+
+    # -- endpoints -------------------------------------------------------------
+
+    def _meta(self, method: str, body: Dict[str, Any], table_id: Optional[str]) -> None:
+        fake = self.server.fake
+        if table_id:
+            return self._meta_table(method, body, table_id)
+        if method == "GET":
+            return self._send(200, {"tables": fake.tables})
+        if method == "POST":
+            name = body.get("name")
+            if not name or name in fake.data:
+                return self._error(422, "INVALID_REQUEST_UNKNOWN")
+            with fake.lock:
+                fake.schema[name] = [(f["name"], f.get("type", "singleLineText"), None) for f in body.get("fields", [])]
+                fake.table_ids[name] = f"tbl{len(fake.table_ids) + 1:014d}"
+                fake.data[name] = []
+            return self._send(200, next(t for t in fake.tables if t["name"] == name))
+        return self._error(404, "NOT_FOUND")
+
+    def _meta_table(self, method: str, body: Dict[str, Any], table_id: str) -> None:
+        fake = self.server.fake
+        with fake.lock:
+            name = next((n for n, i in fake.table_ids.items() if i == table_id), None)
+            if name is None or name not in fake.schema:
+                return self._error(404, "TABLE_NOT_FOUND")
+            if method == "DELETE":
+                del fake.schema[name], fake.data[name]
+                return self._send(200, {"id": table_id, "deleted": True})
+            if method != "PATCH":
+                return self._error(404, "NOT_FOUND")
+            new_name = body.get("name") or name
+            if new_name != name:
+                fake.schema[new_name] = fake.schema.pop(name)
+                fake.data[new_name] = fake.data.pop(name)
+                fake.table_ids[new_name] = fake.table_ids.pop(name)
+            return self._send(200, next(t for t in fake.tables if t["id"] == table_id))
+
+    def _get(self, table: str, rows: List[Dict[str, Any]], record_id: Optional[str], query: List[Tuple[str, str]], body: Dict[str, Any]) -> None:
+        fake = self.server.fake
+        if record_id:
+            record = next((r for r in rows if r["id"] == record_id), None)
+            if record is None:
+                return self._error(404, "NOT_FOUND")
+            return self._send(200, fake.public(record))
+
+        params = dict(query)
+        ids = fake.field_ids(table)
+        names = {field_id: name for name, field_id in ids.items()}
+        # fields[] と sort はフィールド名・フィールド ID のどちらでも指定できる
+        fields = [names.get(v, v) for k, v in query if k == "fields[]"] or None
+        unknown = [name for name in fields or [] if name not in ids]
+        if unknown:
+            # 実際の API と同じく、存在しないフィールドの射影は 422 にする
+            return self._error(422, "UNKNOWN_FIELD_NAME", f'Unknown field name: "{unknown[0]}"')
+        sort = []
+        for i in itertools.count():
+            name = params.get(f"sort[{i}][field]")
+            if name is None:
+                break
+            sort.append({"field": names.get(name, name), "direction": params.get(f"sort[{i}][direction]", "asc")})
+        try:
+            matched = list(filter_records(rows, params.get("filterByFormula")))
+        except FormulaError as e:
+            return self._error(422, "INVALID_FILTER_BY_FORMULA", str(e))
+        matched = sort_records(matched, sort)
+        if params.get("maxRecords"):
+            matched = matched[: int(params["maxRecords"])]
+        page_size = min(int(params.get("pageSize") or _MAX_PAGE_SIZE), _MAX_PAGE_SIZE)
+        start = int(params.get("offset") or 0)
+        page = matched[start : start + page_size]
+        as_string = params.get("cellFormat") == "string"
+        by_id = ids if params.get("returnFieldsByFieldId") == "true" else None
+        out: Dict[str, Any] = {"records": [fake.public(r, fields, table, as_string, by_id) for r in page]}
+        if start + page_size < len(matched):
+            out["offset"] = str(start + page_size)
+        self._send(200, out)
+
+    def _post(self, table: str, rows: List[Dict[str, Any]], record_id: Optional[str], query: List[Tuple[str, str]], body: Dict[str, Any]) -> None:
+        fake = self.server.fake
+        if "records" not in body:
+            return self._send(200, fake.public(fake.write(table, None, body.get("fields", {}))))
+        if len(body["records"]) > _BATCH_LIMIT:
+            return self._error(422, "INVALID_RECORDS", "Too many records (max 10).")
+        fake.stats["records_written"] += len(body["records"])
+        created = [fake.write(table, None, rec.get("fields", {})) for rec in body["records"]]
+        self._send(200, {"records": [fake.public(r) for r in created]})
+
+    def _patch(self, table: str, rows: List[Dict[str, Any]], record_id: Optional[str], query: List[Tuple[str, str]], body: Dict[str, Any]) -> None:
+        fake = self.server.fake
+        try:
+            if record_id:
+                return self._send(200, fake.public(fake.write(table, record_id, body.get("fields", {}))))
+            if len(body.get("records", [])) > _BATCH_LIMIT:
+                return self._error(422, "INVALID_RECORDS", "Too many records (max 10).")
+            fake.stats["records_written"] += len(body["records"])
+            merge_on = (body.get("performUpsert") or {}).get("fieldsToMergeOn")
+            updated, created_ids = [], []
+            for rec in body["records"]:
+                target = rec.get("id")
+                if target is None and merge_on:
+                    key = {name: rec["fields"].get(name) for name in merge_on}
+                    match = next((r for r in rows if all(r["fields"].get(k) == v for k, v in key.items())), None)
+                    target = match["id"] if match else None
+                if target is None:
+                    record = fake.write(table, None, rec.get("fields", {}))
+                    created_ids.append(record["id"])
+                else:
+                    record = fake.write(table, target, rec.get("fields", {}))
+                updated.append(record)
+        except KeyError as e:
+            return self._error(404, "ROW_DOES_NOT_EXIST", f"Record {e} not found")
+        out: Dict[str, Any] = {"records": [fake.public(r) for r in updated]}
+        if merge_on:
+            out["createdRecords"] = created_ids
+            out["updatedRecords"] = [r["id"] for r in updated if r["id"] not in created_ids]
+        self._send(200, out)
+
+    def _delete(self, table: str, rows: List[Dict[str, Any]], record_id: Optional[str], query: List[Tuple[str, str]], body: Dict[str, Any]) -> None:
+        ids = [record_id] if record_id else [v for k, v in query if k == "records[]"]
+        if len(ids) > _BATCH_LIMIT:
+            return self._error(422, "INVALID_RECORDS", "Too many records (max 10).")
+        existing = {r["id"] for r in rows}
+        rows[:] = [r for r in rows if r["id"] not in ids]
+        results = [{"id": i, "deleted": i in existing} for i in ids]
+        if record_id:
+            return self._send(200 if results[0]["deleted"] else 404, results[0])
+        self._send(200, {"records": results})
+
+
+class FakeAirtableServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, fake: FakeAirtable, host: str = "127.0.0.1", port: int = 0):
+        super().__init__((host, port), _Handler)
+        self.fake = fake
+
+    @property
+    def api_root(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v0"
+
+
+def start_server(fake: Optional[FakeAirtable] = None, port: int = 0) -> FakeAirtableServer:
+    """Starts the fake server on a background thread and returns it."""
+    server = FakeAirtableServer(fake or FakeAirtable(), port=port)
+    threading.Thread(target=server.serve_forever, name="fake-airtable", daemon=True).start()
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--seed", type=int, default=42, help="架空データの乱数シード")
+    parser.add_argument("--latency", type=float, default=0.08, help="1 リクエストの平均遅延 (秒)")
+    parser.add_argument("--jitter", type=float, default=0.04, help="遅延のゆらぎ (秒)")
+    parser.add_argument("--rate-limit", type=float, default=5.0, help="Base ごとの毎秒リクエスト上限 (0 で無制限)")
+    parser.add_argument("--penalty", type=float, default=30.0, help="429 の後に拒否し続ける秒数")
+    args = parser.parse_args()
+
+    fake = FakeAirtable(seed_data(args.seed), args.latency, args.jitter, args.rate_limit, args.penalty)
+    server = FakeAirtableServer(fake, port=args.port)
+    print(f"AIRTABLE_API_ROOT={server.api_root}")
+    print(f"AIRTABLE_BASE_ID={FAKE_BASE_ID}")
+    print("AIRTABLE_API_KEY=fake")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""fake_line_api.py
+LINE の認証情報なしで Webhook (agent/line_webhook.py) を動かすための、ローカルの Messaging API 互換サーバー。
+
+Webhook が使う以下のエンドポイントを実装し、受け取った push メッセージを記録します。
+
+- POST /v2/bot/message/push          送信内容を記録 (X-Line-Retry-Key が同じ再送は 409)
+- GET  /v2/bot/profile/{userId}      displayName を返す (--names で指定、既定は「ユーザーN」)
+- GET  /__pushes                      記録した push メッセージの一覧
+- POST /__reset                       記録を消去
+
+send サブコマンドは、正しく署名したテキストメッセージイベントを Webhook に送ります。
+--users / --messages で複数ユーザーから一斉に送り、キューの上限 (503) も試せます。
+
+使い方:
+    python scripts/fake_airtable.py --port 8787 &
+    python scripts/fake_line_api.py serve --port 8788 &
+    LINE_API_ROOT=http://127.0.0.1:8788 LINE_CHANNEL_SECRET=fake LINE_CHANNEL_ACCESS_TOKEN=fake \\
+        AIRTABLE_API_ROOT=http://127.0.0.1:8787/v0 AIRTABLE_API_KEY=fake \\
+        AIRTABLE_BASE_ID=appFakeFarmBase01 python -m agent.line_webhook &
+    python scripts/fake_line_api.py send --secret fake "今日のタスク"
+    curl http://127.0.0.1:8788/__pushes
+"""
+
+import argparse
+import base64
+import hashlib
+import hmac
+import json
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+
+class FakeLineApi:
+    """Recorded push messages and the profiles served by the fake server."""
+
+    def __init__(self, names: Optional[Dict[str, str]] = None, latency: float = 0.0):
+        self.names = names or {}
+        self.latency = latency
+        self.pushes: List[Dict[str, Any]] = []
+        self.retry_keys: set = set()
+        self.lock = threading.Lock()
+
+    def display_name(self, user_id: str) -> str:
+        return self.names.get(user_id) or f"ユーザー{user_id[-4:]}"
+
+    def reset(self) -> None:
+        with self.lock:
+            self.pushes.clear()
+            self.retry_keys.clear()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "FakeLineServer"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args: Any) -> None:  # 標準エラーへのアクセスログを抑止
+        pass
+
+    def _send(self, status: int, body: Any) -> None:
+        payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self) -> None:
+        fake = self.server.fake
+        if self.path == "/__pushes":
+            with fake.lock:
+                return self._send(200, list(fake.pushes))
+        prefix = "/v2/bot/profile/"
+        if self.path.startswith(prefix):
+            time.sleep(fake.latency)
+            user_id = self.path[len(prefix) :]
+            return self._send(200, {"userId": user_id, "displayName": fake.display_name(user_id)})
+        self._send(404, {"message": "Not found"})
+
+    def do_POST(self) -> None:
+        fake = self.server.fake
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}")
+        if self.path == "/__reset":
+            fake.reset()
+            return self._send(200, {})
+        if self.path != "/v2/bot/message/push":
+            return self._send(404, {"message": "Not found"})
+        if not self.headers.get("Authorization", "").startswith("Bearer "):
+            return self._send(401, {"message": "Authentication failed"})
+        messages = body.get("messages") or []
+        if not body.get("to") or not 1 <= len(messages) <= 5:
+            return self._send(400, {"message": "The request body has 1 error(s)"})
+        time.sleep(fake.latency)
+        retry_key = self.headers.get("X-Line-Retry-Key")
+        with fake.lock:
+            if retry_key and retry_key in fake.retry_keys:
+                return self._send(409, {"message": "The retry key is already accepted"})
+            if retry_key:
+                fake.retry_keys.add(retry_key)
+            fake.pushes.append({"to": body["to"], "messages": messages, "at": time.time()})
+        self._send(200, {"sentMessages": [{"id": uuid.uuid4().hex} for _ in messages]})
+
+
+class FakeLineServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, fake: FakeLineApi, host: str = "127.0.0.1", port: int = 0):
+        super().__init__((host, port), _Handler)
+        self.fake = fake
+
+    @property
+    def api_root(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def start_server(fake: Optional[FakeLineApi] = None, port: int = 0) -> FakeLineServer:
+    """Starts the fake server on a background thread and returns it."""
+    server = FakeLineServer(fake or FakeLineApi(), port=port)
+    threading.Thread(target=server.serve_forever, name="fake-line-api", daemon=True).start()
+    return server
+
+
+def webhook_body(user_id: str, text: str) -> bytes:
+    """Webhook request body with one text message event from ``user_id``."""
+    event = {
+        "type": "message",
+        "mode": "active",
+        "timestamp": int(time.time() * 1000),
+        "webhookEventId": uuid.uuid4().hex,
+        "deliveryContext": {"isRedelivery": False},
+        "source": {"type": "user", "userId": user_id},
+        "replyToken": uuid.uuid4().hex,
+        "message": {"type": "text", "id": uuid.uuid4().hex, "text": text},
+    }
+    return json.dumps({"destination": "Ufake", "events": [event]}, ensure_ascii=False).encode("utf-8")
+
+
+def send_webhook(url: str, secret: str, user_id: str, text: str) -> Tuple[int, float]:
+    """Posts a signed text message event; returns (HTTP status, seconds)."""
+    body = webhook_body(user_id, text)
+    signature = base64.b64encode(hmac.new(secret.encode("utf-8"), body, hashlib.sha256).digest())
+    request = Request(
+        url,
+        data=body,
+        method="POST",
+        headers={"Content-Type": "application/json", "X-Line-Signature": signature.decode("ascii")},
+    )
+    started = time.perf_counter()
+    try:
+        with urlopen(request, timeout=30) as resp:
+            status = resp.status
+    except HTTPError as e:
+        status = e.code
+    return status, time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    sub = parser.add_subparsers(dest="command", required=True)
+    serve = sub.add_parser("serve", help="Messaging API 互換サーバーを起動する")
+    serve.add_argument("--port", type=int, default=8788)
+    serve.add_argument("--latency", type=float, default=0.05, help="1 リクエストの遅延 (秒)")
+    serve.add_argument("--names", nargs="*", default=[], metavar="USER_ID=NAME", help="表示名")
+    send = sub.add_parser("send", help="署名付きのメッセージイベントを Webhook に送る")
+    send.add_argument("text")
+    send.add_argument("--url", default="http://127.0.0.1:8080/callback")
+    send.add_argument("--secret", required=True, help="LINE_CHANNEL_SECRET と同じ値")
+    send.add_argument("--user", default="Ufake0000000000000000000000000001", help="送信者の userId")
+    send.add_argument("--users", type=int, default=1, help="同時に送るユーザー数")
+    send.add_argument("--messages", type=int, default=1, help="ユーザーあたりのメッセージ数")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        names = dict(item.split("=", 1) for item in args.names)
+        server = FakeLineServer(FakeLineApi(names, args.latency), port=args.port)
+        print(f"LINE_API_ROOT={server.api_root}")
+        server.serve_forever()
+        return
+
+    users = [args.user] if args.users == 1 else [f"Ufake{n:028d}" for n in range(args.users)]
+
+    def run(user_id: str) -> List[Tuple[int, float]]:
+        return [send_webhook(args.url, args.secret, user_id, args.text) for _ in range(args.messages)]
+
+    with ThreadPoolExecutor(max_workers=len(users)) as pool:
+        results = [r for rs in pool.map(run, users) for r in rs]
+    statuses: Dict[int, int] = {}
+    for status, _ in results:
+        statuses[status] = statuses.get(status, 0) + 1
+    slowest = max(seconds for _, seconds in results)
+    print(f"sent={len(results)} statuses={statuses} slowest_ack={slowest * 1000:.1f}ms")
+    sys.exit(0 if set(statuses) == {200} else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,18 @@
 """generate_airtable_schema.py
 Airtable Metadata API を利用して、指定された Base 内のすべてのテーブルと
-フィールド情報を取得し、docs/Airtable_Schema_Summary.md を自動生成するスクリプト。
+フィールド情報を取得し、スキーマの成果物を生成するスクリプト。
+
+生成するファイル:
+- docs/Airtable_Schema_Summary.md   テーブル・フィールドの一覧 (フィールド ID 付き)
+- .airtable_schema.json             バージョン付きのスキーマ (AIRTABLE_SCHEMA_PATH)。
+                                    エージェントはこのファイルを読み、フィールド名と
+                                    フィールド ID を相互に変換する
+- agent/airtable_records.py         テーブルごとの __slots__ レコードクラス。
+                                    returnFieldsByFieldId で読んだレコードを日付・数値・
+                                    リンクの型に変換して保持する
+
+スキーマの fingerprint が前回と同じなら Markdown とモジュールは書き換えません。
+--max-age 秒以内に生成したスキーマがあれば、メタデータ API も呼びません。
 
 メタデータ API は Personal Access Token (PAT) でのみ利用できます。
 `.env` に下記の環境変数を追加してください。
@@ -10,53 +22,98 @@ AIRTABLE_BASE_ID   = app...
 
 使い方:
     python scripts/generate_airtable_schema.py
+    python scripts/generate_airtable_schema.py --max-age 3600 --no-module
 """
 
-import os
+import argparse
 import sys
-import requests
 from pathlib import Path
-from datetime import datetime
-from dotenv import load_dotenv
-
-load_dotenv()
-
-API_KEY = os.getenv("AIRTABLE_API_KEY")
-BASE_ID = os.getenv("AIRTABLE_BASE_ID")
-OUTPUT_PATH = Path("docs/Airtable_Schema_Summary.md")
-
-if not API_KEY or not BASE_ID:
-    sys.exit("AIRTABLE_API_KEY または AIRTABLE_BASE_ID が .env に設定されていません。")
-
-METADATA_URL = f"https://api.airtable.com/v0/meta/bases/{BASE_ID}/tables"
-HEADERS = {"Authorization": f"Bearer {API_KEY}"}
-
-resp = requests.get(METADATA_URL, headers=HEADERS, timeout=30)
-if resp.status_code != 200:
-    sys.exit(f"Metadata API からスキーマを取得できませんでした: {resp.status_code} {resp.text}")
-
-data = resp.json()
-
-lines = [
-    "# Airtable Database Schema Summary",
-    "",
-    f"_Last updated: {datetime.utcnow().isoformat()}Z_",
-    "",
-    "---",
-    "",
-]
-
-for table in data.get("tables", []):
-    t_name = table["name"]
-    t_id = table["id"]
-    lines.append(f"## Table: {t_name} (ID: {t_id})\n")
-    lines.append("### Fields:")
-    for field in table.get("fields", []):
-        fname = field["name"]
-        ftype = field["type"]
-        lines.append(f"- **{fname}**: {ftype}")
-    lines.append("\n---\n")
-
-OUTPUT_PATH.parent.mkdir(parents=True, exist_ok=True)
-OUTPUT_PATH.write_text("\n".join(lines), encoding="utf-8")
-print(f"Schema summary written to {OUTPUT_PATH}")
+from typing import List, Optional
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from agent.airtable_schema import DEFAULT_SCHEMA_PATH, BaseSchema, render_module  # noqa: E402
+from agent.settings import get_settings, getenv  # noqa: E402
+
+SUMMARY_PATH = ROOT / "docs" / "Airtable_Schema_Summary.md"
+MODULE_PATH = ROOT / "agent" / "airtable_records.py"
+
+
+def render_summary(schema: BaseSchema) -> str:
+    lines = [
+        "# Airtable Database Schema Summary",
+        "",
+        f"_Last updated: {schema.generated_at} (fingerprint {schema.fingerprint})_",
+        "",
+        "---",
+        "",
+    ]
+    for table in schema.tables:
+        lines.append(f"## Table: {table.name} (ID: {table.id})\n")
+        lines.append("### Fields:")
+        for spec in table.fields:
+            lines.append(f"- **{spec.name}**: {spec.type} (`{spec.id}`)")
+        lines.append("\n---\n")
+    return "\n".join(lines)
+
+
+def fetch_schema(base_id: str) -> BaseSchema:
+    from agent.airtable_client import AirtableError
+    from agent.airtable_tools import airtable_list_tables
+
+    try:
+        return BaseSchema.from_api(base_id, airtable_list_tables()["tables"])
+    except AirtableError as e:
+        sys.exit(f"Metadata API からスキーマを取得できませんでした: {e}")
+
+
+def write_if_changed(path: Path, text: str) -> bool:
+    if path.exists() and path.read_text(encoding="utf-8") == text:
+        return False
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding="utf-8")
+    return True
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--schema-path", default=getenv("AIRTABLE_SCHEMA_PATH") or DEFAULT_SCHEMA_PATH)
+    parser.add_argument("--summary-path", default=str(SUMMARY_PATH))
+    parser.add_argument("--module-path", default=str(MODULE_PATH))
+    parser.add_argument("--no-module", action="store_true", help="レコードクラスのモジュールを生成しない")
+    parser.add_argument("--max-age", type=float, default=0, help="この秒数以内に生成したスキーマを再利用する")
+    parser.add_argument("--force", action="store_true", help="変更がなくても Markdown とモジュールを書き直す")
+    args = parser.parse_args(argv)
+
+    settings = get_settings()
+    try:
+        base_id = settings.require_base_id()
+        settings.require_api_key()
+    except EnvironmentError:
+        sys.exit("AIRTABLE_API_KEY または AIRTABLE_BASE_ID が .env に設定されていません。")
+
+    previous = BaseSchema.load(args.schema_path)
+    if previous is not None and previous.base_id != base_id:
+        previous = None
+    if previous is not None and args.max_age and previous.age() <= args.max_age:
+        schema = previous
+        print(f"Reusing cached schema {args.schema_path} (fingerprint {schema.fingerprint})")
+    else:
+        schema = fetch_schema(base_id)
+        # 鮮度の判定に使うので、内容が同じでも生成日時は更新する
+        schema.save(args.schema_path)
+        print(f"Schema written to {args.schema_path} (fingerprint {schema.fingerprint})")
+
+    # 生成日時だけが違う Markdown で差分が出ないよう、スキーマが同じなら書き直さない
+    unchanged = previous is not None and previous.fingerprint == schema.fingerprint and not args.force
+    summary_path = Path(args.summary_path)
+    if not (unchanged and summary_path.exists()):
+        summary_path.parent.mkdir(parents=True, exist_ok=True)
+        summary_path.write_text(render_summary(schema), encoding="utf-8")
+        print(f"Schema summary written to {summary_path}")
+    if not args.no_module and write_if_changed(Path(args.module_path), render_module(schema)):
+        print(f"Record classes written to {args.module_path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""prefetch_today_tasks.py
+今日の未完了の作業タスクを取得し、担当者ごとのダイジェストを作成するスクリプト。
+
+作業開始前に実行しておくと、get_today_tasks は Airtable に問い合わせずに
+ダイジェスト (AIRTABLE_TASK_DIGEST_PATH、既定: .task_digest.json) から回答します。
+
+使い方:
+    python scripts/prefetch_today_tasks.py             # 1 回だけ作成
+    python scripts/prefetch_today_tasks.py --at 05:30  # 毎日 5:30 に作成し続ける
+    python scripts/prefetch_today_tasks.py --tenant farm-a  # TENANTS_PATH の農場の分を作成
+"""
+
+import argparse
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from agent.airtable_tools import airtable_refresh_task_digest  # noqa: E402
+from agent.settings import DEFAULT_TENANT  # noqa: E402
+from agent.tenants import use_tenant  # noqa: E402
+
+
+def _sleep_until(at: str) -> None:
+    hour, minute = (int(part) for part in at.split(":"))
+    now = datetime.now()
+    target = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if target <= now:
+        target += timedelta(days=1)
+    time.sleep((target - now).total_seconds())
+
+
+def _run(args: argparse.Namespace) -> None:
+    while True:
+        result = airtable_refresh_task_digest()
+        if result["status"] != "success":
+            print(f"エラー: {result['error']}")
+        else:
+            stats = result["digest"]
+            print(
+                f"{stats['day']}: tasks={stats['tasks']} workers={stats['workers']} "
+                f"({stats['seconds']}s)"
+            )
+        if not args.at:
+            break
+        _sleep_until(args.at)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--at", help="毎日この時刻 (HH:MM) にダイジェストを作成し続ける")
+    parser.add_argument("--tenant", default=DEFAULT_TENANT, help="対象の農場 (TENANTS_PATH のテナント ID)")
+    args = parser.parse_args()
+
+    with use_tenant(args.tenant):
+        _run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""sync_airtable_mirror.py
+Airtable Base の全テーブルをローカルの SQLite ミラーへ同期するスクリプト。
+
+初回は全件スナップショットを取得し、2 回目以降は前回同期以降に更新された
+レコード (LAST_MODIFIED_TIME) だけを取得します。削除されたレコードも検出します。
+ミラーの保存先は AIRTABLE_MIRROR_PATH (既定: .airtable_mirror.sqlite3)。
+
+使い方:
+    python scripts/sync_airtable_mirror.py                  # 1 回だけ同期
+    python scripts/sync_airtable_mirror.py --interval 300   # 5 分ごとに同期し続ける
+    python scripts/sync_airtable_mirror.py --full 作業タスク  # 指定テーブルを再取得
+    python scripts/sync_airtable_mirror.py --tenant farm-a  # TENANTS_PATH の農場のベースを同期
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from agent.airtable_tools import airtable_sync_mirror  # noqa: E402
+from agent.settings import DEFAULT_TENANT  # noqa: E402
+from agent.tenants import use_tenant  # noqa: E402
+
+
+def _run(args: argparse.Namespace) -> None:
+    while True:
+        result = airtable_sync_mirror(args.tables or None, full=args.full)
+        for name, stats in result["tables"].items():
+            print(
+                f"{name}: {stats['mode']} upserted={stats['upserted']} "
+                f"deleted={stats['deleted']} ({stats['seconds']}s)"
+            )
+        if not args.interval:
+            break
+        time.sleep(args.interval)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("tables", nargs="*", help="同期するテーブル名 (省略時は全テーブル)")
+    parser.add_argument("--full", action="store_true", help="差分ではなく全件を再取得する")
+    parser.add_argument("--interval", type=float, default=0, help="指定秒ごとに同期を繰り返す")
+    parser.add_argument("--tenant", default=DEFAULT_TENANT, help="対象の農場 (TENANTS_PATH のテナント ID)")
+    args = parser.parse_args()
+
+    with use_tenant(args.tenant):
+        _run(args)
+
+
+if __name__ == "__main__":
+    main()
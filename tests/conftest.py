@@ -0,0 +1,70 @@
+"""Shared fixtures: the local Airtable stand-in and a fresh tenant per test.
+
+Every test that talks to Airtable runs against ``scripts/fake_airtable.py``
+(no latency, no rate limit) inside its own tenant (``use_settings``), so the
+client, read cache, outbox, task digest and schema of one test never leak
+into the next.
+"""
+
+import sys
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Iterator
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "scripts"))
+
+from fake_airtable import FakeAirtable, FakeAirtableServer, start_server  # noqa: E402
+
+from agent.airtable_outbox import _outboxes  # noqa: E402
+from agent.settings import Settings, use_settings  # noqa: E402
+
+BASE_ID = "appFakeFarmBase01"
+
+
+@pytest.fixture
+def fake_server() -> Iterator[FakeAirtableServer]:
+    server = start_server(FakeAirtable(latency=0, jitter=0, rate_limit=0))
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def fake(fake_server: FakeAirtableServer) -> FakeAirtable:
+    return fake_server.fake
+
+
+@pytest.fixture
+def tenant_env(fake_server: FakeAirtableServer, tmp_path: Path) -> Dict[str, str]:
+    """Settings of the test tenant; files go to the test's temporary directory."""
+    return {
+        "AIRTABLE_API_KEY": "fake",
+        "AIRTABLE_BASE_ID": BASE_ID,
+        "AIRTABLE_API_ROOT": fake_server.api_root,
+        "AIRTABLE_RATE_LIMIT": "1000",
+        "AIRTABLE_MAX_RETRIES": "1",
+        "AIRTABLE_BACKOFF_BASE": "0.01",
+        "AIRTABLE_BACKOFF_MAX": "0.05",
+        "AIRTABLE_READ_MODE": "api",
+        "AIRTABLE_WRITE_MODE": "auto",
+        "AIRTABLE_OUTBOX_PATH": str(tmp_path / "outbox.sqlite3"),
+        "AIRTABLE_OUTBOX_INTERVAL": "0.05",
+        "AIRTABLE_MIRROR_PATH": str(tmp_path / "mirror.sqlite3"),
+        "AIRTABLE_TASK_DIGEST_PATH": str(tmp_path / "digest.json"),
+        "AIRTABLE_SCHEMA_PATH": str(tmp_path / "schema.json"),
+    }
+
+
+@pytest.fixture
+def airtable(tenant_env: Dict[str, str]) -> Iterator[Settings]:
+    """Binds a new tenant whose tools talk to the fake server."""
+    settings = Settings.for_tenant(f"test-{uuid.uuid4().hex[:8]}", tenant_env)
+    with use_settings(settings):
+        yield settings
+        outbox: Any = _outboxes.peek()
+        if outbox is not None:
+            outbox.stop(timeout=5)
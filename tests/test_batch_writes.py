@@ -0,0 +1,59 @@
+"""Batch writes: 10-record chunks and per-chunk failures; unknown fields are rejected."""
+
+import pytest
+
+from agent import airtable_tools
+from agent.airtable_client import AirtableError
+
+TABLE = "日報ログ"
+
+
+def test_batch_create_sends_ten_records_per_request(airtable, fake):
+    before = len(fake.data[TABLE])
+    records = [{"報告日": "2025-05-01", "報告内容": f"作業 {i}"} for i in range(25)]
+
+    result = airtable_tools.airtable_batch_create_records(TABLE, records)
+
+    assert result["status"] == "success"
+    assert [r["index"] for r in result["results"]] == list(range(25))
+    assert all(r["status"] == "success" and r["id"].startswith("rec") for r in result["results"])
+    assert fake.stats[f"POST {TABLE}"] == 3
+    assert len(fake.data[TABLE]) == before + 25
+
+
+def test_batch_update_fails_only_the_chunk_with_a_bad_record(airtable, fake):
+    ids = [record["id"] for record in fake.data["作業タスク"][:25]]
+    records = [{"id": record_id, "fields": {"ステータス": "保留"}} for record_id in ids]
+    # 2 番目のチャンク (11〜20 件目) にだけ存在しないレコードを混ぜる
+    records[14] = {"id": "recDoesNotExist00", "fields": {"ステータス": "保留"}}
+
+    result = airtable_tools.airtable_batch_update_records("作業タスク", records)
+
+    assert result["status"] == "partial"
+    statuses = [r["status"] for r in result["results"]]
+    assert statuses[:10] == ["success"] * 10
+    assert statuses[10:20] == ["error"] * 10
+    assert statuses[20:] == ["success"] * 5
+    assert "404" in result["results"][14]["error"]
+    rows = {row["id"]: row for row in fake.data["作業タスク"]}
+    assert all(rows[record_id]["fields"]["ステータス"] == "保留" for record_id in ids[20:])
+
+
+def test_update_task_statuses_reports_failed_ids(airtable, fake):
+    ids = [record["id"] for record in fake.data["作業タスク"][:12]] + ["recDoesNotExist00"]
+
+    message = airtable_tools.update_task_statuses(ids, "完了")
+
+    # 存在しない ID を含む 2 番目のチャンク (3 件) だけが失敗する
+    assert message.startswith("10件のタスクのステータスを「完了」に更新しました。")
+    assert "更新に失敗したタスク(3件)" in message
+    assert "recDoesNotExist00" in message
+
+
+def test_unknown_projected_field_is_rejected(airtable):
+    # 実際の API と同じく、存在しないフィールドの fields[] は 422 (UNKNOWN_FIELD_NAME)
+    with pytest.raises(AirtableError) as excinfo:
+        airtable_tools.airtable_get_records("作業タスク", fields=["タスク名", "担当者"], max_records=1)
+
+    assert excinfo.value.status_code == 422
+    assert "UNKNOWN_FIELD_NAME" in str(excinfo.value)
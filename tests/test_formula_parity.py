@@ -0,0 +1,110 @@
+"""Formula evaluator parity: compiled ``Query`` conditions select the intended records.
+
+The fake server and ``Query.run_local`` (mirror / snapshots) share
+``airtable_formula``; each case checks both against a plain Python predicate.
+"""
+
+from datetime import date, timedelta
+
+import pytest
+
+from agent.airtable_query import (
+    Condition,
+    Query,
+    all_of,
+    any_of,
+    contains,
+    date_range,
+    eq,
+    linked_contains,
+    ne,
+    not_,
+    on_day,
+    one_of,
+    record_id_in,
+)
+
+TABLE = "作業タスク"
+TODAY = date.today()
+LOOKUP = "圃場名 (from 圃場データ) (from 関連する作付計画)"
+
+
+def _f(record, name, default=None):
+    return record["fields"].get(name, default)
+
+
+def _in_range(record, start, end):
+    day = _f(record, "予定日")
+    return bool(day) and start.isoformat() <= day < end.isoformat()
+
+
+CASES = [
+    ("eq", eq("ステータス", "作業中"), lambda r: _f(r, "ステータス") == "作業中"),
+    ("ne", ne("ステータス", "完了"), lambda r: _f(r, "ステータス") != "完了"),
+    ("contains", contains("タスク名", "作業"), lambda r: "作業" in _f(r, "タスク名", "")),
+    ("linked_contains", linked_contains(LOOKUP, "A-"), lambda r: "A-" in ",".join(_f(r, LOOKUP, []))),
+    (
+        "one_of",
+        one_of("タスク名", ["播種", "定植", "収穫"]),
+        lambda r: _f(r, "タスク名") in ("播種", "定植", "収穫"),
+    ),
+    ("one_of_empty", one_of("タスク名", []), lambda r: False),
+    ("on_day", on_day("予定日", TODAY), lambda r: _f(r, "予定日") == TODAY.isoformat()),
+    (
+        "date_range",
+        date_range("予定日", TODAY - timedelta(days=7), TODAY + timedelta(days=7)),
+        lambda r: _in_range(r, TODAY - timedelta(days=7), TODAY + timedelta(days=7)),
+    ),
+    (
+        "date_range_open_end",
+        date_range("予定日", start=TODAY + timedelta(days=30)),
+        lambda r: _f(r, "予定日", "") >= (TODAY + timedelta(days=30)).isoformat(),
+    ),
+    ("not", not_(eq("タスク名", "防除")), lambda r: _f(r, "タスク名") != "防除"),
+    (
+        "all_of",
+        all_of(on_day("予定日", TODAY), ne("ステータス", "完了"), linked_contains(LOOKUP, "B-")),
+        lambda r: _f(r, "予定日") == TODAY.isoformat()
+        and _f(r, "ステータス") != "完了"
+        and "B-" in ",".join(_f(r, LOOKUP, [])),
+    ),
+    (
+        "any_of",
+        any_of(eq("タスク名", "灌水"), eq("ステータス", "作業中")),
+        lambda r: _f(r, "タスク名") == "灌水" or _f(r, "ステータス") == "作業中",
+    ),
+]
+
+
+@pytest.mark.parametrize("condition, predicate", [c[1:] for c in CASES], ids=[c[0] for c in CASES])
+def test_compiled_condition_matches_predicate(airtable, fake, condition, predicate):
+    records = fake.data[TABLE]
+    expected = [record["id"] for record in records if predicate(record)]
+    query = Query(TABLE).where(condition)
+
+    assert [record["id"] for record in query.run_local(records)] == expected
+    assert sorted(record["id"] for record in query.run()) == sorted(expected)
+
+
+def test_record_id_in(airtable, fake):
+    records = fake.data[TABLE]
+    ids = [records[i]["id"] for i in (3, 10, 500)]
+    query = Query(TABLE).where(record_id_in(ids))
+
+    assert [record["id"] for record in query.run_local(records)] == ids
+    assert sorted(record["id"] for record in query.run()) == sorted(ids)
+
+
+def test_quoted_values_round_trip(airtable, fake):
+    # 引用符やバックスラッシュを含む値もエスケープされて一致する
+    tricky = "防除 \"特別\" 'A' \\ 区画"
+    fake.data[TABLE][0]["fields"]["タスク名"] = tricky
+    query = Query(TABLE).where(eq("タスク名", tricky))
+
+    assert [record["id"] for record in query.run_local(fake.data[TABLE])] == [fake.data[TABLE][0]["id"]]
+    assert [record["id"] for record in query.run()] == [fake.data[TABLE][0]["id"]]
+
+
+def test_condition_requires_compile():
+    with pytest.raises(TypeError):
+        Condition()
@@ -0,0 +1,26 @@
+"""AgentResponder: fast-path answers survive a failure to record the turn."""
+
+import asyncio
+
+from agent import router
+from agent.line_webhook import AgentResponder
+from agent.router import RouteResult
+
+
+class _FastRouter:
+    async def route_async(self, text, user_name=None):
+        return RouteResult(True, "today_tasks", 1.0, answer="本日のタスク:\n・防除 (圃場: A-1)")
+
+
+class _BrokenSessions(AgentResponder):
+    async def remember(self, user_id, text, answer):
+        raise RuntimeError("session service unavailable")
+
+
+def test_fast_path_answer_is_returned_when_remember_fails(monkeypatch, caplog):
+    monkeypatch.setattr(router, "get_router", lambda: _FastRouter())
+
+    answer = asyncio.run(_BrokenSessions()("U1", "今日のタスク", None))
+
+    assert answer == "本日のタスク:\n・防除 (圃場: A-1)"
+    assert "failed to record the fast-path turn" in caplog.text
@@ -0,0 +1,75 @@
+"""Outbox: entries left by a previous process are delivered after a restart."""
+
+import time
+
+from agent import airtable_tools
+from agent.airtable_outbox import Outbox, _outboxes, get_outbox, resume_outbox
+
+
+def _wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return predicate()
+
+
+def test_pending_entries_are_replayed_after_restart(airtable, tenant_env, fake):
+    record_id = fake.data["作業タスク"][0]["id"]
+    before = len(fake.data["日報ログ"])
+    # 前のプロセスが配信する前に止まった: キューのファイルだけが残る
+    previous = Outbox(path=tenant_env["AIRTABLE_OUTBOX_PATH"])
+    previous.enqueue("日報ログ", "create", {"報告日": "2025-05-01", "報告内容": "防除"})
+    previous.enqueue("作業タスク", "update", {"ステータス": "作業中"}, record_id=record_id)
+    previous.enqueue("作業タスク", "update", {"ステータス": "完了"}, record_id=record_id)
+    assert _outboxes.peek() is None
+
+    assert resume_outbox() is True
+
+    outbox = get_outbox(start_worker=False)
+    assert _wait_until(lambda: outbox.stats()["pending"] == 0)
+    assert outbox.stats()["sent"] == 3
+    assert len(fake.data["日報ログ"]) == before + 1
+    # 同じレコードへの更新は積まれた順に届く
+    rows = {row["id"]: row for row in fake.data["作業タスク"]}
+    assert rows[record_id]["fields"]["ステータス"] == "完了"
+
+
+def test_first_write_resumes_entries_left_by_a_previous_process(airtable, tenant_env, fake):
+    record_id = fake.data["作業タスク"][0]["id"]
+    Outbox(path=tenant_env["AIRTABLE_OUTBOX_PATH"]).enqueue(
+        "作業タスク", "update", {"ステータス": "作業中"}, record_id=record_id
+    )
+
+    # 別のレコードへの直接の書き込みでも、残っていたエントリの配信が始まる
+    assert airtable_tools.create_daily_report("田中", "防除終わりました").startswith("日報")
+
+    outbox = get_outbox(start_worker=False)
+    assert _wait_until(lambda: outbox.stats()["pending"] == 0)
+    rows = {row["id"]: row for row in fake.data["作業タスク"]}
+    assert rows[record_id]["fields"]["ステータス"] == "作業中"
+
+
+def test_resume_without_pending_entries_does_not_start_the_worker(airtable, tenant_env):
+    # ファイルが無ければ作らない
+    assert resume_outbox() is False
+    assert _outboxes.peek() is None
+
+    Outbox(path=tenant_env["AIRTABLE_OUTBOX_PATH"])
+    assert resume_outbox() is False
+    assert get_outbox(start_worker=False).stats()["worker_running"] is False
+
+
+def test_batch_status_update_waits_for_queued_update_of_the_same_task(airtable, fake):
+    ids = [record["id"] for record in fake.data["作業タスク"][:3]]
+    get_outbox(start_worker=False).enqueue("作業タスク", "update", {"ステータス": "保留"}, record_id=ids[0])
+
+    message = airtable_tools.update_task_statuses(ids, "完了")
+
+    assert message.startswith("2件のタスクのステータスを「完了」に更新しました。")
+    assert "1件は先に受け付けた更新の後に反映します。" in message
+    outbox = get_outbox(start_worker=False)
+    assert _wait_until(lambda: outbox.stats()["pending"] == 0)
+    rows = {row["id"]: row for row in fake.data["作業タスク"]}
+    assert [rows[record_id]["fields"]["ステータス"] for record_id in ids] == ["完了"] * 3
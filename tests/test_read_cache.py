@@ -0,0 +1,96 @@
+"""Read cache: a read that overlaps a write never serves or stores pre-write data."""
+
+import asyncio
+import threading
+
+from agent import airtable_tools, async_airtable_tools
+from agent.airtable_cache import get_cache
+from agent.instrumentation import get_registry, run_in_context
+from agent.settings import current_tenant
+
+TABLE = "資材マスター"
+
+
+def _names(records):
+    return [record["fields"]["資材名"] for record in records]
+
+
+def test_read_after_a_write_does_not_join_the_earlier_read(airtable, monkeypatch):
+    started, release = threading.Event(), threading.Event()
+    values = iter(["書き込み前", "書き込み後"])
+
+    def iter_all(self, **kwargs):
+        value = next(values)
+        if value == "書き込み前":
+            started.set()
+            release.wait(5)
+        return iter([{"id": "rec1", "fields": {"資材名": value}}])
+
+    monkeypatch.setattr(airtable_tools._Table, "iter_all", iter_all)
+    before = []
+    reader = threading.Thread(
+        target=run_in_context(lambda: before.append(airtable_tools._get_table(TABLE).get_all()))
+    )
+    reader.start()
+    assert started.wait(5)
+
+    get_cache().invalidate_table(TABLE)  # 取得中に書き込みがあった
+    after = airtable_tools._get_table(TABLE).get_all()
+    release.set()
+    reader.join(5)
+
+    assert _names(before[0]) == ["書き込み前"]
+    assert _names(after) == ["書き込み後"]
+    # 書き込み前に始まった取得の結果はキャッシュに残らない
+    assert _names(airtable_tools._get_table(TABLE).get_all()) == ["書き込み後"]
+
+
+def test_async_read_after_a_write_does_not_join_the_earlier_read(airtable, monkeypatch):
+    values = iter(["書き込み前", "書き込み後"])
+
+    async def main():
+        started, release = asyncio.Event(), asyncio.Event()
+
+        async def iter_records(table_name, **kwargs):
+            value = next(values)
+            if value == "書き込み前":
+                started.set()
+                await release.wait()
+            yield {"id": "rec1", "fields": {"資材名": value}}
+
+        monkeypatch.setattr(async_airtable_tools, "airtable_iter_records", iter_records)
+        first = asyncio.create_task(async_airtable_tools.airtable_get_records(TABLE))
+        await started.wait()
+        get_cache().invalidate_table(TABLE)
+        second = await asyncio.wait_for(async_airtable_tools.airtable_get_records(TABLE), 5)
+        release.set()
+        third = await async_airtable_tools.airtable_get_records(TABLE)
+        return await first, second, third
+
+    first, second, third = asyncio.run(main())
+    assert _names(first["records"]) == ["書き込み前"]
+    assert _names(second["records"]) == ["書き込み後"]
+    assert _names(third["records"]) == ["書き込み後"]
+
+
+def test_async_reads_are_counted_like_sync_reads(airtable):
+    async def main():
+        for _ in range(2):
+            await async_airtable_tools.airtable_get_records(TABLE)
+
+    asyncio.run(main())
+
+    snapshot = get_registry().snapshot()
+    tenant = current_tenant()
+    lookups = {
+        c["labels"]["result"]: c["value"]
+        for c in snapshot["counters"]
+        if c["name"] == "airtable_cache_lookups_total" and c["labels"]["tenant"] == tenant
+    }
+    queries = {
+        h["labels"]["source"]: h["count"]
+        for h in snapshot["histograms"]
+        if h["name"] == "airtable_query_seconds" and h["labels"]["tenant"] == tenant
+    }
+    assert lookups == {"miss": 1.0, "hit": 1.0}
+    assert queries == {"api": 1, "cache": 1}
@@ -0,0 +1,58 @@
+"""Router: entity extraction and when a message falls back to the agent."""
+
+import pytest
+
+from agent.router import IntentRouter, default_intents, normalize_field_id
+
+
+@pytest.fixture
+def router() -> IntentRouter:
+    return IntentRouter(default_intents())
+
+
+@pytest.mark.parametrize(
+    "text, user_name, args",
+    [
+        ("田中さんの今日のタスク", None, {"worker_name": "田中"}),
+        ("さとうさんの今日の作業", None, {"worker_name": "さとう"}),
+        ("私の今日のタスク", "佐藤", {"worker_name": "佐藤"}),
+        # 句読点・空白も名前の境界になる
+        ("今日のタスク、山田さん", None, {"worker_name": "山田"}),
+        ("今日のタスク 山田さん", None, {"worker_name": "山田"}),
+        # 全員を指す語は担当者名にしない
+        ("みなさんの今日の作業", None, {}),
+        ("A3の圃場情報", None, {"field_name": "A-3"}),
+        ("ａ－３の圃場情報", None, {"field_name": "A-3"}),
+        ("a-3の状況", None, {"field_name": "A-3"}),
+    ],
+)
+def test_entities_are_extracted(router, text, user_name, args):
+    result = router._prepare_call(text, user_name)
+
+    assert result.handled
+    assert result.args == args
+
+
+@pytest.mark.parametrize(
+    "text, user_name, reason",
+    [
+        # 助詞をまたいだ「タスクを田中さん」は担当者名ではない
+        ("今日のタスクを田中さんに", None, "low_confidence"),
+        # キーワードを含む名前の候補 (「今日山田」) は信用しない
+        ("今日山田さんの作業", None, "low_confidence"),
+        # 否定・取り消しはエージェントに任せる
+        ("今日の作業は中止です", None, "low_confidence"),
+        # 送信者の担当者名が分からない「私の」は全員分を返さない
+        ("私の今日のタスク", None, "missing_entity"),
+    ],
+)
+def test_ambiguous_messages_fall_back_to_the_agent(router, text, user_name, reason):
+    result = router._prepare_call(text, user_name)
+
+    assert not result.handled
+    assert result.reason == reason
+
+
+@pytest.mark.parametrize("value", ["A3", "a3", "a-3", "Ａ３", "ａ－３"])
+def test_normalize_field_id(value):
+    assert normalize_field_id(value) == "A-3"
@@ -0,0 +1,78 @@
+"""Single-flight: concurrent identical reads share one call."""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from agent.singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    calls = []
+    results = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.1)
+        return 42
+
+    threads = [threading.Thread(target=lambda: results.append(flight.do("key", fetch))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [42] * 5
+    assert len(calls) == 1
+    assert flight.stats()["deduplicated"] == 4
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_cancelled_follower_does_not_cancel_the_others():
+    flight = SingleFlight()
+
+    async def main():
+        release = asyncio.Event()
+
+        async def fetch():
+            await release.wait()
+            return 42
+
+        leader = asyncio.create_task(flight.do_async("key", fetch))
+        await asyncio.sleep(0)
+        first = asyncio.create_task(flight.do_async("key", fetch))
+        second = asyncio.create_task(flight.do_async("key", fetch))
+        await asyncio.sleep(0)
+
+        first.cancel()
+        await asyncio.sleep(0)
+        release.set()
+
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await leader, await second
+
+    assert asyncio.run(main()) == (42, 42)
+    assert flight.stats()["executions"] == 1
+
+
+def test_leader_error_reaches_followers():
+    flight = SingleFlight()
+
+    async def main():
+        release = asyncio.Event()
+
+        async def fetch():
+            await release.wait()
+            raise RuntimeError("boom")
+
+        tasks = [asyncio.create_task(flight.do_async("key", fetch)) for _ in range(3)]
+        await asyncio.sleep(0)
+        release.set()
+        return await asyncio.gather(*tasks, return_exceptions=True)
+
+    outcomes = asyncio.run(main())
+    assert [str(outcome) for outcome in outcomes] == ["boom"] * 3
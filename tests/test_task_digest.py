@@ -0,0 +1,156 @@
+"""Task digest: fallback when Airtable is unreachable, file reload, incremental updates."""
+
+import os
+from datetime import date
+
+import pytest
+
+from agent import airtable_tools
+from agent.airtable_client import AirtableError, set_client
+from agent.task_digest import TaskDigest
+
+TODAY = date.today().isoformat()
+
+
+def _record(record_id, name, workers, place="A-1"):
+    return {"id": record_id, "fields": {"タスク名": name, "担当者": workers, "圃場名": place}}
+
+
+class FakeLoader:
+    """Returns ``records`` (all, or only the requested IDs); raises while ``down``."""
+
+    def __init__(self, records):
+        self.records = {record["id"]: record for record in records}
+        self.down = False
+        self.calls = []
+
+    def __call__(self, day, record_ids):
+        self.calls.append(record_ids)
+        if self.down:
+            raise AirtableError("Airtable API error 503: unavailable", 503)
+        ids = record_ids if record_ids is not None else list(self.records)
+        return [self.records[i] for i in ids if i in self.records]
+
+
+@pytest.fixture
+def loader():
+    return FakeLoader(
+        [_record("rec1", "防除", "田中太郎"), _record("rec2", "収穫", "佐藤花子, 田中太郎")]
+    )
+
+
+def test_snapshot_answers_when_the_rebuild_fails(loader, tmp_path):
+    digest = TaskDigest(loader, path=str(tmp_path / "digest.json"), max_age=0)
+    assert [t["record_id"] for t in digest.tasks_for("田中")] == ["rec1", "rec2"]
+
+    loader.down = True
+    with pytest.raises(AirtableError):
+        digest.tasks_for("田中")
+
+    assert [t["record_id"] for t in digest.snapshot_for("佐藤")] == ["rec2"]
+
+
+def test_snapshot_is_none_without_a_digest_of_today(loader, tmp_path):
+    digest = TaskDigest(loader, path=str(tmp_path / "digest.json"))
+    assert digest.snapshot_for() is None
+
+    digest.refresh("2000-01-01")
+    assert digest.snapshot_for() is None
+
+
+def test_digest_written_by_another_process_is_reloaded(loader, tmp_path):
+    path = str(tmp_path / "digest.json")
+    running = TaskDigest(loader, path=path)
+    assert len(running.tasks_for()) == 2
+
+    # cron の先読みが別プロセスで新しいダイジェストを書いた
+    prefetch = TaskDigest(FakeLoader([_record("rec3", "潅水", "鈴木")]), path=path)
+    prefetch.refresh(TODAY)
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    calls = len(loader.calls)
+    assert [t["record_id"] for t in running.tasks_for()] == ["rec3"]
+    assert len(loader.calls) == calls
+
+
+def test_reassigned_task_is_refetched(loader, tmp_path):
+    digest = TaskDigest(loader, path=str(tmp_path / "digest.json"))
+    digest.refresh(TODAY)
+
+    loader.records["rec1"] = _record("rec1", "防除", "鈴木一郎")
+    digest.apply_write("update", [{"id": "rec1", "fields": {"担当者": ["recWorker3"]}}])
+
+    assert [t["record_id"] for t in digest.tasks_for("鈴木")] == ["rec1"]
+    assert [t["record_id"] for t in digest.tasks_for("田中")] == ["rec2"]
+    assert loader.calls[-1] == ["rec1"]
+
+
+def test_failed_refetch_is_retried(loader, tmp_path):
+    digest = TaskDigest(loader, path=str(tmp_path / "digest.json"))
+    digest.refresh(TODAY)
+    digest.apply_write("create", [{"id": "rec9", "fields": {"タスク名": "播種"}}])
+    loader.records["rec9"] = _record("rec9", "播種", "田中太郎")
+
+    loader.down = True
+    with pytest.raises(AirtableError):
+        digest.tasks_for()
+    loader.down = False
+
+    assert "rec9" in [t["record_id"] for t in digest.tasks_for()]
+
+
+def test_get_today_tasks_without_a_worker_field(airtable, fake):
+    # ドキュメントのスキーマ (と偽サーバー) の 作業タスク には 担当者 が無い
+    assert "担当者" not in fake.field_ids("作業タスク")
+    today = [
+        record
+        for record in fake.data["作業タスク"]
+        if record["fields"]["予定日"] == TODAY and record["fields"]["ステータス"] != "完了"
+    ]
+
+    answer = airtable_tools.get_today_tasks()
+
+    assert answer.startswith("本日のタスク:")
+    assert len(answer.splitlines()) == len(today) + 1
+    # 2 回目はダイジェストから答える
+    requests = fake.stats["GET 作業タスク"]
+    assert airtable_tools.get_today_tasks() == answer
+    assert fake.stats["GET 作業タスク"] == requests
+
+
+def test_digest_falls_back_to_the_query_on_a_client_error(airtable, fake, monkeypatch, caplog):
+    # スキーマと実際のテーブルが食い違っていても (未知の fields[] は 422)、通常のクエリで答える
+    monkeypatch.setattr(airtable_tools, "_digest_has_workers", lambda: True)
+
+    answer = airtable_tools.get_today_tasks()
+
+    assert answer.startswith("本日のタスク:")
+    assert "using the query path" in caplog.text
+
+
+def _stop_airtable(fake_server):
+    fake_server.shutdown()
+    fake_server.server_close()
+    # 接続プールに残った接続も使わせない
+    set_client(None)
+
+
+def test_get_today_tasks_uses_the_last_digest_when_airtable_is_down(airtable, fake_server):
+    answer = airtable_tools.get_today_tasks()
+    assert answer.startswith("本日のタスク:")
+
+    digest = airtable_tools._task_digest()
+    _stop_airtable(fake_server)
+    digest.built_at = 0
+
+    assert airtable_tools.get_today_tasks() == answer
+
+
+def test_get_today_tasks_reports_the_error_without_a_digest_of_today(airtable, fake_server):
+    airtable_tools.get_today_tasks()
+    digest = airtable_tools._task_digest()
+    _stop_airtable(fake_server)
+    digest.day = "2000-01-01"
+
+    assert airtable_tools.get_today_tasks().startswith("タスクの取得中にエラーが発生しました")
@@ -0,0 +1,28 @@
+"""Tenant registry: ``$VAR`` references are resolved when the registry loads."""
+
+import pytest
+
+from agent.tenants import TenantRegistry
+
+CONFIG = {
+    "farm-a": {
+        "env": {"AIRTABLE_API_KEY": "$FARM_A_PAT", "AIRTABLE_BASE_ID": "appFarmA0000000001"},
+        "line_users": ["U1"],
+    }
+}
+
+
+def test_variable_references_are_resolved(monkeypatch):
+    monkeypatch.setenv("FARM_A_PAT", "patFarmA")
+
+    tenant = TenantRegistry.from_dict(CONFIG).get("farm-a")
+
+    assert tenant.getenv("AIRTABLE_API_KEY") == "patFarmA"
+    assert tenant.getenv("AIRTABLE_BASE_ID") == "appFarmA0000000001"
+
+
+def test_missing_variable_fails_the_load(monkeypatch):
+    monkeypatch.delenv("FARM_A_PAT", raising=False)
+
+    with pytest.raises(ValueError, match=r"'farm-a'.*FARM_A_PAT.*AIRTABLE_API_KEY"):
+        TenantRegistry.from_dict(CONFIG)